@@ -0,0 +1,117 @@
+"""数据库结构版本迁移
+
+数据库的结构版本记录在 PRAGMA user_version 中，MIGRATIONS 的第 N 项把数据库从第 N-1 版升级到第 N 版。
+启动时 migrate() 依次执行尚未应用的迁移：
+- 每一版在单独的 BEGIN IMMEDIATE 事务中执行，失败时整体回滚，版本号不变；
+- 拿到写锁后重新读取版本号，多个进程同时启动时同一版只执行一次；
+- 第 1 版与原来建表语句创建的表结构相同（表已存在时不做改动），已有的 products.db 从这里开始原地升级。
+结构有变化时在 MIGRATIONS 末尾追加新的迁移，不要修改已经发布的迁移。
+"""
+import sqlite3
+
+
+def create_tables(conn):
+    """创建商品和价格历史表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT UNIQUE NOT NULL,
+            current_price REAL,
+            target_price REAL,
+            image_path TEXT,
+            website_type TEXT,
+            category TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+
+def cascade_deletes(conn):
+    """删除商品时级联删除它的价格历史"""
+    rebuild_table(conn, 'price_history', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def add_indexes(conn):
+    """价格历史按 (商品, 时间) 建立覆盖索引"""
+    # 按商品查最新价格和价格历史都只读索引，不回表
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_price_history_product_time
+        ON price_history (product_id, created_at, price)
+    ''')
+
+
+MIGRATIONS = [create_tables, cascade_deletes, add_indexes]
+
+
+def rebuild_table(conn, table, schema):
+    """按新的建表语句重建表（SQLite 不能修改已有表的约束）
+
+    schema 中的 {table} 替换为临时表名；复制新旧表都有的列，
+    已删除商品遗留的记录（以及没有商品的记录）不再保留。
+    """
+    temp_table = f'{table}_new'
+    old_columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    conn.execute(schema.format(table=temp_table))
+    new_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({temp_table})')}
+    columns = ', '.join(column for column in old_columns if column in new_columns)
+    conn.execute(f'''
+        INSERT INTO {temp_table} ({columns})
+        SELECT {columns} FROM {table}
+        WHERE product_id IN (SELECT id FROM products)
+    ''')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {temp_table} RENAME TO {table}')
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, migrations=None):
+    """把数据库升级到最新版本，返回本次执行的 [(版本, 说明)]"""
+    migrations = MIGRATIONS if migrations is None else migrations
+    if schema_version(conn) >= len(migrations):
+        return []
+
+    applied = []
+    # 重建表时要关闭外键检查，foreign_keys 只能在事务之外修改
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys=OFF')
+    try:
+        for version, migration in enumerate(migrations, 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                migration(conn)
+                if conn.execute('PRAGMA foreign_key_check').fetchone():
+                    raise sqlite3.IntegrityError(f'第 {version} 版迁移后存在违反外键约束的记录')
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            applied.append((version, migration.__doc__))
+    finally:
+        conn.execute(f'PRAGMA foreign_keys={foreign_keys}')
+    return applied
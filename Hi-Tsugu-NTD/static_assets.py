@@ -0,0 +1,107 @@
+"""静态资源指纹与缓存
+
+- url_for('static', ...) 生成的地址自动带上内容指纹（?v=<SHA-256前16位>），
+  模板中的 app.js、style.css 无需修改；
+- 以内容哈希命名的商品图片（<哈希>.jpg、<哈希>_card.webp）本身就是指纹地址；
+- 指纹地址返回 Cache-Control: immutable，浏览器在有效期内不再发请求；
+  没有指纹的地址返回 no-cache，用强 ETag 协商，内容不变时只得到 304。
+指纹按文件的修改时间和大小缓存，文件变化后自动重新计算。
+"""
+import hashlib
+import os
+import re
+import threading
+
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{64})(_[a-z]+)?\.[a-z0-9]+$')
+
+
+class StaticAssets:
+    """为 static 目录和商品图片提供指纹地址及缓存头"""
+
+    def __init__(self, app=None):
+        self.digests = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.static_url_path = app.static_url_path
+        app.view_functions['static'] = self.serve_static
+        app.url_defaults(self._add_fingerprint)
+        app.add_template_filter(self.asset_url, 'asset_url')
+
+    def digest(self, path):
+        """文件的内容指纹，文件不存在时返回 None"""
+        name = os.path.basename(path)
+        match = CONTENT_ADDRESSED.match(name)
+        if match:
+            # 文件名已是内容哈希，不必再读文件
+            return os.path.splitext(name)[0] if os.path.isfile(path) else None
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()[:16]
+        with self.lock:
+            self.digests[path] = (key, digest)
+        return digest
+
+    def _add_fingerprint(self, endpoint, values):
+        """url_for('static', filename=...) 时追加 v=<指纹>"""
+        if endpoint != 'static' or 'v' in values or not values.get('filename'):
+            return
+        filename = values['filename']
+        if CONTENT_ADDRESSED.match(os.path.basename(filename)):
+            return
+        path = safe_join(self.static_folder, filename)
+        digest = self.digest(path) if path else None
+        if digest:
+            values['v'] = digest
+
+    def asset_url(self, path):
+        """模板过滤器：本地静态文件路径转为指纹地址，外部地址原样返回"""
+        if not path or '://' in path or path.startswith('//'):
+            return path
+        prefix = self.static_url_path + '/'
+        filename = path[len(prefix):] if path.startswith(prefix) else path.lstrip('/')
+        url = prefix + filename
+        if CONTENT_ADDRESSED.match(os.path.basename(filename)):
+            return url
+        full_path = safe_join(self.static_folder, filename)
+        digest = self.digest(full_path) if full_path else None
+        return f"{url}?v={digest}" if digest else url
+
+    def send(self, directory, filename):
+        """带强 ETag 和缓存头返回文件，相对目录以应用根目录为准"""
+        directory = os.path.join(current_app.root_path, directory)
+        path = safe_join(directory, filename)
+        digest = self.digest(path) if path else None
+        if digest is None:
+            raise NotFound()
+
+        response = send_from_directory(directory, filename, etag=digest, max_age=None)
+        if request.args.get('v') == digest or CONTENT_ADDRESSED.match(os.path.basename(filename)):
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def serve_static(self, filename):
+        """替换 Flask 默认的 static 视图"""
+        return self.send(self.static_folder, filename)
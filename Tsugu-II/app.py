@@ -1,31 +1,44 @@
 # app.py
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify
 import json
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import atexit
 import os
+from datetime import datetime, timedelta, timezone
 
 from real_crawler import RealPriceCrawler
+from crawl_scheduler import AdaptiveScheduler
 from database import DatabaseManager
 from config import Config
+from image_store import variant_path
+from image_worker import ImageWorker
+from job_queue import JobQueue
+from static_assets import StaticAssets
 
 app = Flask(__name__)
 app.config.from_object(Config)
+# 静态资源使用带指纹的地址和长期缓存
+static_assets = StaticAssets(app)
 
 # 初始化组件
 crawler = RealPriceCrawler()
 db_manager = DatabaseManager()
+crawl_scheduler = AdaptiveScheduler()
+# queue 模式下由 crawl_worker.py 进程执行爬取
+job_queue = JobQueue(Config.DATABASE_PATH) if Config.CRAWL_MODE == 'queue' else None
+# 图片在后台下载并生成缩略图，不阻塞添加商品和价格检查
+image_worker = ImageWorker(crawler.image_store, db_manager.update_image_path)
 
 def setup_scheduler():
     """设置定时任务"""
     scheduler = BackgroundScheduler()
     
-    # 定时检查价格
-    trigger = IntervalTrigger(hours=Config.SCHEDULER_INTERVAL_HOURS)
+    # 定时取出到期的商品检查价格
+    trigger = IntervalTrigger(seconds=Config.SCHEDULE_TICK)
     scheduler.add_job(
-        func=check_all_prices,
+        func=check_due_prices,
         trigger=trigger,
         id='price_check',
         name='定时检查商品价格',
@@ -35,41 +48,110 @@ def setup_scheduler():
     scheduler.start()
     atexit.register(lambda: scheduler.shutdown())
 
-def check_all_prices():
-    """检查所有商品价格"""
+def sync_schedule():
+    """把商品、当前价格和目标价格同步到调度器，返回商品数"""
+    rows = db_manager.get_schedule_products()
+    prices = {product_id: current_price for product_id, current_price, _ in rows}
+    targets = {product_id: target_price for product_id, _, target_price in rows if target_price}
+    since = (datetime.now(timezone.utc) - timedelta(days=Config.SCHEDULE_HISTORY_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    crawl_scheduler.sync(prices, targets, lambda product_ids: db_manager.get_history_rows(product_ids, since))
+    return len(prices)
+
+def price_changed(current_price, product_info):
+    """本次检查是否发现了价格变化"""
+    price = product_info.get('price')
+    return (price is not None and current_price is not None
+            and not product_info.get('not_modified') and not product_info.get('cached')
+            and price != current_price)
+
+def record_check(product_id, current_price, product_info):
+    """把一次检查的结果交给调度器"""
+    if product_info.get('circuit_open') or product_info.get('cached'):
+        # 熔断或合并层直接给出结果时没有发出请求，不算一次检查
+        return
+    crawl_scheduler.record_check(product_id, price_changed(current_price, product_info), product_info.get('price'))
+
+def save_price_result(product, product_info):
+    """保存一次检查的结果"""
+    product_id, name, url, current_price, target_price, image_path, website_type, created_at, updated_at = product
+    
+    if product_info.get('cached'):
+        # 结果来自合并层，发出请求的调用方已经写入，不重复写价格历史
+        app.logger.info(f"商品刚检查过，本轮跳过: {name}")
+    
+    elif product_info.get('not_modified'):
+        # 页面未变化（304），只记录本次检查
+        db_manager.touch_product(product_id)
+        app.logger.info(f"商品价格未变化: {name}")
+    
+    elif product_info.get('circuit_open'):
+        app.logger.warning(f"网站熔断中，本轮跳过: {name}")
+    
+    elif product_info.get('price') is not None:
+        # 还没有图片时交给后台下载
+        if not image_path:
+            image_worker.submit(product_id, product_info.get('image_url'))
+        
+        # 更新数据库
+        db_manager.update_product_price(
+            product_id, 
+            product_info['price'],
+            product_info.get('name')
+        )
+        
+        app.logger.info(f"更新商品价格: {name} - {product_info['price']}")
+
+def check_due_prices():
+    """检查已到期商品的价格
+
+    每轮的请求数按 SCHEDULER_INTERVAL_HOURS 的预算分摊：平均每个商品每个周期检查一次，
+    具体分给哪些商品由调度器按价格波动决定。CRAWL_MODE 为 queue 时只写入任务表。
+    """
     with app.app_context():
         try:
-            products = db_manager.get_all_products()
-            for product in products:
-                product_id, name, url, current_price, target_price, image_path, website_type, created_at, updated_at = product
+            crawler.http_cache.reset_stats()
+            count = sync_schedule()
+            allowance = count * Config.SCHEDULE_TICK / (Config.SCHEDULER_INTERVAL_HOURS * 3600)
+            due_ids = crawl_scheduler.pop_budgeted(allowance)
+            if job_queue:
+                # 收取工作进程的结果交给调度器，再写入新的任务
+                for product_id, changed, price, error in job_queue.collect_finished():
+                    crawl_scheduler.record_check(product_id, changed, price)
+                if due_ids:
+                    app.logger.info(f"新增 {job_queue.enqueue(due_ids)} 个爬取任务，队列: {job_queue.stats()}")
+                return
+            if not due_ids:
+                return
+            products = {product[0]: product for product in db_manager.get_all_products()}
+            for product_id in due_ids:
+                if product_id not in products:
+                    continue
+                product = products[product_id]
                 
                 # 获取最新价格
-                product_info = crawler.fetch_product_info(url)
-                
-                if product_info.get('price') is not None:
-                    # 下载图片（如果还没有图片）
-                    if not image_path and product_info.get('image_url'):
-                        new_image_path = crawler.download_image(product_info.get('image_url'), product_id)
-                    else:
-                        new_image_path = None
-                    
-                    # 更新数据库
-                    db_manager.update_product_price(
-                        product_id, 
-                        product_info['price'],
-                        product_info.get('name'),
-                        new_image_path
-                    )
-                    
-                    app.logger.info(f"更新商品价格: {name} - {product_info['price']}")
-                
-                # 避免请求过于频繁
-                import time
-                time.sleep(2)
+                product_info = crawler.fetch_product_info(product[2])
+                record_check(product_id, product[3], product_info)
+                save_price_result(product, product_info)
+            
+            db_manager.flush()
+            app.logger.info(f"条件请求缓存统计: {crawler.http_cache.stats()}")
+            app.logger.info(f"批量写入统计: {db_manager.writer.stats()}")
+            app.logger.info(f"调度统计: {crawl_scheduler.stats()}")
                 
         except Exception as e:
             app.logger.error(f"定时检查价格失败: {e}")
 
+def product_image_urls(image_path):
+    """卡片和详情使用的图片地址，有WebP变体时优先使用变体"""
+    if not image_path or not os.path.exists(os.path.join('static', image_path)):
+        return None
+    urls = {}
+    for view in ('card', 'detail'):
+        variant = variant_path(image_path, view)
+        path = variant if os.path.exists(os.path.join('static', variant)) else image_path
+        urls[view] = f"/static/{path}"
+    return urls
+
 @app.route('/')
 def index():
     """主页"""
@@ -101,17 +183,15 @@ def add_product():
         )
         
         if product_id:
-            # 下载图片
-            image_path = crawler.download_image(product_info.get('image_url'), product_id)
-            
-            # 更新价格和图片
+            # 更新价格，图片由后台下载
             if product_info.get('price') is not None:
                 db_manager.update_product_price(
                     product_id,
                     product_info['price'],
-                    product_info.get('name'),
-                    image_path
+                    product_info.get('name')
                 )
+                db_manager.flush()
+            image_worker.submit(product_id, product_info.get('image_url'))
             
             return jsonify({'success': True, 'message': '商品添加成功'})
         else:
@@ -135,26 +215,39 @@ def check_price(product_id):
         
         # 获取最新价格
         product_info = crawler.fetch_product_info(url)
+        record_check(product_id, current_price, product_info)
+        
+        if product_info.get('not_modified'):
+            # 页面未变化（304），只记录本次检查
+            if not product_info.get('cached'):
+                db_manager.touch_product(product_id)
+                db_manager.flush()
+            return jsonify({
+                'success': True,
+                'price': product_info.get('price', current_price),
+                'name': product_info.get('name') or name,
+                'unchanged': True
+            })
         
         if product_info.get('price') is not None:
-            # 下载图片（如果还没有图片）
-            if not image_path and product_info.get('image_url'):
-                new_image_path = crawler.download_image(product_info.get('image_url'), product_id)
-            else:
-                new_image_path = None
+            # 还没有图片时交给后台下载
+            if not image_path:
+                image_worker.submit(product_id, product_info.get('image_url'))
             
-            # 更新数据库
-            db_manager.update_product_price(
-                product_id, 
-                product_info['price'],
-                product_info.get('name'),
-                new_image_path
-            )
+            # 更新数据库；结果来自合并层时发出请求的调用方已经写入
+            if not product_info.get('cached'):
+                db_manager.update_product_price(
+                    product_id, 
+                    product_info['price'],
+                    product_info.get('name')
+                )
+                db_manager.flush()
             
             return jsonify({
                 'success': True, 
                 'price': product_info['price'],
-                'name': product_info.get('name', name)
+                'name': product_info.get('name', name),
+                'images': product_image_urls(image_path)
             })
         else:
             return jsonify({'success': False, 'error': '无法获取价格'})
@@ -163,6 +256,21 @@ def check_price(product_id):
         app.logger.error(f"检查价格失败: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/scheduler_stats')
+def get_scheduler_stats():
+    """调度统计：检查间隔分布，以及每次请求发现的价格变化数"""
+    return jsonify({'success': True, 'stats': crawl_scheduler.stats()})
+
+@app.route('/api/selector_stats')
+def get_selector_stats():
+    """选择器命中统计：每个选择器的尝试和命中次数，从不命中的选择器可以从配置中删除"""
+    return jsonify({'success': True, 'stats': crawler.selector_stats.stats()})
+
+@app.route('/api/writer_stats')
+def get_writer_stats():
+    """批量写入统计：提交次数、平均每次写入的语句数和提交耗时"""
+    return jsonify({'success': True, 'stats': db_manager.writer.stats()})
+
 @app.route('/api/price_history/<int:product_id>')
 def get_price_history(product_id):
     """获取价格历史"""
@@ -183,18 +291,20 @@ def delete_product(product_id):
     """删除商品"""
     try:
         db_manager.delete_product(product_id)
+        crawl_scheduler.remove(product_id)
         return jsonify({'success': True, 'message': '商品删除成功'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/static/product_images/<filename>')
 def serve_image(filename):
-    """提供商品图片"""
-    return send_from_directory('static/product_images', filename)
+    """提供商品图片（文件名即内容哈希，可长期缓存）"""
+    return static_assets.send(Config.IMAGE_DIR, filename)
 
 if __name__ == '__main__':
     # 启动定时任务
     setup_scheduler()
+    image_worker.start()
     
     # 确保静态文件目录存在
     os.makedirs('static/product_images', exist_ok=True)
@@ -0,0 +1,139 @@
+"""批量写库
+
+爬取结果原来每个商品单独取连接、写入、提交，或者整轮爬取期间一直占着同一个写事务。
+BatchWriter 由唯一的写线程负责写入：
+- 调用方用 execute() 提交写语句（参数与 cursor.execute 相同）后立即返回；
+- 写线程攒够 flush_size 条、或第一条等待了 flush_interval 秒后，在一个短事务中写入，
+  连续提交的同一条语句合并为一次 executemany，语句按提交顺序执行；
+- 某条语句失败（如商品已被删除）时整批回滚，再逐条重写并跳过失败的语句。
+需要读到刚提交的写入时调用 flush()。
+"""
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+FLUSH_SIZE = 200
+FLUSH_INTERVAL = 0.5
+QUEUE_SIZE = 10000
+EXIT_TIMEOUT = 10
+
+
+class BatchWriter:
+    """单个写线程批量写库"""
+
+    def __init__(self, pool, flush_size=None, flush_interval=None, queue_size=None):
+        self.pool = pool
+        self.flush_size = flush_size or FLUSH_SIZE
+        self.flush_interval = FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.queue_size = queue_size or QUEUE_SIZE
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = os.getpid()
+        self.commits = 0
+        self.statements = 0
+        self.failed = 0
+        self.commit_time = 0.0
+        self.logger = logging.getLogger('PriceCrawler')
+
+    def start(self):
+        """启动写线程（第一次提交时自动调用）"""
+        with self.lock:
+            if self.pid != os.getpid():
+                # fork 出的子进程不能重复写入父进程队列中的语句
+                self.queue = queue.Queue(maxsize=self.queue_size)
+                self.thread = None
+                self.pid = os.getpid()
+            if self.thread is None:
+                atexit.register(self.flush, EXIT_TIMEOUT)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+                self.thread.start()
+
+    def execute(self, sql, params=()):
+        """提交一条写语句，由写线程稍后执行；队列已满时等待，不要在事件循环中直接调用"""
+        self.start()
+        self.queue.put((sql, params))
+
+    def flush(self, timeout=None):
+        """等待此前提交的写入全部提交到数据库，返回是否在 timeout 秒内完成"""
+        self.start()
+        done = threading.Event()
+        self.queue.put((None, done))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch, waiters = [], []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                sql, params = item
+                if sql is None:
+                    # flush() 的标记：立即写入已收到的语句
+                    waiters.append(params)
+                    break
+                batch.append(item)
+                if len(batch) >= self.flush_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for done in waiters:
+                done.set()
+
+    def _write(self, batch):
+        """在一个事务中写入一批语句"""
+        # 只合并相邻的同一条语句，不改变语句之间的先后顺序
+        groups = []
+        for sql, params in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        started = time.perf_counter()
+        committed, failed = True, 0
+        try:
+            with self.pool.connection() as conn:
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    for sql, rows in groups:
+                        conn.executemany(sql, rows)
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    self.logger.warning(f"批量写入失败，逐条重试: {e}")
+                    conn.execute('BEGIN IMMEDIATE')
+                    for sql, params in batch:
+                        try:
+                            conn.execute(sql, params)
+                        except sqlite3.Error as e:
+                            failed += 1
+                            self.logger.error(f"写入失败: {e}")
+                    conn.commit()
+        except Exception as e:
+            committed, failed = False, len(batch)
+            self.logger.error(f"批量写入失败: {e}")
+        with self.lock:
+            self.commits += committed
+            self.statements += len(batch) - failed
+            self.failed += failed
+            self.commit_time += time.perf_counter() - started
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': self.queue.qsize(),
+                'commits': self.commits,
+                'statements': self.statements,
+                'failed': self.failed,
+                'avg_batch': round(self.statements / self.commits, 1) if self.commits else 0,
+                'avg_commit_ms': round(self.commit_time / self.commits * 1000, 2) if self.commits else 0
+            }
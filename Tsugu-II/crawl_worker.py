@@ -0,0 +1,122 @@
+"""独立的爬取工作进程
+
+从 crawl_jobs 任务表领取商品，逐个抓取并回报结果。可以同时启动多个进程
+（也可以在共享数据库文件的多台机器上），吞吐量随进程数增加；
+每个进程按 RATE_LIMITS 单独限速，总请求量由Web进程的调度预算控制。
+
+Web进程需设置 CRAWL_MODE=queue，只负责按调度写入任务。
+
+用法: python crawl_worker.py [--worker-id ID] [--batch N] [--once]
+"""
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+
+from app import crawler, db_manager, image_worker, price_changed, save_price_result
+from config import Config
+from job_queue import JobQueue
+
+
+class CrawlWorker:
+    """领取任务、抓取并回报结果"""
+
+    def __init__(self, worker_id=None, batch_size=None, queue=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or Config.WORKER_BATCH_SIZE
+        self.queue = queue or JobQueue(Config.DATABASE_PATH)
+        self.logger = logging.getLogger('PriceCrawler')
+        self.current_jobs = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.processed = 0
+
+    def start_heartbeat(self):
+        """后台续租当前持有的任务"""
+        def run():
+            interval = self.queue.lease_seconds / 3
+            while not self.stopped.wait(interval):
+                with self.lock:
+                    job_ids = list(self.current_jobs)
+                renewed = self.queue.heartbeat(self.worker_id, job_ids)
+                if renewed < len(job_ids):
+                    self.logger.warning(f"[{self.worker_id}] {len(job_ids) - renewed} 个任务的租约已被收回")
+
+        thread = threading.Thread(target=run, name='crawl-worker-heartbeat', daemon=True)
+        thread.start()
+        return thread
+
+    def run_batch(self):
+        """领取并处理一批任务，返回处理的任务数"""
+        jobs = self.queue.claim(self.worker_id, self.batch_size)
+        if not jobs:
+            return 0
+        with self.lock:
+            self.current_jobs = {job.id for job in jobs}
+        products = {product[0]: product for product in db_manager.get_products([job.product_id for job in jobs])}
+
+        for job in jobs:
+            product = products.get(job.product_id)
+            if product is None:
+                # 商品已被删除
+                self.queue.complete(self.worker_id, job.id, error='商品不存在')
+            else:
+                self.process(job, product)
+            with self.lock:
+                self.current_jobs.discard(job.id)
+        self.processed += len(jobs)
+        return len(jobs)
+
+    def process(self, job, product):
+        """抓取单个商品并回报结果"""
+        product_info = crawler.fetch_product_info(product[2])
+        if product_info.get('circuit_open'):
+            # 请求没有发出，熔断恢复后再由其他进程领取
+            self.queue.release(self.worker_id, job.id, Config.BREAKER_RESET_TIMEOUT, product_info.get('error'))
+            return
+
+        # 先确认租约并完成任务，租约已被收回时不写入结果，避免重复写入
+        if not self.queue.complete(self.worker_id, job.id, price_changed(product[3], product_info),
+                                   product_info.get('price'), product_info.get('error')):
+            self.logger.warning(f"[{self.worker_id}] 商品 {product[0]} 的租约已被收回，结果不写入")
+            return
+        save_price_result(product, product_info)
+
+    def run(self, once=False):
+        """循环领取任务；once 为 True 时队列为空即退出"""
+        self.logger.info(f"爬取工作进程 {self.worker_id} 启动，每次领取 {self.batch_size} 个任务")
+        self.start_heartbeat()
+        try:
+            while True:
+                try:
+                    processed = self.run_batch()
+                except Exception as e:
+                    self.logger.error(f"[{self.worker_id}] 处理任务失败: {e}")
+                    processed = 0
+                if processed:
+                    continue
+                if once:
+                    break
+                time.sleep(Config.WORKER_POLL_INTERVAL)
+        finally:
+            # 价格更新由写线程批量写入，退出前等待写完
+            db_manager.flush()
+            self.stopped.set()
+        self.logger.info(f"工作进程 {self.worker_id} 退出，共处理 {self.processed} 个任务")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='价格爬取工作进程')
+    parser.add_argument('--worker-id', help='工作进程标识，默认为 主机名-进程号')
+    parser.add_argument('--batch', type=int, help='每次领取的任务数')
+    parser.add_argument('--once', action='store_true', help='任务队列为空时退出')
+    args = parser.parse_args()
+    # 新商品的图片在工作进程中下载
+    image_worker.start()
+    CrawlWorker(args.worker_id, batch_size=args.batch).run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()
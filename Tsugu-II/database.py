@@ -1,107 +1,99 @@
 # database.py
-import sqlite3
 import logging
 from datetime import datetime
 from config import Config
+from batch_writer import BatchWriter
+from db_pool import ConnectionPool
+from migrations import migrate
 
 class DatabaseManager:
     def __init__(self, db_path: str = Config.DATABASE_PATH):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, Config.DB_POOL_IDLE, Config.DB_BUSY_TIMEOUT,
+                                   Config.DB_SYNCHRONOUS, Config.DB_MMAP_SIZE)
+        # 价格更新由单个写线程批量写入，调用方需要读到结果时先调用 flush()
+        self.writer = BatchWriter(self.pool, Config.DB_FLUSH_SIZE, Config.DB_FLUSH_INTERVAL)
         self._init_db()
     
     def _init_db(self):
-        """初始化数据库表"""
-        conn = self._get_connection()
-        try:
-            # 商品表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    url TEXT UNIQUE NOT NULL,
-                    current_price REAL,
-                    target_price REAL,
-                    image_path TEXT,
-                    website_type TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # 价格历史表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS price_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_id INTEGER,
-                    price REAL NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (product_id) REFERENCES products (id)
-                )
-            ''')
-            
-            conn.commit()
-        except Exception as e:
-            logging.error(f"初始化数据库失败: {e}")
-        finally:
-            conn.close()
+        """初始化数据库表：执行尚未应用的结构迁移"""
+        with self._get_connection() as conn:
+            try:
+                for version, description in migrate(conn):
+                    logging.info(f"数据库结构升级到第 {version} 版: {description}")
+            except Exception as e:
+                logging.error(f"初始化数据库失败: {e}")
     
     def _get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        """从连接池取出连接，用 with 语句使用，结束时自动归还"""
+        return self.pool.connection()
     
     def add_product(self, name: str, url: str, target_price: float = None) -> int:
-        """添加商品"""
-        conn = self._get_connection()
-        try:
-            cursor = conn.execute('''
-                INSERT OR REPLACE INTO products (name, url, target_price, updated_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (name, url, target_price))
-            
-            product_id = cursor.lastrowid
-            conn.commit()
-            return product_id
-        except Exception as e:
-            logging.error(f"添加商品失败: {e}")
-            return None
-        finally:
-            conn.close()
+        """添加商品；URL已存在时只更新目标价格，保留原有的商品ID和价格历史"""
+        with self._get_connection() as conn:
+            try:
+                # REPLACE 会先删除旧行，级联删除它的价格历史
+                conn.execute('''
+                    INSERT INTO products (name, url, target_price, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (url) DO UPDATE SET
+                        target_price = excluded.target_price, updated_at = CURRENT_TIMESTAMP
+                ''', (name, url, target_price))
+                
+                # 更新已有行时 lastrowid 不是该商品的ID
+                product_id = conn.execute('SELECT id FROM products WHERE url = ?', (url,)).fetchone()[0]
+                conn.commit()
+                return product_id
+            except Exception as e:
+                logging.error(f"添加商品失败: {e}")
+                return None
+    
+    def update_image_path(self, product_id: int, image_path: str):
+        """后台图片处理完成后写回图片路径"""
+        with self._get_connection() as conn:
+            try:
+                conn.execute('UPDATE products SET image_path = ? WHERE id = ?', (image_path, product_id))
+                conn.commit()
+            except Exception as e:
+                logging.error(f"更新商品图片失败: {e}")
     
     def update_product_price(self, product_id: int, price: float, name: str = None, image_path: str = None):
-        """更新商品价格和信息"""
-        conn = self._get_connection()
-        try:
-            # 更新商品信息
-            if name or image_path:
-                conn.execute('''
-                    UPDATE products 
-                    SET current_price = ?, name = COALESCE(?, name), 
-                        image_path = COALESCE(?, image_path), updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (price, name, image_path, product_id))
-            else:
-                conn.execute('''
-                    UPDATE products 
-                    SET current_price = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (price, product_id))
-            
-            # 添加价格历史记录
-            conn.execute('''
-                INSERT INTO price_history (product_id, price)
-                VALUES (?, ?)
-            ''', (product_id, price))
-            
-            conn.commit()
-        except Exception as e:
-            logging.error(f"更新商品价格失败: {e}")
-        finally:
-            conn.close()
+        """更新商品价格和信息（批量写入）"""
+        # 更新商品信息
+        if name or image_path:
+            self.writer.execute('''
+                UPDATE products 
+                SET current_price = ?, name = COALESCE(?, name), 
+                    image_path = COALESCE(?, image_path), updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (price, name, image_path, product_id))
+        else:
+            self.writer.execute('''
+                UPDATE products 
+                SET current_price = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (price, product_id))
+        
+        # 添加价格历史记录
+        self.writer.execute('''
+            INSERT INTO price_history (product_id, price)
+            VALUES (?, ?)
+        ''', (product_id, price))
     
+    def touch_product(self, product_id: int):
+        """记录一次价格未变化的检查（批量写入）"""
+        self.writer.execute('''
+            UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (product_id,))
+    
+    def flush(self):
+        """等待已提交的价格更新全部写入数据库"""
+        if not self.writer.flush(Config.DB_BUSY_TIMEOUT):
+            logging.warning("等待批量写入超时")
+
     def get_all_products(self):
         """获取所有商品"""
-        conn = self._get_connection()
-        try:
+        with self._get_connection() as conn:
             cursor = conn.execute('''
                 SELECT id, name, url, current_price, target_price, image_path, website_type,
                        created_at, updated_at
@@ -109,13 +101,42 @@ class DatabaseManager:
                 ORDER BY updated_at DESC
             ''')
             return cursor.fetchall()
-        finally:
-            conn.close()
+    
+    def get_products(self, product_ids: list):
+        """按ID获取商品，字段与 get_all_products 相同"""
+        with self._get_connection() as conn:
+            cursor = conn.execute(f'''
+                SELECT id, name, url, current_price, target_price, image_path, website_type,
+                       created_at, updated_at
+                FROM products 
+                WHERE id IN ({', '.join('?' * len(product_ids))})
+            ''', product_ids)
+            return cursor.fetchall()
+    
+    def get_schedule_products(self):
+        """调度器需要的商品信息：(id, 当前价格, 目标价格)"""
+        with self._get_connection() as conn:
+            cursor = conn.execute('SELECT id, current_price, target_price FROM products')
+            return cursor.fetchall()
+    
+    def get_history_rows(self, product_ids: list, since: str):
+        """批量获取商品自 since 起的价格历史 (product_id, price, created_at)，按时间排序"""
+        with self._get_connection() as conn:
+            rows = []
+            for start in range(0, len(product_ids), 500):
+                chunk = product_ids[start:start + 500]
+                cursor = conn.execute(f'''
+                    SELECT product_id, price, created_at
+                    FROM price_history
+                    WHERE product_id IN ({', '.join('?' * len(chunk))}) AND created_at >= ?
+                    ORDER BY product_id, id
+                ''', chunk + [since])
+                rows.extend(cursor.fetchall())
+            return rows
     
     def get_price_history(self, product_id: int, limit: int = 30):
         """获取价格历史"""
-        conn = self._get_connection()
-        try:
+        with self._get_connection() as conn:
             cursor = conn.execute('''
                 SELECT price, created_at 
                 FROM price_history 
@@ -124,15 +145,10 @@ class DatabaseManager:
                 LIMIT ?
             ''', (product_id, limit))
             return cursor.fetchall()
-        finally:
-            conn.close()
     
     def delete_product(self, product_id: int):
         """删除商品"""
-        conn = self._get_connection()
-        try:
-            conn.execute('DELETE FROM price_history WHERE product_id = ?', (product_id,))
+        with self._get_connection() as conn:
+            # 价格历史由外键级联删除
             conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
-            conn.commit()
-        finally:
-            conn.close()
\ No newline at end of file
+            conn.commit()
\ No newline at end of file
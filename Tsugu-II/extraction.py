@@ -0,0 +1,151 @@
+# extraction.py
+"""lxml 快速提取
+
+直接用 lxml 解析原始字节，Config.SITE_CONFIGS 中的选择器在模块加载时一次性编译为 XPath。
+什么都没找到时返回 None，由调用方回退到 BeautifulSoup 解析。
+"""
+import time
+
+from cssselect import HTMLTranslator, SelectorError
+from lxml import etree
+from lxml import html as lxml_html
+
+from config import Config
+
+HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+
+def compile_selectors(selectors: list) -> list:
+    """把CSS选择器列表编译为XPath，无法编译的选择器（如 '.J-p-{}' 模板）直接跳过"""
+    translator = HTMLTranslator()
+    compiled = []
+    for selector in selectors:
+        try:
+            compiled.append((selector, etree.XPath(translator.css_to_xpath(selector))))
+        except (SelectorError, etree.XPathSyntaxError):
+            continue
+    return compiled
+
+
+SELECTOR_PLANS = {
+    website_type: {
+        field: compile_selectors(site_config.get(f'{field}_selectors', []))
+        for field in ('name', 'price', 'image')
+    }
+    for website_type, site_config in Config.SITE_CONFIGS.items()
+}
+
+
+def complete_matches(xpath, doc, open_elements: set) -> list:
+    """执行XPath，跳过尚未解析完的元素"""
+    if not open_elements:
+        return xpath(doc)
+    return [element for element in xpath(doc) if element not in open_elements]
+
+
+class PlanRun:
+    """一次提取使用的选择器计划，记录命中的选择器"""
+
+    def __init__(self, website_type, field, plan):
+        self.website_type = website_type
+        self.field = field
+        self.plan = plan
+        self.tried = 0
+        self.selector = None
+
+    def __iter__(self):
+        for item in self.plan:
+            self.tried += 1
+            yield item
+
+    def hit(self, selector):
+        self.selector = selector
+
+
+class FastExtractor:
+    """基于预编译选择器的 lxml 提取器"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    def extract(self, body: bytes, url: str, website_type: str) -> dict:
+        """从页面字节中提取商品信息，名称和价格都没找到时返回 None"""
+        plans = SELECTOR_PLANS.get(website_type)
+        if not plans:
+            return None
+
+        try:
+            doc = lxml_html.document_fromstring(body, parser=HTML_PARSER)
+        except (etree.ParserError, ValueError):
+            return None
+        return self.extract_from_doc(doc, url, website_type)
+
+    def extract_from_doc(self, doc, url: str, website_type: str, open_elements: set = None) -> dict:
+        """从已解析的文档树中提取商品信息
+
+        open_elements 用于流式解析：这些元素还没有解析完，其文本可能不完整，提取时跳过。
+        """
+        plans = SELECTOR_PLANS.get(website_type)
+        if not plans:
+            return None
+        open_elements = open_elements or set()
+        # 选择器命中情况在文档完整或提取成功时才记录，流式解析的中间结果不计入
+        records = []
+
+        name = self._find_text(doc, self._plan(website_type, 'name', records), open_elements)
+        price_text = self._find_text(doc, self._plan(website_type, 'price', records), open_elements)
+        if not name and not price_text:
+            if not open_elements:
+                self._record(records)
+            return None
+
+        product_info = {
+            'url': url,
+            'website': website_type,
+            'timestamp': time.time(),
+            'name': name,
+            'price': self.crawler._clean_price(price_text) if price_text else None,
+            'image_url': self._find_image(doc, self._plan(website_type, 'image', records), open_elements)
+        }
+        self._record(records)
+        return product_info
+
+    def _plan(self, website_type: str, field: str, records: list) -> PlanRun:
+        """按命中统计排序的选择器计划，加入 records 以便提取结束后记录"""
+        plan = self.crawler.selector_stats.order(website_type, field, SELECTOR_PLANS[website_type][field],
+                                                 key=lambda item: item[0])
+        run = PlanRun(website_type, field, plan)
+        records.append(run)
+        return run
+
+    def _record(self, records: list):
+        for run in records:
+            self.crawler.selector_stats.record(run.website_type, run.field,
+                                               [selector for selector, _ in run.plan[:run.tried]], run.selector)
+
+    def _find_text(self, doc, plan: PlanRun, open_elements: set) -> str:
+        """返回第一个有文本的元素的文本"""
+        for selector, xpath in plan:
+            for element in complete_matches(xpath, doc, open_elements):
+                text = element.text_content().strip()
+                if text:
+                    plan.hit(selector)
+                    return text
+                break
+        return None
+
+    def _find_image(self, doc, plan: PlanRun, open_elements: set) -> str:
+        """查找商品图片，地址处理方式与 RealPriceCrawler._find_image 相同"""
+        for selector, xpath in plan:
+            for element in complete_matches(xpath, doc, open_elements):
+                src = element.get('src')
+                if src:
+                    plan.hit(selector)
+                    if src.startswith('//'):
+                        return 'https:' + src
+                    elif src.startswith('http'):
+                        return src
+                    else:
+                        return 'https:' + src if src.startswith('/') else src
+                break
+        return None
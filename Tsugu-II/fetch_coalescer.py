@@ -0,0 +1,141 @@
+"""抓取合并与短期结果缓存
+
+同一商品可能同时被定时任务、手动检查和重复添加触发抓取。
+FetchCoalescer 放在 fetch_product_info 之前：
+- 同一规范化URL同时只有一个请求在进行，其余调用方等待并共享这次结果；
+- 成功的结果缓存 FETCH_CACHE_TTL 秒，按最近最少使用淘汰，最多 FETCH_CACHE_SIZE 条。
+缓存命中和等待共享得到的结果带 cached=True：本次调用没有发出请求，写库时不应当作一次新的检查。
+同步调用（Flask 线程）和异步调用（爬取引擎）共用同一张表。
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import Config
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = {'spm', 'scm', 'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+WAIT_POLL_INTERVAL = 0.05
+
+
+def normalize_url(url):
+    """规范化URL：协议和主机小写，去掉默认端口、片段和跟踪参数，查询参数排序"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMS)
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def is_cacheable(result):
+    """只缓存成功的结果，失败和熔断的结果下次重新抓取"""
+    return isinstance(result, dict) and not result.get('error') and result.get('success', True) is not False
+
+
+class _Flight:
+    """一次进行中的抓取"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class FetchCoalescer:
+    """按URL合并并发抓取，并短期缓存结果"""
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = Config.FETCH_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or Config.FETCH_CACHE_SIZE
+        self.cache = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('fetches', 'hits', 'coalesced'), 0)
+
+    def _claim(self, key):
+        """返回 ('hit', 结果)、('wait', 进行中的抓取) 或 ('lead', 新的抓取)"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry:
+                if entry[0] > now:
+                    self.cache.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return 'hit', entry[1]
+                del self.cache[key]
+            flight = self.flights.get(key)
+            if flight:
+                self.counters['coalesced'] += 1
+                return 'wait', flight
+            flight = self.flights[key] = _Flight()
+            self.counters['fetches'] += 1
+            return 'lead', flight
+
+    def _complete(self, key, flight, result):
+        with self.lock:
+            if self.ttl > 0 and is_cacheable(result):
+                self.cache[key] = (time.monotonic() + self.ttl, result)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+            self.flights.pop(key, None)
+        flight.result = result
+        flight.event.set()
+
+    @staticmethod
+    def _copy(result):
+        # 调用方可能修改返回的字典，缓存中保留原件
+        return dict(result, cached=True) if isinstance(result, dict) else result
+
+    def fetch(self, url, fetch):
+        """同步获取：命中缓存直接返回，已有相同请求时等待它完成，否则调用 fetch(url)"""
+        key = normalize_url(url)
+        state, value = self._claim(key)
+        if state == 'hit':
+            return self._copy(value)
+        if state == 'wait':
+            value.event.wait()
+            return self._copy(value.result)
+
+        result = None
+        try:
+            result = fetch(url)
+        finally:
+            self._complete(key, value, result)
+        return result
+
+    async def fetch_async(self, url, fetch):
+        """异步获取，fetch(url) 为协程函数"""
+        key = normalize_url(url)
+        state, value = self._claim(key)
+        if state == 'hit':
+            return self._copy(value)
+        if state == 'wait':
+            # 发起请求的可能是同一事件循环中的任务，轮询而不占用线程池
+            while not value.event.is_set():
+                await asyncio.sleep(WAIT_POLL_INTERVAL)
+            return self._copy(value.result)
+
+        result = None
+        try:
+            result = await fetch(url)
+        finally:
+            self._complete(key, value, result)
+        return result
+
+    def invalidate(self, url):
+        """删除某个URL的缓存结果"""
+        with self.lock:
+            self.cache.pop(normalize_url(url), None)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['cached'] = len(self.cache)
+            stats['in_flight'] = len(self.flights)
+        return stats
@@ -0,0 +1,194 @@
+"""共享HTTP连接池
+
+页面抓取和图片下载共用同一个连接池：
+- 按主机分池，池大小可按域名单独配置，连接保持 keep-alive；
+- 域名解析结果按 DNS_CACHE_TTL 缓存；
+- 统计新建连接、复用连接和握手耗时，便于观察并发下握手开销的变化。
+requests 会话通过 HttpPool.session() 获取。
+"""
+import ipaddress
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+from config import Config
+from rate_limiter import registrable_domain
+
+
+class DnsCache:
+    """域名解析缓存"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, host, port, stats):
+        """返回主机的IP地址，IP字面量原样返回"""
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry and entry[1] > now:
+                stats.record('dns_hits')
+                return entry[0]
+        stats.record('dns_misses')
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        with self.lock:
+            self.entries[host] = (address, now + self.ttl)
+        return address
+
+    def pin(self, host, address):
+        """固定主机的解析结果（不过期），用于把真实域名指向本地模拟商城"""
+        with self.lock:
+            self.entries[host] = (address, float('inf'))
+
+
+class PoolStats:
+    """连接池计数器"""
+
+    FIELDS = ('requests', 'new_connections', 'reused_connections', 'dns_hits', 'dns_misses')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = dict.fromkeys(self.FIELDS, 0)
+            self.connect_time = 0.0
+
+    def record(self, field, count=1):
+        with self.lock:
+            self.counters[field] += count
+
+    def record_connect(self, seconds):
+        """记录一次新建连接（TCP + TLS 握手）"""
+        with self.lock:
+            self.counters['new_connections'] += 1
+            self.connect_time += seconds
+
+    def to_dict(self):
+        with self.lock:
+            counters = dict(self.counters)
+            connect_time = self.connect_time
+        new = counters['new_connections']
+        counters['connect_time'] = round(connect_time, 4)
+        counters['avg_connect_time'] = round(connect_time / new, 4) if new else 0.0
+        counters['reuse_rate'] = round(counters['reused_connections'] / counters['requests'], 3) if counters['requests'] else 0.0
+        return counters
+
+
+class _CountingConnectionMixin:
+    """新建连接时走DNS缓存并记录握手耗时"""
+
+    http_pool = None
+    default_socket_options = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    ]
+
+    def _new_conn(self):
+        # 只在建立TCP连接时换成缓存的IP，Host 请求头、SNI 和证书校验仍使用域名
+        host = self._dns_host
+        self._dns_host = self.http_pool.dns_cache.resolve(host, self.port, self.http_pool.stats)
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        self.http_pool.stats.record_connect(time.perf_counter() - started)
+        # 连接在发起请求的线程中建立，用线程局部计数判断本次请求是否复用了连接
+        self.http_pool.local.connects = getattr(self.http_pool.local, 'connects', 0) + 1
+
+
+class _CountingHTTPConnection(_CountingConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CountingHTTPSConnection(_CountingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class SizedPoolManager(PoolManager):
+    """按主机设置连接池大小的 PoolManager"""
+
+    def __init__(self, http_pool, **kwargs):
+        super().__init__(**kwargs)
+        self.http_pool = http_pool
+        self.pool_classes_by_scheme = {
+            scheme: type(pool_class.__name__, (pool_class,), {
+                'ConnectionCls': type(connection_class.__name__, (connection_class,), {'http_pool': http_pool})
+            })
+            for scheme, pool_class, connection_class in (
+                ('http', HTTPConnectionPool, _CountingHTTPConnection),
+                ('https', HTTPSConnectionPool, _CountingHTTPSConnection))
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        request_context = dict(request_context or self.connection_pool_kw)
+        request_context['maxsize'] = self.http_pool.pool_size_for(host)
+        return super()._new_pool(scheme, host, port, request_context=request_context)
+
+
+class PooledAdapter(HTTPAdapter):
+    """使用 SizedPoolManager 的 requests 适配器"""
+
+    def __init__(self, http_pool):
+        self.http_pool = http_pool
+        super().__init__(pool_connections=Config.HTTP_POOL_HOSTS,
+                         pool_maxsize=Config.HTTP_POOL_MAXSIZE)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = SizedPoolManager(self.http_pool, num_pools=connections, maxsize=maxsize,
+                                            block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        local = self.http_pool.local
+        connects = getattr(local, 'connects', 0)
+        response = super().send(request, **kwargs)
+        self.http_pool.stats.record('requests')
+        if getattr(local, 'connects', 0) == connects:
+            self.http_pool.stats.record('reused_connections')
+        return response
+
+
+class HttpPool:
+    """进程内共享的连接池管理器"""
+
+    def __init__(self):
+        self.stats = PoolStats()
+        self.local = threading.local()
+        self.dns_cache = DnsCache(Config.DNS_CACHE_TTL)
+        self.adapter = PooledAdapter(self)
+
+    def pool_size_for(self, host):
+        """该主机的连接池大小"""
+        return Config.HTTP_POOL_HOST_SIZES.get(registrable_domain(f'//{host}'), Config.HTTP_POOL_MAXSIZE)
+
+    def session(self):
+        """创建一个使用共享连接池的 requests 会话（请求头各自独立）"""
+        session = requests.Session()
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+
+# 进程内所有页面抓取和图片下载共用的连接池
+shared_pool = HttpPool()
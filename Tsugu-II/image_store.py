@@ -0,0 +1,141 @@
+"""商品图片存储
+
+图片边下载边写入临时文件，同时计算SHA-256，超过 MAX_IMAGE_SIZE 立即中止；
+下载完成后以内容哈希命名并原子地移动到图片目录，相同的图片只保存一份。
+每次下载只占用一个块大小的内存。
+安装了 Pillow 时，再按 Config.IMAGE_VARIANTS 生成 <哈希>_<用途>.webp 缩略图。
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from config import Config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/bmp': '.bmp'
+}
+URL_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
+
+
+def variant_path(relative_path, variant):
+    """图片某个变体的相对路径，如 product_images/<哈希>_card.webp"""
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    return f"product_images/{stem}_{variant}.webp"
+
+
+class ImageTooLarge(Exception):
+    """图片超过大小上限"""
+
+
+def image_extension(url, content_type=None):
+    """根据 Content-Type 或URL确定扩展名"""
+    if content_type:
+        extension = CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+        if extension:
+            return extension
+    for extension in URL_EXTENSIONS:
+        if extension in url.lower():
+            return '.jpg' if extension == '.jpeg' else extension
+    return '.jpg'
+
+
+class ImageStore:
+    """按内容哈希保存图片"""
+
+    def __init__(self, session, image_dir=None, max_size=None):
+        self.session = session
+        self.image_dir = image_dir or Config.IMAGE_DIR
+        self.max_size = max_size or Config.MAX_IMAGE_SIZE
+        self.logger = logging.getLogger('PriceCrawler')
+        os.makedirs(self.image_dir, exist_ok=True)
+
+    def download(self, image_url):
+        """下载图片，返回相对于 static 的路径（product_images/<哈希>.<扩展名>）"""
+        with self.session.get(image_url, timeout=Config.IMAGE_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                self.logger.error(f"下载图片失败，状态码: {response.status_code}")
+                return None
+
+            # 服务器声明的大小已超限时不必开始读取
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > self.max_size:
+                raise ImageTooLarge(f"图片大小 {declared} 字节超过上限 {self.max_size}")
+
+            extension = image_extension(image_url, response.headers.get('Content-Type'))
+            digest, temp_path = self._write_temp(response.iter_content(Config.IMAGE_CHUNK_SIZE))
+
+        filename = f"{digest}{extension}"
+        final_path = os.path.join(self.image_dir, filename)
+        if os.path.exists(final_path):
+            # 相同内容的图片已存在
+            os.remove(temp_path)
+            self.logger.info(f"图片已存在: {filename}")
+        else:
+            os.replace(temp_path, final_path)
+            self.logger.info(f"图片下载成功: {filename}")
+        return f"product_images/{filename}"
+
+    def _write_temp(self, chunks):
+        """把数据块写入图片目录下的临时文件，返回 (SHA-256, 临时文件路径)"""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.image_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise ImageTooLarge(f"图片超过大小上限 {self.max_size} 字节")
+                    hasher.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return hasher.hexdigest(), temp_path
+
+    def make_variants(self, relative_path):
+        """生成缩略图和WebP变体，返回已生成的变体名；未安装 Pillow 时不生成"""
+        if Image is None:
+            return []
+
+        source = os.path.join(self.image_dir, os.path.basename(relative_path))
+        created = []
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            for variant, size in Config.IMAGE_VARIANTS.items():
+                target = os.path.join(self.image_dir, os.path.basename(variant_path(relative_path, variant)))
+                if not os.path.exists(target):
+                    resized = image.copy()
+                    resized.thumbnail(size, Image.LANCZOS)
+                    fd, temp_path = tempfile.mkstemp(dir=self.image_dir, suffix='.part')
+                    try:
+                        with os.fdopen(fd, 'wb') as f:
+                            resized.save(f, 'WEBP', quality=Config.IMAGE_WEBP_QUALITY)
+                        os.replace(temp_path, target)
+                    except BaseException:
+                        os.remove(temp_path)
+                        raise
+                created.append(variant)
+        return created
+
+    def remove(self, relative_path):
+        """删除图片文件及其变体（调用方需确认已没有商品引用它）"""
+        names = [os.path.basename(relative_path)]
+        names += [os.path.basename(variant_path(relative_path, variant)) for variant in Config.IMAGE_VARIANTS]
+        for name in names:
+            path = os.path.join(self.image_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
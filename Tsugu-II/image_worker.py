@@ -0,0 +1,69 @@
+"""后台图片处理
+
+添加商品时只把图片地址放入队列，由后台线程下载原图、生成缩略图和WebP变体，
+完成后通过回调写回 image_path。
+"""
+import logging
+import queue
+import threading
+
+from config import Config
+from image_store import ImageTooLarge
+
+
+class ImageWorker:
+    """图片下载和处理的后台线程"""
+
+    def __init__(self, image_store, on_ready, workers=None, queue_size=None):
+        self.image_store = image_store
+        self.on_ready = on_ready
+        self.workers = workers or Config.IMAGE_WORKERS
+        self.queue = queue.Queue(maxsize=queue_size or Config.IMAGE_QUEUE_SIZE)
+        self.threads = []
+        self.logger = logging.getLogger('PriceCrawler')
+
+    def start(self):
+        """启动后台线程"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'image-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, product_id, image_url):
+        """提交一个图片任务，队列已满时返回 False"""
+        if not image_url:
+            return False
+        try:
+            self.queue.put_nowait((product_id, image_url))
+            return True
+        except queue.Full:
+            self.logger.warning(f"图片队列已满，跳过商品 {product_id} 的图片")
+            return False
+
+    def _run(self):
+        while True:
+            product_id, image_url = self.queue.get()
+            try:
+                self.process(product_id, image_url)
+            finally:
+                self.queue.task_done()
+
+    def process(self, product_id, image_url):
+        """下载原图、生成变体，成功后回调 on_ready(product_id, image_path)"""
+        try:
+            image_path = self.image_store.download(image_url)
+        except ImageTooLarge as e:
+            self.logger.warning(f"图片过大，跳过下载: {e}")
+            return
+        except Exception as e:
+            self.logger.error(f"下载图片失败: {e}")
+            return
+        if not image_path:
+            return
+
+        try:
+            self.image_store.make_variants(image_path)
+        except Exception as e:
+            # 变体生成失败时仍然使用原图
+            self.logger.warning(f"生成缩略图失败: {e}")
+        self.on_ready(product_id, image_path)
@@ -0,0 +1,161 @@
+"""SQLite 持久化爬取任务队列
+
+Web 进程按调度把到期的商品写入 crawl_jobs，独立的 crawl_worker.py 进程（可在多台机器上，
+共享同一个数据库文件）领取任务、抓取并回报结果：
+- 领取时在写事务中把任务标记为 leased，并写入租约持有者和到期时间，同一任务不会被两个进程领取；
+- 抓取期间由心跳线程续租；进程崩溃后租约过期，任务会被其他进程重新领取；
+- 完成时在同一个写事务中确认租约仍归自己所有，再写入结果，租约被收回的进程不会重复写入；
+- 超过 JOB_MAX_ATTEMPTS 次仍未完成的任务直接标记为失败，不再重试。
+已完成的任务保留结果，由 Web 进程的调度器收取后删除。crawl_jobs 表由 migrations.py 创建。
+"""
+import time
+from collections import namedtuple
+
+from config import Config
+from db_pool import ConnectionPool
+from migrations import migrate
+
+Job = namedtuple('Job', 'id product_id attempts')
+
+
+class JobQueue:
+    """基于租约的爬取任务队列"""
+
+    def __init__(self, db_path, lease_seconds=None, max_attempts=None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+        # 自动提交模式，写操作显式使用 BEGIN IMMEDIATE 取得写锁
+        self.pool = ConnectionPool(db_path, Config.DB_POOL_IDLE, 30, Config.DB_SYNCHRONOUS,
+                                   Config.DB_MMAP_SIZE, isolation_level=None)
+        # crawl_jobs 表由迁移创建，工作进程可能先于Web进程启动
+        with self._connect() as conn:
+            migrate(conn)
+
+    def _connect(self):
+        """从连接池取出连接，用 with 语句使用，结束时自动归还"""
+        return self.pool.connection()
+
+    def enqueue(self, product_ids, delay=0):
+        """为商品创建任务，已有未完成任务的商品跳过，返回新建的任务数"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO crawl_jobs (product_id, available_at, created_at)
+                VALUES (?, ?, ?)
+            ''', [(product_id, now + delay, now) for product_id in product_ids])
+            conn.execute('COMMIT')
+            return conn.total_changes - before
+
+    def claim(self, worker_id, limit):
+        """领取最多 limit 个可执行的任务（到期的 pending 任务和租约已过期的任务）"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('''
+                SELECT id, product_id, attempts FROM crawl_jobs
+                WHERE (status = 'pending' AND available_at <= ?)
+                   OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY available_at
+                LIMIT ?
+            ''', (now, now, limit)).fetchall()
+
+            jobs = []
+            for job_id, product_id, attempts in rows:
+                if attempts >= self.max_attempts:
+                    conn.execute('''
+                        UPDATE crawl_jobs SET status = 'done', lease_owner = NULL, error = ?, finished_at = ?
+                        WHERE id = ?
+                    ''', ('超过最大尝试次数', now, job_id))
+                    continue
+                conn.execute('''
+                    UPDATE crawl_jobs
+                    SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE id = ?
+                ''', (worker_id, now + self.lease_seconds, job_id))
+                jobs.append(Job(job_id, product_id, attempts + 1))
+            conn.execute('COMMIT')
+            return jobs
+
+    def heartbeat(self, worker_id, job_ids):
+        """为仍归自己所有的任务续租，返回续租成功的任务数"""
+        if not job_ids:
+            return 0
+        with self._connect() as conn:
+            cursor = conn.execute(f'''
+                UPDATE crawl_jobs SET lease_expires = ?
+                WHERE status = 'leased' AND lease_owner = ? AND id IN ({', '.join('?' * len(job_ids))})
+            ''', [time.time() + self.lease_seconds, worker_id, *job_ids])
+            return cursor.rowcount
+
+    def complete(self, worker_id, job_id, changed=False, price=None, error=None, write=None):
+        """完成任务
+
+        write(conn) 在确认租约后、同一个写事务中写入抓取结果。
+        租约已不归自己所有时不写入，返回 False。
+        """
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            owner = conn.execute('''
+                SELECT lease_owner FROM crawl_jobs WHERE id = ? AND status = 'leased'
+            ''', (job_id,)).fetchone()
+            if not owner or owner[0] != worker_id:
+                conn.execute('ROLLBACK')
+                return False
+            try:
+                if write:
+                    write(conn)
+                conn.execute('''
+                    UPDATE crawl_jobs
+                    SET status = 'done', lease_owner = NULL, changed = ?, price = ?, error = ?, finished_at = ?
+                    WHERE id = ?
+                ''', (int(bool(changed)), price, error, time.time(), job_id))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return True
+
+    def release(self, worker_id, job_id, delay=0, error=None):
+        """放回任务，delay 秒后可再次领取（如目标网站熔断中）"""
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                UPDATE crawl_jobs
+                SET status = 'pending', lease_owner = NULL, lease_expires = NULL, available_at = ?, error = ?
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (time.time() + delay, error, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def collect_finished(self, limit=1000):
+        """取出并删除已完成的任务，返回 [(product_id, changed, price, error)]"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('''
+                SELECT id, product_id, changed, price, error FROM crawl_jobs
+                WHERE status = 'done'
+                ORDER BY finished_at
+                LIMIT ?
+            ''', (limit,)).fetchall()
+            conn.executemany('DELETE FROM crawl_jobs WHERE id = ?', [(row[0],) for row in rows])
+            conn.execute('COMMIT')
+            return [(product_id, bool(changed), price, error) for _, product_id, changed, price, error in rows]
+
+    def stats(self):
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM crawl_jobs GROUP BY status').fetchall())
+            expired = conn.execute('''
+                SELECT COUNT(*) FROM crawl_jobs WHERE status = 'leased' AND lease_expires < ?
+            ''', (now,)).fetchone()[0]
+            workers = conn.execute('''
+                SELECT COUNT(DISTINCT lease_owner) FROM crawl_jobs WHERE status = 'leased' AND lease_expires >= ?
+            ''', (now,)).fetchone()[0]
+        return {
+            'pending': counts.get('pending', 0),
+            'leased': counts.get('leased', 0),
+            'done': counts.get('done', 0),
+            'expired_leases': expired,
+            'active_workers': workers
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from config import Config
+
+# 需要取三级域名的公共后缀
+MULTI_PART_SUFFIXES = {
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn',
+    'co.uk', 'co.jp', 'com.au', 'com.br', 'com.mx', 'co.in'
+}
+
+
+def registrable_domain(url):
+    """获取URL的可注册域名，例如 item.jd.com -> jd.com"""
+    host = (urlparse(url).hostname or '').lower()
+    labels = host.split('.')
+    if host.replace('.', '').isdigit() or len(labels) <= 2:
+        return host
+    if '.'.join(labels[-2:]) in MULTI_PART_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def platform_for_domain(domain):
+    """根据可注册域名判断平台"""
+    if domain == 'taobao.com':
+        return 'taobao'
+    elif domain == 'tmall.com':
+        return 'tmall'
+    elif domain == 'jd.com':
+        return 'jd'
+    elif domain in ('yangkeduo.com', 'pinduoduo.com'):
+        return 'pdd'
+    elif domain.startswith('amazon.'):
+        return 'amazon'
+    else:
+        return 'other'
+
+
+class TokenBucket:
+    """令牌桶
+
+    reserve() 立即预订一个令牌并返回需要等待的秒数，
+    令牌可以透支，等待时间由透支量决定，调用方自行睡眠。
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """预订一个令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def penalize(self, seconds):
+        """服务器要求退避（如429 Retry-After）时，让下一个令牌至少在 seconds 秒后才可用"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens = min(self.tokens, 0) - seconds * self.rate + 1
+
+
+class HostRateLimiter:
+    """按可注册域名限速
+
+    每个域名一个令牌桶，速率和突发容量取自 Config.RATE_LIMITS 中对应平台的配置。
+    只有目标域名的令牌用完时调用方才会等待。
+    """
+
+    def __init__(self, limits=None):
+        self.limits = limits or Config.RATE_LIMITS
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        """获取URL对应域名的令牌桶"""
+        domain = registrable_domain(url)
+        with self.lock:
+            bucket = self.buckets.get(domain)
+            if bucket is None:
+                limit = self.limits.get(platform_for_domain(domain), self.limits['other'])
+                bucket = TokenBucket(limit['rate'], limit['burst'])
+                self.buckets[domain] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """阻塞直到可以请求该URL，返回等待的秒数"""
+        wait = self.bucket_for(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, url, seconds):
+        """暂停该URL所在域名的请求 seconds 秒"""
+        self.bucket_for(url).penalize(seconds)
+
+    async def acquire_async(self, url):
+        """协程版本的 acquire，只挂起当前任务"""
+        wait = self.bucket_for(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+# 进程内所有爬虫共用的限速器
+shared_limiter = HostRateLimiter()
@@ -6,11 +6,36 @@ import sqlite3
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 from config import Config
+from rate_limiter import shared_limiter
+from http_cache import ValidatorCache
+from http_pool import shared_pool
+from image_store import ImageStore, ImageTooLarge
+from fetch_coalescer import FetchCoalescer
+from resilience import CircuitOpenError, RetryPolicy, RetryableError, retry_after_seconds, shared_breakers
+try:
+    from extraction import FastExtractor
+except ImportError:
+    # Windows 上不安装 lxml（见 requirements.txt），只使用 BeautifulSoup 解析
+    FastExtractor = None
+from selector_stats import SelectorStats
+try:
+    from streaming import StreamingPageReader
+except ImportError:
+    # 没有 lxml 时不做增量解析，整页下载后解析
+    StreamingPageReader = None
 
 class RealPriceCrawler:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, rate_limiter=None, http_cache=None, breakers=None, coalescer=None):
+        self.session = shared_pool.session()
         self.session.headers.update(Config.DEFAULT_HEADERS)
+        self.rate_limiter = rate_limiter or shared_limiter
+        self.breakers = breakers or shared_breakers
+        self.retry_policy = RetryPolicy(max_attempts=Config.MAX_RETRIES)
+        self.http_cache = http_cache or ValidatorCache(Config.HTTP_CACHE_PATH)
+        self.coalescer = coalescer or FetchCoalescer()
+        self.selector_stats = SelectorStats()
+        self.fast_extractor = FastExtractor(self) if FastExtractor else None
+        self.image_store = ImageStore(self.session)
         self.logger = self._setup_logger()
     
     def _setup_logger(self):
@@ -41,33 +66,104 @@ class RealPriceCrawler:
             return 'generic'
     
     def fetch_product_info(self, url: str) -> dict:
-        """获取商品信息"""
-        website_type = self.detect_website(url)
+        """获取商品信息
+
+        同一URL的并发调用只抓取一次，Config.FETCH_CACHE_TTL 秒内的成功结果直接返回。
+        """
+        return self.coalescer.fetch(url, self._fetch_product_info)
+    
+    def _fetch_product_info(self, url: str) -> dict:
+        """抓取商品信息
+
+        按 retry_policy 迭代重试，整个过程不超过 Config.FETCH_DEADLINE 秒；
+        目标域名处于熔断状态时不发请求，直接返回错误。
+        """
+        try:
+            return self.retry_policy.run(url, lambda remaining: self._fetch_once(url, remaining), self.breakers)
+        except CircuitOpenError as e:
+            self.logger.warning(str(e))
+            return {'error': '网站暂时无法访问', 'url': url, 'circuit_open': True}
+        except RetryableError as e:
+            self.logger.warning(f"请求失败: {url} {e}")
         
-        for attempt in range(Config.MAX_RETRIES):
-            try:
-                self.logger.info(f"获取商品信息: {url} (尝试 {attempt + 1})")
-                
-                response = self.session.get(url, timeout=Config.REQUEST_TIMEOUT)
-                
-                if response.status_code == 200:
-                    product_info = self.parse_product_info(response.text, url, website_type)
-                    if product_info.get('name') or product_info.get('price'):
+        return {'error': '获取商品信息失败', 'url': url}
+    
+    def _fetch_once(self, url: str, remaining: float) -> dict:
+        """发出一次请求，可重试的失败抛出 RetryableError"""
+        deadline = time.monotonic() + remaining
+        website_type = self.detect_website(url)
+        self.rate_limiter.acquire(url)
+        self.logger.info(f"获取商品信息: {url}")
+        try:
+            timeout = min(Config.REQUEST_TIMEOUT, max(deadline - time.monotonic(), 0.1))
+            response = self.session.get(url, timeout=timeout, stream=True,
+                                        headers=self.http_cache.conditional_headers(url))
+            with response:
+                if response.status_code == 304:
+                    self.logger.info(f"页面未变化: {url}")
+                    product_info = self.http_cache.record_hit(url)
+                    if product_info:
                         return product_info
+                    raise RetryableError('缓存缺失', host_failure=False)
                 
-                elif response.status_code == 429:
-                    wait_time = (attempt + 1) * 10
-                    self.logger.warning(f"请求过于频繁，等待 {wait_time}秒")
-                    time.sleep(wait_time)
-                else:
+                if response.status_code == 429:
+                    retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+                    self.logger.warning(f"请求过于频繁，{retry_after:.0f}秒后重试")
+                    # 暂停该域名的后续请求，其他网站不受影响
+                    self.rate_limiter.penalize(url, retry_after)
+                    raise RetryableError('HTTP 429', host_failure=False, retry_after=retry_after)
+                if response.status_code >= 500:
+                    raise RetryableError(f"HTTP错误: {response.status_code}")
+                if response.status_code != 200:
                     self.logger.error(f"HTTP错误: {response.status_code}")
-                    
-            except requests.exceptions.RequestException as e:
-                self.logger.warning(f"请求异常: {e}")
-            
-            time.sleep(Config.RETRY_DELAY ** attempt)
+                    raise RetryableError(f"HTTP错误: {response.status_code}", host_failure=False)
+                
+                if StreamingPageReader is None:
+                    product_info, body_size, parse_time, digests = self.read_product_page(
+                        url, website_type, response.headers, response.content, response.encoding)
+                else:
+                    reader = StreamingPageReader(self, url, website_type, response.headers)
+                    product_info = self.read_product_stream(
+                        reader, response.iter_content(Config.STREAM_CHUNK_SIZE), response.encoding)
+                    body_size, parse_time, digests = reader.bytes_read, reader.parse_time, reader.digests
+        except requests.exceptions.RequestException as e:
+            raise RetryableError(f"请求异常: {e}")
         
-        return {'error': '获取商品信息失败', 'url': url}
+        if not (product_info.get('name') or product_info.get('price')):
+            raise RetryableError('未解析到商品信息', host_failure=False)
+        self.http_cache.store(url, response.headers, product_info, body_size, parse_time, digests)
+        return product_info
+    
+    def read_product_stream(self, reader, chunks, encoding: str = None) -> dict:
+        """边下载边解析，信息完整或达到字节预算时停止读取"""
+        for chunk in chunks:
+            product_info = reader.feed(chunk)
+            if product_info:
+                self.logger.info(f"提前结束读取: {reader.url} ({reader.bytes_read} 字节)")
+                return product_info
+            if reader.exhausted:
+                self.logger.info(f"达到字节预算: {reader.url} ({reader.budget} 字节)")
+                break
+        return reader.finish(encoding)
+
+    def read_product_page(self, url: str, website_type: str, headers, body: bytes, encoding: str = None):
+        """非流式读取（没有 lxml 时）：返回 (商品信息, 字节数, 解析耗时, 内容摘要)"""
+        started = time.perf_counter()
+        digests = None
+        if self.http_cache.needs_digest(url, headers):
+            product_info, digests = self.http_cache.match_digest(url, body)
+            if product_info:
+                self.logger.info(f"页面内容未变化: {url}")
+                return product_info, len(body), time.perf_counter() - started, digests
+        product_info = self.parse_product_content(body, encoding, url, website_type)
+        return product_info, len(body), time.perf_counter() - started, digests
+
+    def parse_product_content(self, body: bytes, encoding: str, url: str, website_type: str) -> dict:
+        """解析页面内容：优先走 lxml 快速路径，找不到（或没有安装 lxml）时回退到 BeautifulSoup"""
+        product_info = self.fast_extractor.extract(body, url, website_type) if self.fast_extractor else None
+        if product_info:
+            return product_info
+        return self.parse_product_info(body.decode(encoding or 'utf-8', errors='replace'), url, website_type)
     
     def parse_product_info(self, html: str, url: str, website_type: str) -> dict:
         """解析商品信息"""
@@ -86,34 +182,39 @@ class RealPriceCrawler:
         site_config = Config.SITE_CONFIGS.get(website_type, {})
         
         # 解析商品名称
-        product_info['name'] = self._find_element(soup, site_config.get('name_selectors', []))
+        product_info['name'] = self._find_element(soup, website_type, 'name', site_config.get('name_selectors', []))
         
         # 解析价格
-        price_text = self._find_element(soup, site_config.get('price_selectors', []))
+        price_text = self._find_element(soup, website_type, 'price', site_config.get('price_selectors', []))
         product_info['price'] = self._clean_price(price_text) if price_text else None
         
         # 解析图片
-        product_info['image_url'] = self._find_image(soup, site_config.get('image_selectors', []))
+        product_info['image_url'] = self._find_image(soup, website_type, site_config.get('image_selectors', []))
         
         return product_info
     
-    def _find_element(self, soup, selectors: list) -> str:
-        """使用选择器查找元素"""
+    def _find_element(self, soup, website_type: str, field: str, selectors: list) -> str:
+        """使用选择器查找元素，按历史命中次数决定尝试顺序"""
+        selectors = self.selector_stats.order(website_type, field, selectors)
         for selector in selectors:
             try:
                 element = soup.select_one(selector)
                 if element and element.get_text().strip():
+                    self.selector_stats.record(website_type, field, selectors, selector)
                     return element.get_text().strip()
             except Exception as e:
                 continue
+        self.selector_stats.record(website_type, field, selectors)
         return None
     
-    def _find_image(self, soup, selectors: list) -> str:
+    def _find_image(self, soup, website_type: str, selectors: list) -> str:
         """查找商品图片"""
+        selectors = self.selector_stats.order(website_type, 'image', selectors)
         for selector in selectors:
             try:
                 img_element = soup.select_one(selector)
                 if img_element and img_element.get('src'):
+                    self.selector_stats.record(website_type, 'image', selectors, selector)
                     src = img_element.get('src')
                     if src.startswith('//'):
                         return 'https:' + src
@@ -123,6 +224,7 @@ class RealPriceCrawler:
                         return 'https:' + src if src.startswith('/') else src
             except Exception:
                 continue
+        self.selector_stats.record(website_type, 'image', selectors)
         return None
     
     def _clean_price(self, price_text: str) -> float:
@@ -152,27 +254,15 @@ class RealPriceCrawler:
         return None
     
     def download_image(self, image_url: str, product_id: int) -> str:
-        """下载商品图片"""
+        """下载商品图片，文件按内容哈希命名，相同图片只保存一份"""
         if not image_url:
             return None
         
         try:
-            response = self.session.get(image_url, timeout=10)
-            if response.status_code == 200:
-                # 确保static/product_images目录存在
-                import os
-                image_dir = 'static/product_images'
-                os.makedirs(image_dir, exist_ok=True)
-                
-                # 保存图片
-                filename = f"product_{product_id}.jpg"
-                filepath = os.path.join(image_dir, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                return f"product_images/{filename}"
+            return self.image_store.download(image_url)
+        except ImageTooLarge as e:
+            self.logger.warning(f"图片过大，跳过下载: {e}")
         except Exception as e:
             self.logger.error(f"下载图片失败: {e}")
         
-        return None
\ No newline at end of file
+        return None
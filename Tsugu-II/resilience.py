@@ -0,0 +1,204 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from config import Config
+from rate_limiter import registrable_domain
+
+
+class RetryableError(Exception):
+    """可以重试的失败
+
+    host_failure 表示这次失败是否说明目标主机有问题（超时、连接失败、5xx），
+    只有这类失败会计入熔断器；429 等限流响应不计入。
+    retry_after 为服务器要求的最短等待秒数。
+    """
+
+    def __init__(self, message, host_failure=True, retry_after=0.0):
+        super().__init__(message)
+        self.host_failure = host_failure
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求未发出"""
+
+
+class CircuitBreaker:
+    """单个主机的熔断器
+
+    closed：正常请求，连续失败达到阈值后打开；
+    open：直接拒绝请求，经过 reset_timeout 秒后转为 half_open；
+    half_open：只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """是否可以发出请求"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self.probing = False
+            # half_open：同一时间只放行一个探测请求
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """请求未得出结论（如429）时释放探测名额"""
+        with self.lock:
+            self.probing = False
+
+    def to_dict(self):
+        with self.lock:
+            return {'state': self.state, 'failures': self.failures}
+
+
+class HostCircuitBreakers:
+    """按可注册域名管理熔断器，与限速器使用同样的域名粒度"""
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.BREAKER_RESET_TIMEOUT
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def breaker_for(self, url):
+        """获取URL对应域名的熔断器"""
+        domain = registrable_domain(url)
+        with self.lock:
+            breaker = self.breakers.get(domain)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.breakers[domain] = breaker
+            return breaker
+
+    def stats(self):
+        """各域名熔断器状态"""
+        with self.lock:
+            breakers = dict(self.breakers)
+        return {domain: breaker.to_dict() for domain, breaker in breakers.items()}
+
+
+class RetryPolicy:
+    """迭代重试策略
+
+    每次抓取有一个总截止时间，重试间隔为带抖动的指数退避（full jitter），
+    剩余时间不够等待下一次重试时立即放弃。
+    attempt(remaining) 接收本次尝试可用的剩余秒数，可重试的失败应抛出 RetryableError。
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, deadline=None):
+        self.max_attempts = max_attempts or Config.MAX_RETRIES + 1
+        self.base_delay = base_delay or Config.RETRY_BASE_DELAY
+        self.max_delay = max_delay or Config.RETRY_MAX_DELAY
+        self.deadline = deadline or Config.FETCH_DEADLINE
+
+    def backoff(self, attempt):
+        """第 attempt 次失败后的等待秒数"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, url, attempt, breakers):
+        """同步执行，等待时只阻塞当前线程"""
+        deadline = time.monotonic() + self.deadline
+        breaker = breakers.breaker_for(url)
+        for attempt_no in range(self.max_attempts):
+            self._check_breaker(breaker, url)
+            try:
+                result = attempt(deadline - time.monotonic())
+            except RetryableError as e:
+                delay = self._on_failure(breaker, e, attempt_no, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except Exception:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return result
+
+    async def run_async(self, url, attempt, breakers):
+        """协程版本，退避时只挂起当前任务，不影响其他主机的请求"""
+        deadline = time.monotonic() + self.deadline
+        breaker = breakers.breaker_for(url)
+        for attempt_no in range(self.max_attempts):
+            self._check_breaker(breaker, url)
+            try:
+                result = await attempt(deadline - time.monotonic())
+            except RetryableError as e:
+                delay = self._on_failure(breaker, e, attempt_no, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return result
+
+    def _check_breaker(self, breaker, url):
+        if not breaker.allow():
+            raise CircuitOpenError(f"熔断中，跳过 {registrable_domain(url)}: {url}")
+
+    def _on_failure(self, breaker, error, attempt_no, deadline):
+        """记录失败并返回下次重试前的等待秒数，不再重试时返回 None"""
+        if error.host_failure:
+            breaker.record_failure()
+        else:
+            breaker.release()
+        if attempt_no + 1 >= self.max_attempts:
+            return None
+        delay = max(self.backoff(attempt_no), error.retry_after)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+def retry_after_seconds(value):
+    """解析 Retry-After 头（秒数或HTTP日期），缺失或无法解析时返回 RETRY_BASE_DELAY"""
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return Config.RETRY_BASE_DELAY
+
+
+# 进程内所有爬虫共用的熔断器
+shared_breakers = HostCircuitBreakers()
@@ -0,0 +1,91 @@
+"""选择器命中统计与自适应排序
+
+各平台的名称/价格/图片选择器按配置顺序逐个尝试，当前页面布局下命中的往往排在最后。
+这里按 (平台, 字段) 记录每个选择器的尝试和命中次数：
+- order() 按历史命中次数从高到低排列选择器（次数相同时保持配置顺序），
+  以 SELECTOR_EXPLORE_RATE 的概率仍按配置顺序尝试，页面改版后新的命中选择器能重新排到前面；
+- 每次提取结束调用 record()，命中选择器之前尝试过的都记为未命中；
+- stats() 输出每个选择器的命中率，从不命中的选择器可以从配置中删除。
+解析进程池中的工作进程用 export=True 创建，drain() 取出新增的记录随解析结果返回，
+由主进程 merge() 汇总。
+"""
+import random
+import threading
+
+from config import Config
+
+
+class SelectorStats:
+    """按 (平台, 字段) 统计选择器命中情况"""
+
+    def __init__(self, explore_rate=None, export=False):
+        self.explore_rate = Config.SELECTOR_EXPLORE_RATE if explore_rate is None else explore_rate
+        self.pending = [] if export else None
+        self.lock = threading.Lock()
+        self.tries = {}  # (平台, 字段) -> {选择器: 尝试次数}
+        self.hits = {}  # (平台, 字段) -> {选择器: 命中次数}
+        self.extractions = {}  # (平台, 字段) -> 提取次数
+        self.rng = random.Random()
+
+    def order(self, platform, field, selectors, key=None):
+        """返回本次尝试的顺序；key 用于从 selectors 的元素中取出选择器字符串"""
+        hits = self.hits.get((platform, field))
+        if not hits or self.rng.random() < self.explore_rate:
+            return selectors
+        if key is None:
+            return sorted(selectors, key=lambda selector: -hits.get(selector, 0))
+        return sorted(selectors, key=lambda item: -hits.get(key(item), 0))
+
+    def record(self, platform, field, ordered, hit=None):
+        """记录一次提取：ordered 为本次尝试的顺序，hit 为命中的选择器（都未命中时为 None）"""
+        tried = ordered[:ordered.index(hit) + 1] if hit is not None else ordered
+        if not tried:
+            return
+        with self.lock:
+            self._apply(platform, field, tried, hit)
+            if self.pending is not None:
+                self.pending.append((platform, field, tried, hit))
+
+    def drain(self):
+        """取出上次 drain() 之后新增的记录"""
+        with self.lock:
+            pending, self.pending = self.pending, []
+            return pending
+
+    def merge(self, records):
+        """汇总其他进程 drain() 得到的记录"""
+        with self.lock:
+            for platform, field, tried, hit in records:
+                self._apply(platform, field, tried, hit)
+
+    def _apply(self, platform, field, tried, hit):
+        """累加计数，调用方需持有 lock"""
+        stat_key = (platform, field)
+        tries = self.tries.setdefault(stat_key, {})
+        for selector in tried:
+            tries[selector] = tries.get(selector, 0) + 1
+        if hit is not None:
+            hits = self.hits.setdefault(stat_key, {})
+            hits[hit] = hits.get(hit, 0) + 1
+        self.extractions[stat_key] = self.extractions.get(stat_key, 0) + 1
+
+    def stats(self):
+        """各平台、字段的每次提取平均尝试次数，以及每个选择器的尝试/命中次数"""
+        with self.lock:
+            result = {}
+            for (platform, field), tries in self.tries.items():
+                hits = self.hits.get((platform, field), {})
+                extractions = self.extractions[(platform, field)]
+                result.setdefault(platform, {})[field] = {
+                    'extractions': extractions,
+                    'lookups_per_extraction': round(sum(tries.values()) / extractions, 3),
+                    'selectors': {
+                        selector: {
+                            'tries': count,
+                            'hits': hits.get(selector, 0),
+                            'hit_rate': round(hits.get(selector, 0) / count, 3)
+                        }
+                        for selector, count in tries.items()
+                    }
+                }
+            return result
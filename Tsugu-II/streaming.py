@@ -0,0 +1,97 @@
+# streaming.py
+"""流式读取商品页面
+
+边下载边把数据交给 lxml 增量解析器，名称、价格、图片都已提取到，
+或者读取量达到该网站的字节预算时就停止读取。
+需要内容摘要时总是读到末尾（或预算）以计算摘要，内容与上次相同时不再解析。
+"""
+import time
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from config import Config
+
+
+class StreamingPageReader:
+    """流式页面读取器"""
+
+    def __init__(self, crawler, url: str, website_type: str, headers=None):
+        self.crawler = crawler
+        self.url = url
+        self.website_type = website_type
+        budgets = Config.PAGE_BYTE_BUDGETS
+        self.budget = budgets.get(website_type, budgets['generic'])
+        self.buffer = bytearray()
+        # 只需要根节点，之后直接在文档树上执行XPath
+        self.parser = etree.HTMLPullParser(events=('start',), tag='html', encoding='utf-8')
+        self.parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+        self.root = None
+        self.stopped_early = False
+        self.parse_time = 0.0
+        # 内容摘要需要覆盖整个页面，提取到信息后仍继续读取；
+        # 已有该页面的摘要时内容多半未变化，先读完比较摘要，不做增量提取
+        self.digest_mode = crawler.http_cache.needs_digest(url, headers or {})
+        self.defer_parse = self.digest_mode and crawler.http_cache.has_digest(url)
+        self.digests = None
+        self.early_result = None
+
+    @property
+    def bytes_read(self) -> int:
+        return len(self.buffer)
+
+    @property
+    def exhausted(self) -> bool:
+        """是否已达到字节预算"""
+        return len(self.buffer) >= self.budget
+
+    def feed(self, chunk: bytes) -> dict:
+        """喂入一块数据，名称、价格、图片都已提取到时返回商品信息，否则返回 None"""
+        started = time.perf_counter()
+        try:
+            self.buffer += chunk
+            if self.defer_parse or self.early_result:
+                return None
+            self.parser.feed(chunk)
+            for _, element in self.parser.read_events():
+                self.root = element
+            if self.root is None:
+                return None
+
+            product_info = self.crawler.fast_extractor.extract_from_doc(
+                self.root, self.url, self.website_type, open_elements=self._open_elements())
+            if product_info and product_info['name'] and product_info['price'] and product_info['image_url']:
+                if self.digest_mode:
+                    self.early_result = product_info
+                    return None
+                self.stopped_early = True
+                return product_info
+            return None
+        finally:
+            self.parse_time += time.perf_counter() - started
+
+    def finish(self, encoding: str = None) -> dict:
+        """读到末尾或达到预算后，内容与上次相同时返回上次的解析结果（not_modified），
+        否则使用已提取到的信息或做完整解析"""
+        started = time.perf_counter()
+        try:
+            body = bytes(self.buffer)
+            if self.digest_mode:
+                product_info, self.digests = self.crawler.http_cache.match_digest(self.url, body)
+                if product_info:
+                    self.crawler.logger.info(f"页面内容未变化: {self.url}")
+                    return product_info
+            if self.early_result:
+                return self.early_result
+            return self.crawler.parse_product_content(body, encoding, self.url, self.website_type)
+        finally:
+            self.parse_time += time.perf_counter() - started
+
+    def _open_elements(self) -> set:
+        """尚未闭合的元素：从根节点沿最后一个子节点向下的路径，其余元素都已解析完"""
+        open_elements = set()
+        element = self.root
+        while element is not None:
+            open_elements.add(element)
+            element = element[-1] if len(element) else None
+        return open_elements
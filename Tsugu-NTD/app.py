@@ -1,16 +1,21 @@
 # app.py
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
 import os
-import sqlite3
 from datetime import datetime, timedelta
 import random
 import math
+from batch_writer import BatchWriter
+from db_pool import ConnectionPool
+from migrations import migrate
+from static_assets import StaticAssets
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'demo-secret-key'
+# 静态资源使用带指纹的地址和长期缓存
+static_assets = StaticAssets(app)
 
 # 配置
 class Config:
@@ -21,6 +26,7 @@ class Config:
 class DemoDataGenerator:
     def __init__(self, db_path='products.db'):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
         
         # 商品数据
         self.products = [
@@ -215,100 +221,70 @@ class DemoDataGenerator:
         image.save(filepath, 'JPEG', quality=85)
     
     def init_database(self):
-        """初始化数据库表"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            # 商品表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    url TEXT UNIQUE NOT NULL,
-                    current_price REAL,
-                    target_price REAL,
-                    image_path TEXT,
-                    website_type TEXT,
-                    category TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # 价格历史表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS price_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_id INTEGER,
-                    price REAL NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (product_id) REFERENCES products (id)
-                )
-            ''')
-            
-            conn.commit()
-            print("✅ 数据库初始化完成")
-        except Exception as e:
-            print(f"❌ 初始化数据库失败: {e}")
-        finally:
-            conn.close()
+        """初始化数据库表：执行尚未应用的结构迁移"""
+        with self.pool.connection() as conn:
+            try:
+                for version, description in migrate(conn):
+                    print(f"🗄️ 数据库结构升级到第 {version} 版: {description}")
+                print("✅ 数据库初始化完成")
+            except Exception as e:
+                print(f"❌ 初始化数据库失败: {e}")
     
     def add_demo_products(self):
         """添加演示商品到数据库"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            for product in self.products:
-                # 设置目标价格（比基础价格低10-30%）
-                target_discount = random.uniform(0.1, 0.3)
-                target_price = product['base_price'] * (1 - target_discount)
-                
-                # 初始当前价格（在基础价格附近波动）
-                initial_price = product['base_price'] * random.uniform(0.95, 1.05)
-                
-                # 构建图片路径
-                image_path = f"product_images/{product['image_filename']}"
-                
-                # 检查图片是否存在，如果不存在使用在线图片
-                target_image_path = os.path.join(self.image_target_dir, product['image_filename'])
-                if not os.path.exists(target_image_path) and 'online_image' in product:
-                    image_path = product['online_image']
-                
-                # 检查是否已存在
-                existing = conn.execute(
-                    'SELECT id FROM products WHERE url = ?', 
-                    (product['url'],)
-                ).fetchone()
-                
-                if not existing:
-                    # 插入商品
-                    cursor = conn.execute('''
-                        INSERT INTO products 
-                        (name, url, current_price, target_price, image_path, website_type, category)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        product['name'],
-                        product['url'],
-                        round(initial_price, 2),
-                        round(target_price, 2),
-                        image_path,
-                        'demo',
-                        product['category']
-                    ))
+        with self.pool.connection() as conn:
+            try:
+                for product in self.products:
+                    # 设置目标价格（比基础价格低10-30%）
+                    target_discount = random.uniform(0.1, 0.3)
+                    target_price = product['base_price'] * (1 - target_discount)
                     
-                    product_id = cursor.lastrowid
+                    # 初始当前价格（在基础价格附近波动）
+                    initial_price = product['base_price'] * random.uniform(0.95, 1.05)
                     
-                    # 生成价格历史数据
-                    self.generate_price_history(conn, product_id, product)
+                    # 构建图片路径
+                    image_path = f"product_images/{product['image_filename']}"
                     
-                    print(f"✅ 添加商品: {product['name']}")
-                else:
-                    print(f"⏭️  商品已存在: {product['name']}")
-            
-            conn.commit()
-            print("✅ 所有演示商品添加完成！")
-        except Exception as e:
-            print(f"❌ 添加演示商品失败: {e}")
-        finally:
-            conn.close()
+                    # 检查图片是否存在，如果不存在使用在线图片
+                    target_image_path = os.path.join(self.image_target_dir, product['image_filename'])
+                    if not os.path.exists(target_image_path) and 'online_image' in product:
+                        image_path = product['online_image']
+                    
+                    # 检查是否已存在
+                    existing = conn.execute(
+                        'SELECT id FROM products WHERE url = ?', 
+                        (product['url'],)
+                    ).fetchone()
+                    
+                    if not existing:
+                        # 插入商品
+                        cursor = conn.execute('''
+                            INSERT INTO products 
+                            (name, url, current_price, target_price, image_path, website_type, category)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ''', (
+                            product['name'],
+                            product['url'],
+                            round(initial_price, 2),
+                            round(target_price, 2),
+                            image_path,
+                            'demo',
+                            product['category']
+                        ))
+                        
+                        product_id = cursor.lastrowid
+                        
+                        # 生成价格历史数据
+                        self.generate_price_history(conn, product_id, product)
+                        
+                        print(f"✅ 添加商品: {product['name']}")
+                    else:
+                        print(f"⏭️  商品已存在: {product['name']}")
+                
+                conn.commit()
+                print("✅ 所有演示商品添加完成！")
+            except Exception as e:
+                print(f"❌ 添加演示商品失败: {e}")
     
     def generate_price_history(self, conn, product_id, product):
         """生成价格历史数据"""
@@ -377,77 +353,79 @@ demo_generator = DemoDataGenerator()
 class DatabaseManager:
     def __init__(self, db_path: str = Config.DATABASE_PATH):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
+        # 价格更新由单个写线程批量写入
+        self.writer = BatchWriter(self.pool)
+        # 上次 flush() 之后更新过价格的商品
+        self.unflushed = set()
+        # 已有的数据库在启动时升级到最新结构
+        with self.pool.connection() as conn:
+            migrate(conn)
     
     def _get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        """从连接池取出连接，用 with 语句使用，结束时自动归还"""
+        return self.pool.connection()
     
     def get_all_products(self):
         """获取所有商品"""
-        conn = self._get_connection()
-        try:
-            cursor = conn.execute('''
-                SELECT id, name, url, current_price, target_price, image_path, website_type,
-                       created_at, updated_at
-                FROM products 
-                ORDER BY updated_at DESC
-            ''')
-            return cursor.fetchall()
-        except Exception as e:
-            print(f"获取商品列表错误: {e}")
-            return []
-        finally:
-            conn.close()
+        with self._get_connection() as conn:
+            try:
+                cursor = conn.execute('''
+                    SELECT id, name, url, current_price, target_price, image_path, website_type,
+                           created_at, updated_at
+                    FROM products 
+                    ORDER BY updated_at DESC
+                ''')
+                return cursor.fetchall()
+            except Exception as e:
+                print(f"获取商品列表错误: {e}")
+                return []
     
     def get_price_history(self, product_id: int, limit: int = 30):
         """获取价格历史"""
-        conn = self._get_connection()
-        try:
-            cursor = conn.execute('''
-                SELECT price, created_at 
-                FROM price_history 
-                WHERE product_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (product_id, limit))
-            return cursor.fetchall()
-        except Exception as e:
-            print(f"获取价格历史错误: {e}")
-            return []
-        finally:
-            conn.close()
+        with self._get_connection() as conn:
+            try:
+                cursor = conn.execute('''
+                    SELECT price, created_at 
+                    FROM price_history 
+                    WHERE product_id = ? 
+                    ORDER BY created_at DESC 
+                    LIMIT ?
+                ''', (product_id, limit))
+                return cursor.fetchall()
+            except Exception as e:
+                print(f"获取价格历史错误: {e}")
+                return []
     
     def add_demo_product(self, name: str, url: str, target_price: float = None):
         """添加演示商品"""
-        conn = self._get_connection()
-        try:
-            # 基础价格（比目标价格高一些）
-            base_price = target_price * 1.2 if target_price else random.uniform(1000, 5000)
-            current_price = base_price * random.uniform(0.9, 1.1)
-            
-            # 为新商品生成图片
-            image_filename = f"custom_{random.randint(1000, 9999)}.jpg"
-            image_path = f"product_images/{image_filename}"
-            
-            cursor = conn.execute('''
-                INSERT INTO products (name, url, current_price, target_price, image_path, website_type)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (name, url, round(current_price, 2), target_price, 
-                  image_path, 
-                  "demo"))
-            
-            product_id = cursor.lastrowid
-            
-            # 生成价格历史
-            self._generate_price_history(conn, product_id, base_price)
-            
-            conn.commit()
-            return product_id
-        except Exception as e:
-            print(f"添加演示商品失败: {e}")
-            return None
-        finally:
-            conn.close()
+        with self._get_connection() as conn:
+            try:
+                # 基础价格（比目标价格高一些）
+                base_price = target_price * 1.2 if target_price else random.uniform(1000, 5000)
+                current_price = base_price * random.uniform(0.9, 1.1)
+                
+                # 为新商品生成图片
+                image_filename = f"custom_{random.randint(1000, 9999)}.jpg"
+                image_path = f"product_images/{image_filename}"
+                
+                cursor = conn.execute('''
+                    INSERT INTO products (name, url, current_price, target_price, image_path, website_type)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (name, url, round(current_price, 2), target_price, 
+                      image_path, 
+                      "demo"))
+                
+                product_id = cursor.lastrowid
+                
+                # 生成价格历史
+                self._generate_price_history(conn, product_id, base_price)
+                
+                conn.commit()
+                return product_id
+            except Exception as e:
+                print(f"添加演示商品失败: {e}")
+                return None
     
     def _generate_price_history(self, conn, product_id: int, base_price: float):
         """为新产品生成价格历史"""
@@ -465,59 +443,64 @@ class DatabaseManager:
             ''', (product_id, round(price, 2), date))
     
     def update_product_price(self, product_id: int):
-        """更新商品价格（模拟价格变化）"""
-        conn = self._get_connection()
-        try:
-            # 获取当前价格
-            result = conn.execute(
-                'SELECT current_price FROM products WHERE id = ?', 
-                (product_id,)
-            ).fetchone()
-            
-            if not result:
-                return None
+        """更新商品价格（模拟价格变化），写入由写线程批量提交
+
+        新价格在SQL中按写入时的价格计算，同一商品的上一次更新还在写队列中时也不会丢失；
+        读到的价格只用于计算返回值，该商品有未写入的更新时先 flush() 再读取。
+        """
+        if product_id in self.unflushed:
+            self.flush()
+        with self._get_connection() as conn:
+            try:
+                # 获取当前价格
+                result = conn.execute(
+                    'SELECT current_price FROM products WHERE id = ?', 
+                    (product_id,)
+                ).fetchone()
                 
-            current_price = result[0]
-            
-            # 生成新的价格（小幅度波动）
-            change_percent = random.uniform(-0.05, 0.05)  # -5% 到 +5%
-            new_price = current_price * (1 + change_percent)
-            new_price = round(new_price, 2)
-            
-            # 更新商品价格
-            conn.execute('''
-                UPDATE products 
-                SET current_price = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (new_price, product_id))
-            
-            # 添加价格历史记录
-            conn.execute('''
-                INSERT INTO price_history (product_id, price)
-                VALUES (?, ?)
-            ''', (product_id, new_price))
-            
-            conn.commit()
-            return new_price
-        except Exception as e:
-            print(f"更新商品价格失败: {e}")
-            return None
-        finally:
-            conn.close()
+                if not result:
+                    return None
+                    
+                current_price = result[0]
+                
+                # 生成新的价格（小幅度波动）
+                change_percent = random.uniform(-0.05, 0.05)  # -5% 到 +5%
+                new_price = round(current_price * (1 + change_percent), 2)
+                
+                # 更新商品价格
+                self.writer.execute('''
+                    UPDATE products 
+                    SET current_price = round(current_price * ?, 2), updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (1 + change_percent, product_id))
+                
+                # 添加价格历史记录：写线程按提交顺序执行，读到的是上一条语句更新后的价格
+                self.writer.execute('''
+                    INSERT INTO price_history (product_id, price)
+                    SELECT id, current_price FROM products WHERE id = ?
+                ''', (product_id,))
+                self.unflushed.add(product_id)
+                return new_price
+            except Exception as e:
+                print(f"更新商品价格失败: {e}")
+                return None
+    
+    def flush(self):
+        """等待已提交的价格更新全部写入数据库"""
+        self.unflushed.clear()
+        self.writer.flush()
     
     def delete_product(self, product_id: int):
         """删除商品"""
-        conn = self._get_connection()
-        try:
-            conn.execute('DELETE FROM price_history WHERE product_id = ?', (product_id,))
-            conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"删除商品失败: {e}")
-            return False
-        finally:
-            conn.close()
+        with self._get_connection() as conn:
+            try:
+                # 价格历史由外键级联删除
+                conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
+                conn.commit()
+                return True
+            except Exception as e:
+                print(f"删除商品失败: {e}")
+                return False
 
 # 初始化数据库管理器
 db_manager = DatabaseManager()
@@ -557,6 +540,7 @@ def update_all_prices_demo():
                     updated_count += 1
                     print(f"演示价格更新: {product[1]} - ¥{new_price}")
         
+        db_manager.flush()
         print(f"演示模式: 更新了 {updated_count}/{len(products)} 个商品的价格")
     except Exception as e:
         print(f"演示价格更新失败: {e}")
@@ -618,6 +602,7 @@ def check_price(product_id):
     """手动检查价格（演示版）"""
     try:
         new_price = db_manager.update_product_price(product_id)
+        db_manager.flush()
         
         if new_price is not None:
             return jsonify({
@@ -663,9 +648,13 @@ def delete_product(product_id):
 def reset_demo_data():
     """重置演示数据"""
     try:
-        # 删除数据库文件
-        if os.path.exists(Config.DATABASE_PATH):
-            os.remove(Config.DATABASE_PATH)
+        # 等待批量写入完成并关闭连接池中的连接，再删除数据库文件和 WAL 日志
+        db_manager.flush()
+        demo_generator.pool.close_all()
+        db_manager.pool.close_all()
+        for path in (Config.DATABASE_PATH, Config.DATABASE_PATH + '-wal', Config.DATABASE_PATH + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
         
         # 重新初始化演示数据
         demo_generator.setup_demo_data()
@@ -687,10 +676,10 @@ def update_all_prices_manual():
 def serve_product_image(filename):
     """提供商品图片"""
     try:
-        return send_from_directory('static/product_images', filename)
+        return static_assets.send('static/product_images', filename)
     except Exception as e:
         # 如果图片不存在，返回默认图片
-        return send_from_directory('static', 'default-product.jpg')
+        return static_assets.send('static', 'default-product.jpg')
 
 # 错误处理
 @app.errorhandler(404)
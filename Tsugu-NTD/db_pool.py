@@ -0,0 +1,104 @@
+"""SQLite 连接池
+
+每次访问数据库都新建连接，要重新打开文件、读取表结构；后台线程和请求线程同时写入时，
+默认的回滚日志模式下读写互相阻塞，很容易遇到 database is locked。
+ConnectionPool 复用连接，每个连接创建时统一设置：
+- journal_mode=WAL：读不阻塞写，写也不阻塞读；
+- busy_timeout：遇到写锁时等待，而不是立即报错；
+- synchronous=NORMAL：WAL 模式下只在检查点同步磁盘，断电可能丢失最近的事务，但不会损坏数据库；
+- mmap_size：通过内存映射读取页面，减少系统调用和复制；
+- foreign_keys=ON：SQLite 默认不检查外键，打开后删除商品时才会级联删除价格历史等记录。
+同一线程嵌套获取时得到同一个连接；最外层用完后回滚未提交的事务，连接归还到空闲列表，
+由之后的线程复用（Flask 开发服务器每个请求一个新线程，连接不能绑定在线程上）。
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUSY_TIMEOUT = 5.0
+SYNCHRONOUS = 'NORMAL'
+MMAP_SIZE = 64 * 1024 * 1024
+MAX_IDLE = 8
+
+
+class ConnectionPool:
+    """按线程分配、用完归还的 SQLite 连接池"""
+
+    def __init__(self, db_path, max_idle=None, busy_timeout=None, synchronous=None, mmap_size=None,
+                 isolation_level=''):
+        self.db_path = db_path
+        self.max_idle = MAX_IDLE if max_idle is None else max_idle
+        self.busy_timeout = BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        self.synchronous = synchronous or SYNCHRONOUS
+        self.mmap_size = MMAP_SIZE if mmap_size is None else mmap_size
+        self.isolation_level = isolation_level
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.idle = []
+        self.generation = 0
+        self.pid = os.getpid()
+        self.created = 0
+        self.reused = 0
+
+    def _connect(self):
+        # 连接会在线程间传递，但同一时间只由一个线程使用
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False,
+                               isolation_level=self.isolation_level)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def _acquire(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                # fork 出的子进程不能使用父进程打开的连接
+                self.idle = []
+                self.pid = os.getpid()
+            if self.idle:
+                self.reused += 1
+                return self.idle.pop(), self.generation
+            self.created += 1
+            generation = self.generation
+        return self._connect(), generation
+
+    def _release(self, conn, generation):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        with self.lock:
+            if generation == self.generation and len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """取出当前线程的连接，最外层 with 块结束时未提交的事务会被回滚"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            # 嵌套使用，由最外层负责归还
+            yield conn
+            return
+
+        conn, generation = self._acquire()
+        self.local.conn = conn
+        try:
+            yield conn
+        finally:
+            self.local.conn = None
+            self._release(conn, generation)
+
+    def close_all(self):
+        """关闭空闲连接，正在使用的连接归还时关闭（删除或替换数据库文件之前调用）"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+            self.generation += 1
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self.lock:
+            return {'created': self.created, 'reused': self.reused, 'idle': len(self.idle)}
@@ -3,9 +3,17 @@ from flask_cors import CORS, cross_origin
 import sqlite3
 import os
 import time
+from db_pool import ConnectionPool
+from migrations import migrate
+from static_assets import StaticAssets
 
 app = Flask(__name__)
 DB_NAME = 'products.db'
+# 数据库连接池（WAL 日志，读写互不阻塞）
+db_pool = ConnectionPool(DB_NAME)
+
+# 静态资源使用带指纹的地址和长期缓存
+static_assets = StaticAssets(app)
 
 # 启用 CORS
 CORS(app, resources={
@@ -25,34 +33,11 @@ print(f"📁 当前工作目录: {os.getcwd()}")
 print(f"📁 templates 路径: {os.path.join(os.getcwd(), 'templates')}")
 
 def init_db():
-    """初始化数据库"""
+    """初始化数据库：执行尚未应用的结构迁移"""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                url TEXT UNIQUE NOT NULL,
-                image_url TEXT,
-                platform TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS price_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                price REAL NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            for version, description in migrate(conn):
+                print(f"🗄️ 数据库结构升级到第 {version} 版: {description}")
         print("✅ 数据库初始化成功")
         return True
     except Exception as e:
@@ -137,23 +122,17 @@ def get_products():
         
     try:
         print("📦 获取商品列表请求")
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT p.*, 
-                   (SELECT price FROM price_history 
-                    WHERE product_id = p.id 
-                    ORDER BY timestamp DESC LIMIT 1) as current_price,
-                   (SELECT timestamp FROM price_history 
-                    WHERE product_id = p.id 
-                    ORDER BY timestamp DESC LIMIT 1) as last_updated
-            FROM products p
-            ORDER BY p.created_at DESC
-        ''')
-        products = [dict(row) for row in c.fetchall()]
-        conn.close()
+        with db_pool.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            
+            c.execute('''
+                SELECT p.*, lp.price as current_price, lp.timestamp as last_updated
+                FROM products p
+                LEFT JOIN latest_prices lp ON lp.product_id = p.id
+                ORDER BY p.created_at DESC
+            ''')
+            products = [dict(row) for row in c.fetchall()]
         
         print(f"✅ 返回 {len(products)} 个商品")
         return jsonify(products)
@@ -183,31 +162,28 @@ def add_product():
         if not url:
             return jsonify({'error': '请输入商品链接'}), 400
         
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute('SELECT id FROM products WHERE url = ?', (url,))
-        if c.fetchone():
-            conn.close()
-            return jsonify({'error': '该商品已在监控列表中'}), 400
-        
-        product_info = get_simple_product_info(url)
-        if not product_info:
-            conn.close()
-            return jsonify({'error': '无法获取商品信息'}), 400
-        
-        c.execute('''
-            INSERT INTO products (name, url, image_url, platform)
-            VALUES (?, ?, ?, ?)
-        ''', (product_info['name'], url, product_info['image_url'], product_info['platform']))
-        product_id = c.lastrowid
-        
-        c.execute('''
-            INSERT INTO price_history (product_id, price)
-            VALUES (?, ?)
-        ''', (product_id, product_info['price']))
-        
-        conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT id FROM products WHERE url = ?', (url,))
+            if c.fetchone():
+                return jsonify({'error': '该商品已在监控列表中'}), 400
+            
+            product_info = get_simple_product_info(url)
+            if not product_info:
+                return jsonify({'error': '无法获取商品信息'}), 400
+            
+            c.execute('''
+                INSERT INTO products (name, url, image_url, platform)
+                VALUES (?, ?, ?, ?)
+            ''', (product_info['name'], url, product_info['image_url'], product_info['platform']))
+            product_id = c.lastrowid
+            
+            c.execute('''
+                INSERT INTO price_history (product_id, price)
+                VALUES (?, ?)
+            ''', (product_id, product_info['price']))
+            
+            conn.commit()
         
         print(f"✅ 成功添加商品: {product_info['name']}")
         return jsonify({
@@ -232,18 +208,17 @@ def get_prices(product_id):
         
     try:
         print(f"📊 获取商品 {product_id} 的价格历史")
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT price, timestamp 
-            FROM price_history 
-            WHERE product_id = ? 
-            ORDER BY timestamp ASC
-        ''', (product_id,))
-        prices = [dict(row) for row in c.fetchall()]
-        conn.close()
+        with db_pool.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            
+            c.execute('''
+                SELECT price, timestamp 
+                FROM price_history 
+                WHERE product_id = ? 
+                ORDER BY timestamp ASC
+            ''', (product_id,))
+            prices = [dict(row) for row in c.fetchall()]
         
         if not prices:
             # 生成一些测试数据
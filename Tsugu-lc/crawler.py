@@ -10,21 +10,25 @@ def get_product_info(url):
     
     try:
         response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 淘宝/天猫
-        if 'taobao.com' in url or 'tmall.com' in url:
-            return parse_taobao(soup, url)
-        # 京东
-        elif 'jd.com' in url:
-            return parse_jd(soup, url)
-        else:
-            return parse_general(soup, url)
+        return parse_product_page(response.text, url)
             
     except Exception as e:
         print(f"爬取失败: {e}")
         return None
 
+def parse_product_page(html, url):
+    """按平台解析商品页面"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # 淘宝/天猫
+    if 'taobao.com' in url or 'tmall.com' in url:
+        return parse_taobao(soup, url)
+    # 京东
+    elif 'jd.com' in url:
+        return parse_jd(soup, url)
+    else:
+        return parse_general(soup, url)
+
 def parse_taobao(soup, url):
     """解析淘宝商品"""
     # 商品名称
@@ -0,0 +1,149 @@
+"""数据库结构版本迁移
+
+数据库的结构版本记录在 PRAGMA user_version 中，MIGRATIONS 的第 N 项把数据库从第 N-1 版升级到第 N 版。
+启动时 migrate() 依次执行尚未应用的迁移：
+- 每一版在单独的 BEGIN IMMEDIATE 事务中执行，失败时整体回滚，版本号不变；
+- 拿到写锁后重新读取版本号，多个进程同时启动时同一版只执行一次；
+- 第 1 版与原来建表语句创建的表结构相同（表已存在时不做改动），已有的 products.db 从这里开始原地升级。
+结构有变化时在 MIGRATIONS 末尾追加新的迁移，不要修改已经发布的迁移。
+"""
+import sqlite3
+
+
+def create_tables(conn):
+    """创建商品和价格历史表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT UNIQUE NOT NULL,
+            image_url TEXT,
+            platform TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+
+def cascade_deletes(conn):
+    """删除商品时级联删除它的价格历史"""
+    rebuild_table(conn, 'price_history', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def add_indexes(conn):
+    """价格历史按 (商品, 时间) 建立覆盖索引"""
+    # 按商品查最新价格和价格历史都只读索引，不回表
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_price_history_product_time
+        ON price_history (product_id, timestamp, price)
+    ''')
+
+
+def latest_price_snapshot(conn):
+    """每个商品的最新价格快照，由价格历史的插入触发器维护"""
+    # 商品列表按主键关联快照，不再对每个商品查询两次价格历史
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latest_prices (
+            product_id INTEGER PRIMARY KEY,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+        )
+    ''')
+    # 所有写入价格历史的地方（包括其他进程）都会经过触发器；时间更早的补录记录不覆盖快照。
+    # 价格历史只会随商品一起删除，快照也由外键级联删除，因此不需要删除触发器
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_price_history_latest
+        AFTER INSERT ON price_history
+        WHEN NEW.product_id IS NOT NULL
+        BEGIN
+            INSERT INTO latest_prices (product_id, price, timestamp)
+            VALUES (NEW.product_id, NEW.price, NEW.timestamp)
+            ON CONFLICT (product_id) DO UPDATE SET price = excluded.price, timestamp = excluded.timestamp
+            WHERE latest_prices.timestamp IS NULL OR excluded.timestamp >= latest_prices.timestamp;
+        END
+    ''')
+    # 用已有的价格历史补全快照：带 MAX() 的聚合中，SQLite 取最大值所在行的其他列
+    conn.execute('''
+        INSERT OR REPLACE INTO latest_prices (product_id, price, timestamp)
+        SELECT product_id, price, MAX(timestamp)
+        FROM price_history
+        WHERE product_id IN (SELECT id FROM products)
+        GROUP BY product_id
+    ''')
+    # 商品列表按创建时间倒序，直接按索引顺序读取
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_created ON products (created_at)')
+
+
+MIGRATIONS = [create_tables, cascade_deletes, add_indexes, latest_price_snapshot]
+
+
+def rebuild_table(conn, table, schema):
+    """按新的建表语句重建表（SQLite 不能修改已有表的约束）
+
+    schema 中的 {table} 替换为临时表名；复制新旧表都有的列，
+    已删除商品遗留的记录（以及没有商品的记录）不再保留。
+    """
+    temp_table = f'{table}_new'
+    old_columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    conn.execute(schema.format(table=temp_table))
+    new_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({temp_table})')}
+    columns = ', '.join(column for column in old_columns if column in new_columns)
+    conn.execute(f'''
+        INSERT INTO {temp_table} ({columns})
+        SELECT {columns} FROM {table}
+        WHERE product_id IN (SELECT id FROM products)
+    ''')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {temp_table} RENAME TO {table}')
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, migrations=None):
+    """把数据库升级到最新版本，返回本次执行的 [(版本, 说明)]"""
+    migrations = MIGRATIONS if migrations is None else migrations
+    if schema_version(conn) >= len(migrations):
+        return []
+
+    applied = []
+    # 重建表时要关闭外键检查，foreign_keys 只能在事务之外修改
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys=OFF')
+    try:
+        for version, migration in enumerate(migrations, 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                migration(conn)
+                if conn.execute('PRAGMA foreign_key_check').fetchone():
+                    raise sqlite3.IntegrityError(f'第 {version} 版迁移后存在违反外键约束的记录')
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            applied.append((version, migration.__doc__))
+    finally:
+        conn.execute(f'PRAGMA foreign_keys={foreign_keys}')
+    return applied
@@ -0,0 +1,119 @@
+"""商品列表基准测试
+
+按应用的 migrations.py 建立数据库，写入 products 个商品、每个商品 history 条价格记录：
+- 执行到第 3 版（价格历史已有 (商品, 时间) 索引），测量原来的关联子查询写法；
+- 原地升级到最新版本（最新价格快照），记录补全快照的耗时，测量改用快照后的商品列表；
+- 比较两种写法返回的最新价格和更新时间是否一致；
+- 分别在升级前后给每个商品追加一条价格记录，比较触发器带来的写入开销。
+
+用法: python bench_listing.py [--apps hi-Tsugu Tsugu-lc] [--products 10000] [--history 1000]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from check_query_plans import CORRELATED_LISTING, LISTING, load_migrations
+
+SNAPSHOT_VERSION = 4
+
+
+def seed(conn, products, history):
+    """按商品、时间顺序写入，索引只在末尾追加"""
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO products (name, url, created_at)
+        SELECT '商品 ' || i, 'https://example.com/item/' || i, datetime('2024-01-01', '+' || i || ' seconds')
+        FROM n
+    ''', (products,))
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+        INSERT INTO price_history (product_id, price, timestamp)
+        SELECT p.id, 100 + (p.id * 7 + n.i * 13) % 900, datetime('2024-01-01', '+' || n.i || ' hours')
+        FROM products p, n
+        ORDER BY p.id, n.i
+    ''', (history,))
+    conn.commit()
+
+
+def timed(conn, sql, repeats=5):
+    """返回 (最短耗时毫秒, 结果)"""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = conn.execute(sql).fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def append_prices(conn):
+    """给每个商品追加一条价格记录，返回耗时（毫秒）"""
+    started = time.perf_counter()
+    conn.execute('''
+        INSERT INTO price_history (product_id, price, timestamp)
+        SELECT id, 99, datetime('2030-01-01', '+' || id || ' seconds') FROM products
+    ''')
+    conn.commit()
+    return (time.perf_counter() - started) * 1000
+
+
+def latest(rows):
+    """{商品ID: (最新价格, 更新时间)}，两种写法的列顺序相同"""
+    return {row[0]: tuple(row[-2:]) for row in rows}
+
+
+def bench(app, work_dir, products, history):
+    migrations = load_migrations(app)
+    path = os.path.join(work_dir, f'{app}.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+
+    started = time.perf_counter()
+    migrations.migrate(conn, migrations.MIGRATIONS[:SNAPSHOT_VERSION - 1])
+    seed(conn, products, history)
+    print(f"  写入 {products} 个商品 × {history} 条价格记录: {time.perf_counter() - started:.1f} 秒")
+
+    before_ms, before_rows = timed(conn, CORRELATED_LISTING)
+    insert_before = append_prices(conn)
+    _, appended_rows = timed(conn, CORRELATED_LISTING, repeats=1)
+
+    started = time.perf_counter()
+    migrations.migrate(conn)
+    print(f"  原地升级补全快照: {(time.perf_counter() - started) * 1000:.0f}ms")
+    after_ms, after_rows = timed(conn, LISTING)
+    print(f"  商品列表 关联子查询 {before_ms:8.1f}ms → 快照 {after_ms:6.1f}ms ({before_ms / after_ms:.1f}x)")
+
+    failed = latest(appended_rows) != latest(after_rows)
+    insert_after = append_prices(conn)
+    _, after_rows = timed(conn, LISTING, repeats=1)
+    failed = failed or any(row[-2] != 99 or not row[-1].startswith('2030') for row in after_rows)
+    print(f"  每个商品追加一条价格: 无触发器 {insert_before:.0f}ms, 有触发器 {insert_after:.0f}ms")
+    if failed:
+        print("  ❌ 快照与价格历史中的最新价格不一致")
+    conn.close()
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='商品列表基准测试')
+    parser.add_argument('--apps', nargs='+', default=['hi-Tsugu', 'Tsugu-lc'], choices=['hi-Tsugu', 'Tsugu-lc'])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--history', type=int, default=1000, help='每个商品的价格记录数')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    ok = True
+    for app in args.apps:
+        print(f"🗂️ {app}")
+        ok = bench(app, work_dir, args.products, args.history) and ok
+    shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""价格汇总基准测试
+
+按 hi-Tsugu 的 migrations.py 建立数据库，每个商品每30分钟一条价格记录（由触发器同时写入小时和日汇总），
+历史长度逐级增加，比较读取原始记录和读取汇总时的耗时：
+- 全部历史的价格统计：原始记录 vs 日汇总；
+- 最近90天（从非整点开始）的价格统计：原始记录 vs 日汇总 + 小时汇总 + 原始记录；
+- 30天走势：原始记录 vs 小时汇总；365天走势：原始记录 vs 日汇总。
+同时检查两种写法的统计结果一致。
+
+用法: python bench_rollups.py [--products 20] [--sizes 1000 10000 50000]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from check_query_plans import HOURLY_POINTS, RAW_POINTS, RAW_STATS, ROLLUP_STATS, load_migrations
+
+NOW = datetime(2024, 6, 1)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DAILY_POINTS = HOURLY_POINTS.replace('price_history_hourly', 'price_history_daily')
+RANGE_STATS = RAW_STATS + ' AND timestamp >= ?'
+
+
+def seed(conn, products, history):
+    """每个商品 history 条价格记录，间隔30分钟，截止到 NOW"""
+    conn.executemany('INSERT INTO products (name, url) VALUES (?, ?)',
+                     [(f'商品 {i}', f'https://example.com/item/{i}') for i in range(products)])
+    conn.execute('''
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO price_history (product_id, price, timestamp)
+        SELECT p.id, 100 + (p.id * 7 + n.i * 13) % 900, datetime(?, '-' || (n.i * 30) || ' minutes')
+        FROM products p, n
+        ORDER BY p.id, n.i DESC
+    ''', (history, NOW.strftime(TIMESTAMP_FORMAT)))
+    conn.commit()
+
+
+def timed(conn, sql, params, repeats=20):
+    """返回 (平均耗时毫秒, 结果)"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - started) / repeats * 1000, rows
+
+
+def same_stats(raw, rollup):
+    count, average, low, high = raw
+    return (count, low, high) == (rollup[0], rollup[2], rollup[3]) and (
+        average is None and rollup[1] is None or abs(average - rollup[1]) < 1e-6)
+
+
+def bench(migrations, work_dir, products, history):
+    path = os.path.join(work_dir, f'{history}.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    migrations.migrate(conn)
+    started = time.perf_counter()
+    seed(conn, products, history)
+    elapsed = time.perf_counter() - started
+    print(f"📈 每个商品 {history} 条价格记录（约 {history / 48:.0f} 天）, 写入 {elapsed:.1f} 秒")
+
+    product_id = products // 2
+    since = NOW - timedelta(days=90, hours=-7, minutes=-45)
+    hour_start = since.replace(minute=0) + timedelta(hours=1)
+    day_start = since.replace(hour=0, minute=0) + timedelta(days=1)
+    since, hour_start, day_start = (moment.strftime(TIMESTAMP_FORMAT) for moment in (since, hour_start, day_start))
+    cases = [
+        ('全部历史统计', RAW_STATS, (product_id,),
+         ROLLUP_STATS, (product_id, '', '', product_id, '', '', product_id, '')),
+        ('90天统计', RANGE_STATS, (product_id, since),
+         ROLLUP_STATS, (product_id, since, hour_start, product_id, hour_start, day_start, product_id, day_start)),
+        ('30天走势', RAW_POINTS, (product_id, (NOW - timedelta(days=30)).strftime(TIMESTAMP_FORMAT)),
+         HOURLY_POINTS, (product_id, (NOW - timedelta(days=30)).strftime(TIMESTAMP_FORMAT))),
+        ('365天走势', RAW_POINTS, (product_id, (NOW - timedelta(days=365)).strftime(TIMESTAMP_FORMAT)),
+         DAILY_POINTS, (product_id, (NOW - timedelta(days=365)).strftime('%Y-%m-%d 00:00:00')))
+    ]
+    ok = True
+    for name, raw_sql, raw_params, rollup_sql, rollup_params in cases:
+        raw_ms, raw_rows = timed(conn, raw_sql, raw_params)
+        rollup_ms, rollup_rows = timed(conn, rollup_sql, rollup_params)
+        if '统计' in name:
+            matched = same_stats(raw_rows[0], rollup_rows[0])
+            ok = ok and matched
+            detail = f"{raw_rows[0][0]} 条记录{'' if matched else ' ❌ 统计结果不一致'}"
+        else:
+            detail = f"{len(raw_rows)} → {len(rollup_rows)} 个点"
+        print(f"  {name:<8} 原始记录 {raw_ms:7.2f}ms  汇总 {rollup_ms:5.2f}ms  ({detail})")
+    conn.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='价格汇总基准测试')
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 50000], help='每个商品的价格记录数')
+    args = parser.parse_args()
+
+    migrations = load_migrations('hi-Tsugu')
+    work_dir = tempfile.mkdtemp()
+    ok = True
+    for history in args.sizes:
+        ok = bench(migrations, work_dir, args.products, history) and ok
+    shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
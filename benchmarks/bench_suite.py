@@ -0,0 +1,309 @@
+"""爬虫基准测试套件
+
+对 hi-Tsugu 的 RealProductCrawler、Tsugu-II 的 RealPriceCrawler 和 Tsugu-lc 的 get_product_info
+分别测量：
+- parse_ms.<平台>：用 hi-Tsugu/fixtures/pages 下保存的页面，单个页面的解析耗时（毫秒），
+  分 REPEATS 组测量，取平均耗时最短的一组，减少其他进程干扰带来的波动；
+- pages_per_sec：对回放录制页面的本地模拟商城完整爬取一轮的每秒页数；hi-Tsugu 先用另外的
+  WARMUP_PAGES 个页面预热一轮，测量的是解析进程池已启动、各轮复用时的吞吐量（与定时爬取一致）；
+- success_rate：这一轮中解析出商品信息的比例；
+- peak_rss_mb：测量进程的峰值常驻内存（MB）。
+每个应用在独立的子进程中测量（各应用的模块同名，且峰值内存需要分开统计）。
+
+结果与 baselines/<应用>.json 比较，任一指标变差超过阈值时以退出码 1 结束。
+基线与机器相关，更换机器或确认性能变化后用 --save 重新生成。
+
+用法:
+    python bench_suite.py [--apps hi-Tsugu Tsugu-II Tsugu-lc] [--pages 100] [--rounds 10]
+                          [--threshold 0.25] [--save]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+PAGE_DIR = os.path.join(ROOT, 'hi-Tsugu', 'fixtures', 'pages')
+
+# 允许的变差比例，未列出的指标使用 --threshold
+THRESHOLDS = {
+    'success_rate': 0.0,  # 解析成功率不允许下降
+    'peak_rss_mb': 0.1
+}
+# 变化量小于该值时不算回归（按指标名前缀匹配），避免耗时很短的指标因计时误差误报
+ABSOLUTE_TOLERANCES = {
+    'parse_ms': 0.1
+}
+HIGHER_IS_BETTER = ('pages_per_sec', 'success_rate')
+REPEATS = 5
+# hi-Tsugu 预热轮的页面数，足以启动解析进程池的全部进程
+WARMUP_PAGES = 20
+
+# 解析测试使用的页面URL，平台由URL决定
+FIXTURE_URLS = {
+    'taobao': 'https://item.taobao.com/item.htm?id=1',
+    'tmall': 'https://detail.tmall.com/item.htm?id=2',
+    'jd': 'https://item.jd.com/100012345678.html',
+    'pdd': 'https://mobile.yangkeduo.com/goods.html?goods_id=3',
+    'amazon': 'https://www.amazon.com/dp/B0TEST0001',
+    'other': 'https://shop.example.com/switch-oled'
+}
+
+# 各应用参与测试的平台：(解析测试的平台, 完整爬取的平台)
+APPS = {
+    'hi-Tsugu': (('taobao', 'tmall', 'jd', 'pdd', 'other'), ('taobao', 'tmall', 'jd', 'pdd', 'other')),
+    # 按域名识别网站，只支持亚马逊、京东和淘宝；淘宝的录制页面是新版布局，选择器解析不到，
+    # 爬取时会按重试策略退避，测到的是等待时间，因此不参与完整爬取
+    'Tsugu-II': (('amazon', 'jd', 'taobao', 'other'), ('amazon', 'jd')),
+    # 通用页面不解析价格
+    'Tsugu-lc': (('taobao', 'tmall', 'jd', 'other'), ('taobao', 'tmall', 'jd'))
+}
+
+# 基准测试只衡量抓取和解析本身，不做限速
+UNLIMITED = {'other': {'rate': 1e6, 'burst': 1e6}}
+
+
+def load_pages(platforms):
+    pages = {}
+    for name in platforms:
+        with open(os.path.join(PAGE_DIR, f'{name}.html'), 'rb') as f:
+            pages[name] = (FIXTURE_URLS[name], f.read())
+    return pages
+
+
+def measure_parse(parse, platforms, rounds):
+    """返回 {'parse_ms.<平台>': 毫秒}"""
+    metrics = {}
+    for name, (url, body) in load_pages(platforms).items():
+        parse(body, url)  # 预热选择器编译等一次性开销
+        batches = []
+        for _ in range(REPEATS):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                parse(body, url)
+            batches.append((time.perf_counter() - started) / rounds)
+        metrics[f'parse_ms.{name}'] = round(min(batches) * 1000, 3)
+    return metrics
+
+
+def crawl_urls(port, platforms, count, by_host=False, start=0):
+    """生成完整爬取使用的商品URL，商品编号从 start + 1 开始；by_host 时平台由域名决定（需要把域名解析到本机）"""
+    from mock_shop import PLATFORM_PATHS
+
+    urls = []
+    for i in range(start, start + count):
+        domain = PLATFORM_PATHS[platforms[i % len(platforms)]]
+        if by_host:
+            urls.append(f'http://{domain}:{port}/{i + 1}.html')
+        else:
+            urls.append(f'http://127.0.0.1:{port}/{domain}/{i + 1}.html')
+    return urls
+
+
+def probe_hi_tsugu(port, pages, rounds):
+    from crawl_engine import AsyncCrawlEngine
+    from http_cache import ValidatorCache
+    from rate_limiter import HostRateLimiter
+    from real_crawler import RealProductCrawler
+
+    parse_platforms, crawl_platforms = APPS['hi-Tsugu']
+    crawler = RealProductCrawler(rate_limiter=HostRateLimiter(UNLIMITED), http_cache=ValidatorCache('http_cache.db'))
+    metrics = measure_parse(crawler.parse_product_content, parse_platforms, rounds)
+
+    urls = crawl_urls(port, crawl_platforms, pages)
+    engine = AsyncCrawlEngine(crawler)
+    # 第一轮启动解析进程（spawn 方式，各进程重新导入解析模块），之后各轮复用；
+    # 预热轮使用不同的商品，测量轮不会命中结果缓存或条件请求
+    engine.run(list(enumerate(crawl_urls(port, crawl_platforms, WARMUP_PAGES, start=pages))),
+               lambda product, product_info: None)
+    stats = engine.run(list(enumerate(urls)), lambda product, product_info: None)
+    engine.close()
+    return metrics, stats.succeeded, stats.wall_time
+
+
+def probe_tsugu_ii(port, pages, rounds):
+    import logging
+
+    from http_cache import ValidatorCache
+    from http_pool import shared_pool
+    from mock_shop import PLATFORM_PATHS
+    from rate_limiter import HostRateLimiter
+    from real_crawler import RealPriceCrawler
+
+    parse_platforms, crawl_platforms = APPS['Tsugu-II']
+    crawler = RealPriceCrawler(rate_limiter=HostRateLimiter(UNLIMITED), http_cache=ValidatorCache('http_cache.db'))
+    logging.getLogger('PriceCrawler').setLevel(logging.WARNING)
+
+    def parse(body, url):
+        return crawler.parse_product_content(body, 'utf-8', url, crawler.detect_website(url))
+
+    metrics = measure_parse(parse, parse_platforms, rounds)
+
+    for name in crawl_platforms:
+        shared_pool.dns_cache.pin(PLATFORM_PATHS[name], '127.0.0.1')
+    urls = crawl_urls(port, crawl_platforms, pages, by_host=True)
+    started = time.perf_counter()
+    succeeded = sum(1 for url in urls if crawler.fetch_product_info(url).get('price') is not None)
+    return metrics, succeeded, time.perf_counter() - started
+
+
+def probe_tsugu_lc(port, pages, rounds):
+    from crawler import get_product_info, parse_product_page
+
+    parse_platforms, crawl_platforms = APPS['Tsugu-lc']
+    metrics = measure_parse(lambda body, url: parse_product_page(body.decode('utf-8'), url), parse_platforms, rounds)
+
+    urls = crawl_urls(port, crawl_platforms, pages)
+    started = time.perf_counter()
+    succeeded = 0
+    for url in urls:
+        product_info = get_product_info(url)
+        if product_info and product_info['name'] and product_info['price']:
+            succeeded += 1
+    return metrics, succeeded, time.perf_counter() - started
+
+
+PROBES = {
+    'hi-Tsugu': probe_hi_tsugu,
+    'Tsugu-II': probe_tsugu_ii,
+    'Tsugu-lc': probe_tsugu_lc
+}
+
+
+def run_probe(app, port, pages, rounds):
+    """子进程入口：在应用目录的模块上测量，结果以JSON输出到标准输出"""
+    # 应用模块优先；mock_shop 只用于生成URL
+    sys.path[:0] = [os.path.join(ROOT, app), os.path.join(ROOT, 'hi-Tsugu')]
+    os.chdir(tempfile.mkdtemp())
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics, succeeded, wall_time = PROBES[app](port, pages, rounds)
+    metrics['pages_per_sec'] = round(pages / wall_time, 2)
+    metrics['success_rate'] = round(succeeded / pages, 4)
+    # Linux 上 ru_maxrss 的单位为KB
+    metrics['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(json.dumps(metrics))
+
+
+def measure(app, port, pages, rounds):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--probe', app, '--port', str(port),
+         '--pages', str(pages), '--rounds', str(rounds)],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'{app} 测量失败:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def baseline_path(app):
+    return os.path.join(BASELINE_DIR, f'{app}.json')
+
+
+def load_baseline(app):
+    try:
+        with open(baseline_path(app), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(app, metrics, pages, rounds):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    baseline = {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': f'{platform.platform()} / Python {platform.python_version()} / CPU {os.cpu_count()}',
+        'pages': pages,
+        'rounds': rounds,
+        'metrics': metrics
+    }
+    with open(baseline_path(app), 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def compare(metrics, baseline, threshold):
+    """返回 [(指标, 基线值, 当前值, 变差比例, 是否回归)]，变差比例为正表示变慢/变差"""
+    rows = []
+    for name, current in metrics.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current, None, False))
+            continue
+        if base == 0:
+            worse = 0.0 if current == base else float('inf')
+        else:
+            worse = (current - base) / base
+        if name in HIGHER_IS_BETTER:
+            worse = -worse
+        tolerance = ABSOLUTE_TOLERANCES.get(name.split('.')[0], 0)
+        regressed = worse > THRESHOLDS.get(name, threshold) and abs(current - base) > tolerance
+        rows.append((name, base, current, worse, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫基准测试套件')
+    parser.add_argument('--apps', nargs='+', choices=list(APPS), default=list(APPS))
+    parser.add_argument('--pages', type=int, default=100, help='完整爬取的页面数')
+    parser.add_argument('--rounds', type=int, default=10, help='每组测量中每个页面的解析次数')
+    parser.add_argument('--threshold', type=float, default=0.25, help='允许的变差比例')
+    parser.add_argument('--save', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--probe', choices=list(APPS), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        run_probe(args.probe, args.port, args.pages, args.rounds)
+        return 0
+
+    sys.path.insert(0, os.path.join(ROOT, 'hi-Tsugu'))
+    from fixture_store import FixtureStore
+    from mock_shop import start_mock_shop
+
+    server, port = start_mock_shop(fixtures=FixtureStore())
+    print(f"🧪 基准测试: 每个应用爬取 {args.pages} 个页面, 每个页面解析 {REPEATS}×{args.rounds} 次, "
+          f"阈值 {args.threshold:.0%}")
+
+    regressions = []
+    for app in args.apps:
+        metrics = measure(app, port, args.pages, args.rounds)
+        baseline = load_baseline(app)
+        print(f"\n📦 {app}")
+        if baseline is None or args.save:
+            for name, value in metrics.items():
+                print(f"  {name:<18}{value:>12}")
+            if args.save:
+                save_baseline(app, metrics, args.pages, args.rounds)
+                print(f"  💾 已保存基线: {os.path.relpath(baseline_path(app), ROOT)}")
+            else:
+                print("  ⚠️ 没有基线，使用 --save 生成")
+            continue
+
+        if (baseline['pages'], baseline['rounds']) != (args.pages, args.rounds):
+            print(f"  ⚠️ 基线使用 --pages {baseline['pages']} --rounds {baseline['rounds']}，结果可能不可比")
+        print(f"  {'指标':<16}{'基线':>12}{'当前':>12}{'变化':>10}")
+        for name, base, current, worse, regressed in compare(metrics, baseline['metrics'], args.threshold):
+            change = '新指标' if worse is None else f'{-worse:+.1%}' if name in HIGHER_IS_BETTER else f'{worse:+.1%}'
+            mark = '❌' if regressed else ''
+            print(f"  {name:<18}{'-' if base is None else base:>12}{current:>12}{change:>10} {mark}")
+            if regressed:
+                regressions.append(f'{app} {name}')
+
+    server.shutdown()
+    print(f"\n📊 模拟商城响应统计: {dict(server.stats)}")
+    if regressions:
+        print(f"❌ 性能回归: {', '.join(regressions)}")
+        return 1
+    print("✅ 没有超过阈值的回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
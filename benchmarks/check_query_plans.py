@@ -0,0 +1,257 @@
+"""价格历史热点查询的执行计划检查
+
+对每个应用的 migrations.py：
+- 在临时数据库中执行全部迁移并写入测试数据，用 EXPLAIN QUERY PLAN 检查热点查询：
+  访问价格历史、价格汇总、价格提醒和最新价格快照时必须通过索引查找（SEARCH ... USING INDEX），出现全表扫描即失败；
+- 同样的数据只执行第 1 版迁移（原来的表结构），比较迁移前后每个查询的耗时；
+- 把仓库中的 products.db 复制到临时目录原地升级，检查版本号、商品和价格历史记录数，
+  再次执行迁移不应有任何改动。
+任一检查失败时以退出码 1 结束。
+
+用法: python check_query_plans.py [--apps hi-Tsugu Tsugu-II ...] [--products 500] [--history 200]
+"""
+import argparse
+import importlib.util
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SINCE = '2000-01-01 00:00:00'
+
+# hi-Tsugu 和 Tsugu-lc 的商品列表，以及改用最新价格快照之前的写法
+LISTING = '''
+    SELECT p.*, lp.price as current_price, lp.timestamp as last_updated
+    FROM products p
+    LEFT JOIN latest_prices lp ON lp.product_id = p.id
+    ORDER BY p.created_at DESC
+'''
+CORRELATED_LISTING = '''
+    SELECT p.*,
+           (SELECT price FROM price_history
+            WHERE product_id = p.id
+            ORDER BY timestamp DESC LIMIT 1) as current_price,
+           (SELECT timestamp FROM price_history
+            WHERE product_id = p.id
+            ORDER BY timestamp DESC LIMIT 1) as last_updated
+    FROM products p
+    ORDER BY p.created_at DESC
+'''
+
+# hi-Tsugu 的价格走势（30天读小时汇总）和价格统计，以及改用汇总表之前的写法
+HOURLY_POINTS = '''
+    SELECT close as price, close_time as timestamp, open, high, low,
+           price_sum / count as average_price, count
+    FROM price_history_hourly
+    WHERE product_id = ? AND bucket >= ?
+    ORDER BY bucket ASC
+'''
+RAW_POINTS = '''
+    SELECT price, timestamp
+    FROM price_history
+    WHERE product_id = ? AND timestamp >= ?
+    ORDER BY timestamp ASC
+'''
+ROLLUP_STATS = '''
+    SELECT
+        SUM(records) as total_records,
+        SUM(price_sum) / SUM(records) as average_price,
+        MIN(low) as min_price,
+        MAX(high) as max_price
+    FROM (
+        SELECT COUNT(*) as records, SUM(price) as price_sum, MIN(price) as low, MAX(price) as high
+        FROM price_history
+        WHERE product_id = ? AND timestamp >= ? AND timestamp < ?
+        UNION ALL
+        SELECT SUM(count), SUM(price_sum), MIN(low), MAX(high)
+        FROM price_history_hourly
+        WHERE product_id = ? AND bucket >= ? AND bucket < ?
+        UNION ALL
+        SELECT SUM(count), SUM(price_sum), MIN(low), MAX(high)
+        FROM price_history_daily
+        WHERE product_id = ? AND bucket >= ?
+    )
+'''
+RAW_STATS = '''
+    SELECT COUNT(*), AVG(price), MIN(price), MAX(price)
+    FROM price_history
+    WHERE product_id = ?
+'''
+
+# 各应用的热点查询：名称 -> (SQL, 参数[, 迁移前的 SQL[, 迁移前的参数]])，与应用代码中的查询保持一致
+HOT_QUERIES = {
+    'hi-Tsugu': {
+        '商品列表最新价格': (LISTING, (), CORRELATED_LISTING),
+        '30天价格历史': (HOURLY_POINTS, (1, SINCE), RAW_POINTS),
+        # 全部历史的统计只读日汇总
+        '价格统计': (ROLLUP_STATS, (1, '', '', 1, '', '', 1, ''), RAW_STATS, (1,)),
+        '调度器统计窗口': ('''
+            SELECT product_id, price, timestamp
+            FROM price_history
+            WHERE product_id IN (?, ?, ?) AND timestamp >= ?
+            ORDER BY product_id, id
+        ''', (1, 2, 3, SINCE)),
+        '价格提醒': ('''
+            SELECT id, target_price
+            FROM price_alerts
+            WHERE product_id = ? AND is_active = 1
+        ''', (1,))
+    },
+    'Tsugu-II': {
+        '价格历史': ('''
+            SELECT price, created_at
+            FROM price_history
+            WHERE product_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (1, 30)),
+        '调度器统计窗口': ('''
+            SELECT product_id, price, created_at
+            FROM price_history
+            WHERE product_id IN (?, ?, ?) AND created_at >= ?
+            ORDER BY product_id, id
+        ''', (1, 2, 3, SINCE))
+    },
+    'Tsugu-lc': {
+        '商品列表最新价格': (LISTING, (), CORRELATED_LISTING),
+        '价格历史': ('''
+            SELECT price, timestamp
+            FROM price_history
+            WHERE product_id = ?
+            ORDER BY timestamp ASC
+        ''', (1,))
+    }
+}
+HOT_QUERIES['Tsugu-NTD'] = HOT_QUERIES['Hi-Tsugu-NTD'] = {'价格历史': HOT_QUERIES['Tsugu-II']['价格历史']}
+
+INDEXED_TABLES = ('price_history', 'price_alerts', 'latest_prices')  # 也匹配价格汇总表
+
+
+def load_migrations(app):
+    """各应用的 migrations.py 同名，按文件路径分别加载"""
+    spec = importlib.util.spec_from_file_location(f'migrations_{app}', os.path.join(ROOT, app, 'migrations.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(conn, products, history):
+    """写入 products 个商品，每个商品 history 条价格记录"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(price_history)')]
+    time_column = 'timestamp' if 'timestamp' in columns else 'created_at'
+    rng = random.Random(0)
+    conn.executemany('INSERT INTO products (name, url) VALUES (?, ?)',
+                     [(f'商品 {i}', f'https://example.com/item/{i}') for i in range(products)])
+    conn.executemany(f'INSERT INTO price_history (product_id, price, {time_column}) VALUES (?, ?, ?)',
+                     [(product_id, round(rng.uniform(10, 1000), 2),
+                       f'2024-{n // 28 % 12 + 1:02d}-{n % 28 + 1:02d} {n % 24:02d}:00:00')
+                      for n in range(history) for product_id in range(1, products + 1)])
+    if 'price_alerts' in {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}:
+        conn.executemany('INSERT INTO price_alerts (product_id, target_price) VALUES (?, ?)',
+                         [(product_id, 100.0) for product_id in range(1, products + 1)])
+    conn.commit()
+
+
+def full_scans(conn, sql, params):
+    """返回执行计划中对价格表的全表扫描，以及计划的全部步骤"""
+    details = [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+    scans = [detail for detail in details
+             if any(table in detail for table in INDEXED_TABLES) and not detail.startswith('SEARCH')]
+    return scans, details
+
+
+def timed(conn, sql, params, repeats=20, budget=1.0):
+    """最多执行 repeats 次（累计超过 budget 秒即停止），返回平均耗时（毫秒）"""
+    started = time.perf_counter()
+    for count in range(1, repeats + 1):
+        conn.execute(sql, params).fetchall()
+        if time.perf_counter() - started > budget:
+            break
+    return (time.perf_counter() - started) / count * 1000
+
+
+def check_plans(app, migrations, work_dir, products, history):
+    failures = []
+    timings = {}
+    for label, steps in (('迁移前', migrations.MIGRATIONS[:1]), ('迁移后', migrations.MIGRATIONS)):
+        conn = sqlite3.connect(os.path.join(work_dir, f'{app}-{len(steps)}.db'))
+        migrations.migrate(conn, steps)
+        seed(conn, products, history)
+        conn.execute('ANALYZE')
+        for name, (sql, params, *original) in HOT_QUERIES[app].items():
+            if steps is not migrations.MIGRATIONS and original:
+                sql, params = original[0], original[1] if len(original) > 1 else params
+            timings.setdefault(name, {})[label] = timed(conn, sql, params)
+            if steps is migrations.MIGRATIONS:
+                scans, details = full_scans(conn, sql, params)
+                if scans:
+                    failures.append(f'{name}: 全表扫描 {scans}')
+                print(f"    {name}: {' | '.join(details)}")
+        conn.close()
+
+    for name, timing in timings.items():
+        print(f"    {name:<10} 迁移前 {timing['迁移前']:8.2f}ms  迁移后 {timing['迁移后']:6.2f}ms")
+    return failures
+
+
+def check_upgrade(app, migrations, work_dir):
+    """复制仓库中的 products.db 原地升级"""
+    source = os.path.join(ROOT, app, 'products.db')
+    if not os.path.exists(source):
+        return []
+    path = os.path.join(work_dir, f'{app}-upgrade.db')
+    shutil.copy(source, path)
+    conn = sqlite3.connect(path)
+    count = 'SELECT COUNT(*) FROM {}'
+    before = {
+        'products': conn.execute(count.format('products')).fetchone()[0],
+        # 已删除商品遗留的价格记录在重建表时丢弃
+        'price_history': conn.execute('''
+            SELECT COUNT(*) FROM price_history WHERE product_id IN (SELECT id FROM products)
+        ''').fetchone()[0]
+    }
+
+    applied = migrations.migrate(conn)
+    failures = []
+    version = migrations.schema_version(conn)
+    if version != len(migrations.MIGRATIONS):
+        failures.append(f'升级后版本为 {version}')
+    for table, rows in before.items():
+        after = conn.execute(count.format(table)).fetchone()[0]
+        if after != rows:
+            failures.append(f'{table} 升级前 {rows} 条，升级后 {after} 条')
+    if migrations.migrate(conn):
+        failures.append('重复执行迁移时仍有改动')
+    conn.close()
+    print(f"    products.db 原地升级: 执行第 {', '.join(str(v) for v, _ in applied) or '-'} 版, "
+          f"商品 {before['products']} 个, 价格记录 {before['price_history']} 条")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='价格历史热点查询的执行计划检查')
+    parser.add_argument('--apps', nargs='+', default=list(HOT_QUERIES), choices=list(HOT_QUERIES))
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--history', type=int, default=200, help='每个商品的价格记录数')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    failed = False
+    for app in args.apps:
+        migrations = load_migrations(app)
+        print(f"🗄️ {app}: {args.products} 个商品 × {args.history} 条价格记录")
+        failures = check_plans(app, migrations, work_dir, args.products, args.history)
+        failures += check_upgrade(app, migrations, work_dir)
+        for failure in failures:
+            print(f"  ❌ {failure}")
+        failed = failed or bool(failures)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
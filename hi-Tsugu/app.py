@@ -1,12 +1,23 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 import sqlite3
 import os
 import time
 import threading
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from real_crawler import RealProductCrawler
+from crawl_engine import AsyncCrawlEngine
+from crawl_scheduler import AdaptiveScheduler
+from batch_writer import BatchWriter
+from db_pool import ConnectionPool
+from http_pool import shared_pool
+from image_manifest import ImageManifest
+from image_store import ImageStore, variant_path
+from image_worker import ImageWorker
+from job_queue import JobQueue
+from migrations import migrate
+from price_updates import load_price_alerts, save_price_update
+from static_assets import StaticAssets
 from config import Config
 
 app = Flask(__name__)
@@ -15,227 +26,252 @@ app.config.from_object(Config)
 # 启用 CORS
 CORS(app)
 
-# 初始化组件
-crawler = RealProductCrawler()
+# 静态资源使用带指纹的地址和长期缓存
+static_assets = StaticAssets(app)
+
 config = Config()
 
-# 创建必要的目录
-os.makedirs(config.IMAGE_DIR, exist_ok=True)
-os.makedirs('templates', exist_ok=True)
-os.makedirs('static', exist_ok=True)
+# 以下组件由 create_components() 创建。解析进程池以 spawn 方式启动，子进程会把本模块
+# 作为 __mp_main__ 重新导入，导入时不能打开数据库、加载缓存或创建目录
+db_pool = None
+batch_writer = None
+crawler = None
+crawl_engine = None
+crawl_scheduler = None
+job_queue = None
+image_session = None
+image_manifest = None
+image_store = None
+image_worker = None
+
+def create_components():
+    """创建数据库连接池、爬虫、调度器和图片处理组件以及所需目录，重复调用时不再创建"""
+    global db_pool, batch_writer, crawler, crawl_engine, crawl_scheduler, job_queue
+    global image_session, image_manifest, image_store, image_worker
+    if db_pool is not None:
+        return
+    
+    # 所有数据库访问共用连接池（WAL 日志，读写互不阻塞）
+    db_pool = ConnectionPool('products.db', Config.DB_POOL_IDLE, Config.DB_BUSY_TIMEOUT,
+                             Config.DB_SYNCHRONOUS, Config.DB_MMAP_SIZE)
+    # 定时爬取的结果由单个写线程批量写入
+    batch_writer = BatchWriter(db_pool, Config.DB_FLUSH_SIZE, Config.DB_FLUSH_INTERVAL)
+    crawler = RealProductCrawler()
+    crawl_engine = AsyncCrawlEngine(crawler)
+    crawl_scheduler = AdaptiveScheduler()
+    # queue 模式下由 crawl_worker.py 进程执行爬取
+    job_queue = JobQueue('products.db') if Config.CRAWL_MODE == 'queue' else None
+    
+    # 图片下载与页面抓取共用连接池
+    image_session = shared_pool.session()
+    image_session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    image_manifest = ImageManifest(config.IMAGE_DIR)
+    image_store = ImageStore(image_session, manifest=image_manifest)
+    image_worker = ImageWorker(image_store, lambda product_id, local_image_path: save_image_path(product_id, local_image_path))
+    
+    # 创建必要的目录
+    os.makedirs(config.IMAGE_DIR, exist_ok=True)
+    os.makedirs('templates', exist_ok=True)
+    os.makedirs('static', exist_ok=True)
 
 def init_db():
-    """初始化数据库"""
+    """初始化数据库：执行尚未应用的结构迁移"""
     try:
-        conn = sqlite3.connect('products.db')
-        c = conn.cursor()
-        
-        # 商品表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                url TEXT UNIQUE NOT NULL,
-                image_url TEXT,
-                local_image_path TEXT,
-                platform TEXT,
-                current_price REAL DEFAULT 0,
-                lowest_price REAL DEFAULT 0,
-                highest_price REAL DEFAULT 0,
-                price_change REAL DEFAULT 0,
-                is_available BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_checked TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 价格历史表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS price_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                price REAL NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        # 价格提醒表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS price_alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                target_price REAL NOT NULL,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            for version, description in migrate(conn):
+                print(f"🗄️ 数据库结构升级到第 {version} 版: {description}")
         print("✅ 数据库初始化成功")
         return True
     except Exception as e:
         print(f"❌ 数据库初始化失败: {e}")
         return False
 
-def download_product_image(image_url, product_id):
-    """下载商品图片到本地"""
-    try:
-        if not image_url:
-            return None
-            
-        # 生成图片文件名
-        file_extension = get_image_extension(image_url)
-        filename = f"product_{product_id}{file_extension}"
-        filepath = os.path.join(config.IMAGE_DIR, filename)
-        
-        # 下载图片
-        response = requests.get(image_url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        
-        if response.status_code == 200:
-            # 检查图片大小
-            if len(response.content) > config.MAX_IMAGE_SIZE:
-                print(f"⚠️ 图片过大，跳过下载: {filename}")
-                return None
-                
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            print(f"✅ 图片下载成功: {filename}")
-            return f"product_images/{filename}"
-        else:
-            print(f"❌ 图片下载失败，状态码: {response.status_code}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ 图片下载失败: {e}")
-        return None
+def save_image_path(product_id, local_image_path):
+    """后台图片处理完成后写回本地图片路径"""
+    with db_pool.connection() as conn:
+        conn.execute('UPDATE products SET local_image_path = ? WHERE id = ?', (local_image_path, product_id))
+        conn.commit()
+        print(f"🖼️ 商品 {product_id} 图片已就绪: {local_image_path}")
+
+def product_image_urls(product):
+    """商品卡片和详情弹窗使用的图片地址
+
+    本地图片就绪后使用对应尺寸的WebP变体（没有变体时用原图），否则使用远程图片地址。
+    是否存在以内存中的图片清单为准。
+    """
+    local_image_path = product['local_image_path']
+    if local_image_path and local_image_path in image_manifest:
+        urls = {}
+        for view in ('card', 'detail'):
+            variant = variant_path(local_image_path, view)
+            if variant in image_manifest:
+                urls[view] = f"/static/{variant}"
+            else:
+                urls[view] = f"/static/{local_image_path}"
+        return urls
+    if product['image_url']:
+        return {'card': product['image_url'], 'detail': product['image_url']}
+    return {'card': '/static/placeholder.png', 'detail': '/static/placeholder.png'}
+
+def load_price_history(c, product_ids):
+    """读取商品在统计窗口内的价格历史，按时间排序"""
+    since = (datetime.now(timezone.utc) - timedelta(days=config.SCHEDULE_HISTORY_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for start in range(0, len(product_ids), 500):
+        chunk = product_ids[start:start + 500]
+        c.execute(f'''
+            SELECT product_id, price, timestamp
+            FROM price_history
+            WHERE product_id IN ({', '.join('?' * len(chunk))}) AND timestamp >= ?
+            ORDER BY product_id, id
+        ''', chunk + [since])
+        rows.extend(c.fetchall())
+    return rows
+
+# 价格汇总表：(粒度, 表名, 时间桶长度)，从粗到细
+PRICE_ROLLUPS = [
+    ('day', 'price_history_daily', timedelta(days=1)),
+    ('hour', 'price_history_hourly', timedelta(hours=1))
+]
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def bucket_start(moment, size):
+    """moment 所在时间桶（一小时或一天）的开始时间"""
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if size >= timedelta(days=1) else moment
+
+def next_bucket_start(moment, size):
+    """moment 之后（含 moment）第一个时间桶的开始时间"""
+    start = bucket_start(moment, size)
+    return start if start == moment else start + size
 
-def get_image_extension(url):
-    """从URL获取图片扩展名"""
-    common_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
-    for ext in common_extensions:
-        if ext in url.lower():
-            return ext
-    return '.jpg'
+def load_price_points(c, product_id, days):
+    """价格走势：返回 (粒度, 记录)
+
+    选择时间范围内至少有 CHART_MIN_POINTS 个时间桶的最粗汇总，每个桶取收盘价和收盘时间，
+    并附带开盘、最高、最低和均价；范围太短时读取原始记录。
+    """
+    since = datetime.now() - timedelta(days=days)
+    for resolution, table, size in PRICE_ROLLUPS:
+        if timedelta(days=days) / size >= config.CHART_MIN_POINTS:
+            c.execute(f'''
+                SELECT close as price, close_time as timestamp, open, high, low,
+                       price_sum / count as average_price, count
+                FROM {table}
+                WHERE product_id = ? AND bucket >= ?
+                ORDER BY bucket ASC
+            ''', (product_id, bucket_start(since, size).strftime(TIMESTAMP_FORMAT)))
+            return resolution, c.fetchall()
+    
+    c.execute('''
+        SELECT price, timestamp 
+        FROM price_history 
+        WHERE product_id = ? AND timestamp >= ?
+        ORDER BY timestamp ASC
+    ''', (product_id, since.strftime(TIMESTAMP_FORMAT)))
+    return 'raw', c.fetchall()
+
+def load_price_stats(c, product_id, since=None):
+    """价格统计：完整的天读日汇总，开头不足一天的部分读小时汇总，不足一小时的部分读原始记录"""
+    if since is None:
+        since = hour_start = day_start = ''
+    else:
+        hour_start = next_bucket_start(since, timedelta(hours=1)).strftime(TIMESTAMP_FORMAT)
+        day_start = next_bucket_start(since, timedelta(days=1)).strftime(TIMESTAMP_FORMAT)
+        since = since.strftime(TIMESTAMP_FORMAT)
+    c.execute('''
+        SELECT 
+            SUM(records) as total_records,
+            SUM(price_sum) / SUM(records) as average_price,
+            MIN(low) as min_price,
+            MAX(high) as max_price
+        FROM (
+            SELECT COUNT(*) as records, SUM(price) as price_sum, MIN(price) as low, MAX(price) as high
+            FROM price_history
+            WHERE product_id = ? AND timestamp >= ? AND timestamp < ?
+            UNION ALL
+            SELECT SUM(count), SUM(price_sum), MIN(low), MAX(high)
+            FROM price_history_hourly
+            WHERE product_id = ? AND bucket >= ? AND bucket < ?
+            UNION ALL
+            SELECT SUM(count), SUM(price_sum), MIN(low), MAX(high)
+            FROM price_history_daily
+            WHERE product_id = ? AND bucket >= ?
+        )
+    ''', (product_id, since, hour_start, product_id, hour_start, day_start, product_id, day_start))
+    return c.fetchone()
+
+def sync_schedule(c):
+    """把可用商品、当前价格和有效提醒同步到调度器"""
+    c.execute('SELECT id, current_price FROM products WHERE is_available = 1')
+    prices = dict(c.fetchall())
+    c.execute('''
+        SELECT product_id, MIN(target_price)
+        FROM price_alerts
+        WHERE is_active = 1
+        GROUP BY product_id
+    ''')
+    targets = dict(c.fetchall())
+    added = crawl_scheduler.sync(prices, targets, lambda product_ids: load_price_history(c, product_ids))
+    if added:
+        print(f"🗓️ 调度器新增 {added} 个商品")
+
+def enqueue_due_products(due_ids):
+    """queue 模式：收取工作进程的结果交给调度器，再把到期商品写入任务表"""
+    for product_id, changed, price, error in job_queue.collect_finished():
+        crawl_scheduler.record_check(product_id, changed, price)
+    if due_ids:
+        created = job_queue.enqueue(due_ids)
+        print(f"📮 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 新增 {created} 个爬取任务，队列: {job_queue.stats()}")
 
 def update_product_prices():
-    """定时更新商品价格"""
+    """按自适应调度定时更新商品价格
+
+    每 SCHEDULE_TICK 秒取出已到期的商品，每轮的数量按 BATCH_SIZE / UPDATE_INTERVAL 的请求预算分摊。
+    CRAWL_MODE 为 queue 时只写入任务表，由 crawl_worker.py 进程爬取。
+    """
+    allowance = config.BATCH_SIZE * config.SCHEDULE_TICK / config.UPDATE_INTERVAL
     while True:
         try:
-            print(f"\n🔄 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始定时价格更新...")
-            conn = sqlite3.connect('products.db')
-            c = conn.cursor()
-            
-            # 获取需要更新的商品（按最后检查时间排序）
-            c.execute('''
-                SELECT id, url, current_price, lowest_price, highest_price 
-                FROM products 
-                WHERE is_available = 1
-                ORDER BY last_checked ASC
-                LIMIT ?
-            ''', (config.BATCH_SIZE,))
-            
-            products = c.fetchall()
-            print(f"📊 本次更新 {len(products)} 个商品")
-            
-            updated_count = 0
-            for product_id, url, current_price, lowest_price, highest_price in products:
-                try:
-                    print(f"  🔍 更新商品 {product_id}: {url}")
-                    product_info = crawler.fetch_product_info(url)
-                    
-                    if product_info and product_info.get('success'):
-                        new_price = product_info['price']
-                        
-                        # 计算价格变化
-                        price_change = 0
-                        if current_price > 0:
-                            price_change = round(((new_price - current_price) / current_price) * 100, 2)
-                        
-                        # 更新价格历史
-                        c.execute('''
-                            INSERT INTO price_history (product_id, price)
-                            VALUES (?, ?)
-                        ''', (product_id, new_price))
-                        
-                        # 更新商品信息
-                        update_data = {
-                            'current_price': new_price,
-                            'price_change': price_change,
-                            'last_checked': datetime.now().isoformat()
-                        }
-                        
-                        # 更新最低价和最高价
-                        if new_price > 0:
-                            if lowest_price == 0 or new_price < lowest_price:
-                                update_data['lowest_price'] = new_price
-                            if new_price > highest_price:
-                                update_data['highest_price'] = new_price
-                        
-                        set_clause = ', '.join([f"{k} = ?" for k in update_data.keys()])
-                        values = list(update_data.values()) + [product_id]
-                        
-                        c.execute(f'''
-                            UPDATE products 
-                            SET {set_clause}
-                            WHERE id = ?
-                        ''', values)
-                        
-                        # 检查价格提醒
-                        check_price_alerts(product_id, new_price)
-                        
-                        updated_count += 1
-                        print(f"  ✅ 商品 {product_id} 价格更新: {current_price} → {new_price} ({price_change}%)")
-                    
-                    else:
-                        print(f"  ❌ 商品 {product_id} 更新失败")
-                        # 标记为不可用
-                        c.execute('UPDATE products SET is_available = 0 WHERE id = ?', (product_id,))
-                    
-                    # 避免请求过快
-                    time.sleep(crawler.get_random_delay())
+            products = None
+            with db_pool.connection() as conn:
+                c = conn.cursor()
+                sync_schedule(c)
+                
+                # 获取已到期的商品（按到期时间先后）
+                due_ids = crawl_scheduler.pop_budgeted(allowance)
+                if job_queue:
+                    enqueue_due_products(due_ids)
+                elif due_ids:
+                    print(f"\n🔄 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始定时价格更新...")
+                    c.execute(f'''
+                        SELECT id, url, current_price, lowest_price, highest_price 
+                        FROM products 
+                        WHERE id IN ({', '.join('?' * len(due_ids))})
+                    ''', due_ids)
                     
-                except Exception as e:
-                    print(f"  ❌ 更新商品 {product_id} 失败: {e}")
-                    continue
+                    products = c.fetchall()
+                    alerts = load_price_alerts(c, due_ids)
+                    print(f"📊 本次更新 {len(products)} 个到期商品")
             
-            conn.commit()
-            conn.close()
-            print(f"✅ 价格更新完成，成功更新 {updated_count} 个商品")
+            if products is not None:
+                # 爬取期间不占用连接和写锁：引擎的写库协程把结果交给 save_price_update，
+                # 写语句进入 batch_writer，由写线程按批在短事务中提交
+                stats = crawl_engine.run(products, lambda product, product_info: save_price_update(batch_writer, product, product_info, alerts, crawl_scheduler))
+                batch_writer.flush()
+                schedule_stats = crawl_scheduler.stats()
+                write_stats = batch_writer.stats()
+                print(f"✅ 价格更新完成，成功更新 {stats.succeeded} 个商品")
+                print(f"💾 写库: 累计 {write_stats['commits']} 次提交写入 {write_stats['statements']} 条语句"
+                      f"（平均每次 {write_stats['avg_batch']} 条，{write_stats['avg_commit_ms']}ms）")
+                print(f"🗓️ 调度: 累计 {schedule_stats['requests']} 次请求发现 {schedule_stats['changes']} 次价格变化"
+                      f"（{schedule_stats['changes_per_request']} 次/请求），平均间隔 {schedule_stats['avg_interval']} 秒")
             
         except Exception as e:
             print(f"❌ 定时更新失败: {e}")
         
-        # 等待下一次更新
-        print(f"⏰ 下次更新在 {config.UPDATE_INTERVAL//60} 分钟后...")
-        time.sleep(config.UPDATE_INTERVAL)
-
-def check_price_alerts(product_id, current_price):
-    """检查价格提醒"""
-    try:
-        conn = sqlite3.connect('products.db')
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT id, target_price 
-            FROM price_alerts 
-            WHERE product_id = ? AND is_active = 1
-        ''', (product_id,))
-        
-        alerts = c.fetchall()
-        for alert_id, target_price in alerts:
-            if current_price <= target_price:
-                print(f"🎯 价格提醒触发! 商品 {product_id} 当前价格 {current_price} <= 目标价格 {target_price}")
-                # 这里可以添加邮件/短信通知
-                # send_notification(alert_id, product_id, current_price, target_price)
-        
-        conn.close()
-    except Exception as e:
-        print(f"❌ 检查价格提醒失败: {e}")
+        # 等待下一轮
+        time.sleep(config.SCHEDULE_TICK)
 
 # API路由
 @app.route('/')
@@ -244,8 +280,8 @@ def index():
 
 @app.route('/static/product_images/<filename>')
 def serve_product_image(filename):
-    """提供商品图片"""
-    return send_from_directory(config.IMAGE_DIR, filename)
+    """提供商品图片（文件名即内容哈希，可长期缓存）"""
+    return static_assets.send(config.IMAGE_DIR, filename)
 
 @app.route('/api/status')
 def api_status():
@@ -254,44 +290,45 @@ def api_status():
         'status': 'running',
         'service': 'Daily Price Tracker',
         'version': '1.0.0',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'last_crawl': crawl_engine.last_stats.to_dict() if crawl_engine.last_stats else None,
+        'structured_data': crawler.structured_extractor.stats(),
+        'selectors': crawler.selector_stats.stats(),
+        'circuit_breakers': crawler.breakers.stats(),
+        'http_pool': shared_pool.stats.to_dict(),
+        'fetch_coalescer': crawler.coalescer.stats(),
+        'scheduler': crawl_scheduler.stats(),
+        'crawl_jobs': job_queue.stats() if job_queue else None,
+        'batch_writer': batch_writer.stats(),
+        'image_manifest': image_manifest.stats()
     })
 
 @app.route('/api/products', methods=['GET'])
 def get_products():
     """获取所有商品"""
     try:
-        conn = sqlite3.connect('products.db')
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT p.*, 
-                   (SELECT price FROM price_history 
-                    WHERE product_id = p.id 
-                    ORDER BY timestamp DESC LIMIT 1) as current_price,
-                   (SELECT timestamp FROM price_history 
-                    WHERE product_id = p.id 
-                    ORDER BY timestamp DESC LIMIT 1) as last_updated
-            FROM products p
-            ORDER BY p.created_at DESC
-        ''')
-        
-        products = []
-        for row in c.fetchall():
-            product = dict(row)
+        with db_pool.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
             
-            # 确定使用哪个图片URL
-            if product['local_image_path'] and os.path.exists(os.path.join('static', product['local_image_path'])):
-                product['display_image'] = f"/static/{product['local_image_path']}"
-            elif product['image_url']:
-                product['display_image'] = product['image_url']
-            else:
-                product['display_image'] = '/static/placeholder.png'
+            c.execute('''
+                SELECT p.*, lp.price as current_price, lp.timestamp as last_updated
+                FROM products p
+                LEFT JOIN latest_prices lp ON lp.product_id = p.id
+                ORDER BY p.created_at DESC
+            ''')
+            
+            products = []
+            for row in c.fetchall():
+                product = dict(row)
+                
+                # 卡片用小尺寸变体，详情弹窗用大尺寸变体
+                image_urls = product_image_urls(product)
+                product['display_image'] = image_urls['card']
+                product['detail_image'] = image_urls['detail']
+                
+                products.append(product)
             
-            products.append(product)
-        
-        conn.close()
         return jsonify(products)
         
     except Exception as e:
@@ -316,65 +353,52 @@ def add_product():
         
         # 使用真实爬虫获取商品信息
         product_info = crawler.fetch_product_info(url)
+        if product_info and product_info.get('circuit_open'):
+            return jsonify({'error': '该平台暂时无法访问，请稍后重试'}), 503
         if not product_info or not product_info.get('success'):
             return jsonify({'error': '无法获取商品信息，请检查链接是否正确或稍后重试'}), 400
         
-        conn = sqlite3.connect('products.db')
-        c = conn.cursor()
-        
-        # 检查是否已存在
-        c.execute('SELECT id, name FROM products WHERE url = ?', (url,))
-        existing = c.fetchone()
-        if existing:
-            conn.close()
-            return jsonify({'error': f'该商品已在监控列表中: {existing[1]}'}), 400
-        
-        # 下载图片
-        local_image_path = None
-        if product_info.get('image_url'):
-            local_image_path = download_product_image(product_info['image_url'], 'new')
-        
-        # 保存商品
-        c.execute('''
-            INSERT INTO products (name, url, image_url, local_image_path, platform, 
-                                current_price, lowest_price, highest_price)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            product_info['name'], 
-            url, 
-            product_info['image_url'],
-            local_image_path,
-            product_info['platform'],
-            product_info['price'],
-            product_info['price'],
-            product_info['price']
-        ))
-        product_id = c.lastrowid
-        
-        # 如果图片下载成功，更新文件名包含真实ID
-        if local_image_path:
-            new_filename = f"product_{product_id}{get_image_extension(product_info['image_url'])}"
-            new_filepath = os.path.join(config.IMAGE_DIR, new_filename)
-            old_filepath = os.path.join('static', local_image_path)
+        with db_pool.connection() as conn:
+            c = conn.cursor()
             
-            if os.path.exists(old_filepath):
-                os.rename(old_filepath, new_filepath)
-                c.execute('UPDATE products SET local_image_path = ? WHERE id = ?', 
-                         (f"product_images/{new_filename}", product_id))
-        
-        # 保存价格历史
-        c.execute('''
-            INSERT INTO price_history (product_id, price)
-            VALUES (?, ?)
-        ''', (product_id, product_info['price']))
-        
-        conn.commit()
-        
-        # 获取完整的商品信息返回
-        c.execute('SELECT * FROM products WHERE id = ?', (product_id,))
-        product = dict(c.fetchone())
-        
-        conn.close()
+            # 检查是否已存在
+            c.execute('SELECT id, name FROM products WHERE url = ?', (url,))
+            existing = c.fetchone()
+            if existing:
+                return jsonify({'error': f'该商品已在监控列表中: {existing[1]}'}), 400
+            
+            # 保存商品，图片由后台线程下载
+            c.execute('''
+                INSERT INTO products (name, url, image_url, local_image_path, platform, 
+                                    current_price, lowest_price, highest_price)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                product_info['name'], 
+                url, 
+                product_info['image_url'],
+                None,
+                product_info['platform'],
+                product_info['price'],
+                product_info['price'],
+                product_info['price']
+            ))
+            product_id = c.lastrowid
+            
+            # 保存价格历史
+            c.execute('''
+                INSERT INTO price_history (product_id, price)
+                VALUES (?, ?)
+            ''', (product_id, product_info['price']))
+            
+            conn.commit()
+            image_worker.submit(product_id, product_info['image_url'])
+            
+            # 获取完整的商品信息返回
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            c.execute('SELECT * FROM products WHERE id = ?', (product_id,))
+            product = dict(c.fetchone())
+            image_urls = product_image_urls(product)
         
         print(f"✅ 商品添加成功: {product_info['name']}")
         return jsonify({
@@ -384,7 +408,8 @@ def add_product():
                 'name': product['name'],
                 'price': product['current_price'],
                 'platform': product['platform'],
-                'display_image': f"/static/{product['local_image_path']}" if product['local_image_path'] else product['image_url']
+                'display_image': image_urls['card'],
+                'detail_image': image_urls['detail']
             }
         })
         
@@ -396,25 +421,27 @@ def add_product():
 def delete_product(product_id):
     """删除商品"""
     try:
-        conn = sqlite3.connect('products.db')
-        c = conn.cursor()
-        
-        # 获取商品信息用于删除图片
-        c.execute('SELECT local_image_path FROM products WHERE id = ?', (product_id,))
-        result = c.fetchone()
-        
-        if result and result[0]:
-            image_path = os.path.join('static', result[0])
-            if os.path.exists(image_path):
-                os.remove(image_path)
+        with db_pool.connection() as conn:
+            c = conn.cursor()
+            
+            # 获取商品信息用于删除图片
+            c.execute('SELECT local_image_path FROM products WHERE id = ?', (product_id,))
+            result = c.fetchone()
+            
+            # 删除商品，价格历史和价格提醒由外键级联删除
+            c.execute('DELETE FROM products WHERE id = ?', (product_id,))
+            
+            # 图片按内容共享，没有其他商品引用时才删除文件
+            remove_image = False
+            if result and result[0]:
+                c.execute('SELECT COUNT(*) FROM products WHERE local_image_path = ?', (result[0],))
+                remove_image = c.fetchone()[0] == 0
+            
+            conn.commit()
+        crawl_scheduler.remove(product_id)
         
-        # 删除商品及相关数据
-        c.execute('DELETE FROM price_history WHERE product_id = ?', (product_id,))
-        c.execute('DELETE FROM price_alerts WHERE product_id = ?', (product_id,))
-        c.execute('DELETE FROM products WHERE id = ?', (product_id,))
-        
-        conn.commit()
-        conn.close()
+        if remove_image:
+            image_store.remove(result[0])
         
         return jsonify({'message': '商品删除成功'})
         
@@ -423,54 +450,39 @@ def delete_product(product_id):
 
 @app.route('/api/products/<int:product_id>/prices')
 def get_prices(product_id):
-    """获取价格历史"""
+    """获取价格历史，?days= 指定天数（默认30天），按范围选择汇总粒度"""
     try:
-        conn = sqlite3.connect('products.db')
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # 获取最近30天的价格数据
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
-        c.execute('''
-            SELECT price, timestamp 
-            FROM price_history 
-            WHERE product_id = ? AND timestamp >= ?
-            ORDER BY timestamp ASC
-        ''', (product_id, thirty_days_ago))
-        
-        prices = [dict(row) for row in c.fetchall()]
-        conn.close()
+        days = max(1, request.args.get('days', config.CHART_DEFAULT_DAYS, type=int))
+        with db_pool.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            
+            resolution, rows = load_price_points(c, product_id, days)
+            prices = [dict(row) for row in rows]
         
-        return jsonify(prices)
+        response = jsonify(prices)
+        response.headers['X-Price-Resolution'] = resolution
+        return response
     except Exception as e:
         print(f"❌ 获取价格历史失败: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/products/<int:product_id>/stats')
 def get_product_stats(product_id):
-    """获取商品统计信息"""
+    """获取商品统计信息，?days= 只统计最近几天（默认全部历史）"""
     try:
-        conn = sqlite3.connect('products.db')
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # 获取商品基本信息
-        c.execute('SELECT * FROM products WHERE id = ?', (product_id,))
-        product = dict(c.fetchone())
-        
-        # 获取价格统计
-        c.execute('''
-            SELECT 
-                COUNT(*) as total_records,
-                AVG(price) as average_price,
-                MIN(price) as min_price,
-                MAX(price) as max_price
-            FROM price_history 
-            WHERE product_id = ?
-        ''', (product_id,))
-        stats = dict(c.fetchone())
-        
-        conn.close()
+        days = request.args.get('days', type=int)
+        since = datetime.now() - timedelta(days=days) if days and days > 0 else None
+        with db_pool.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            
+            # 获取商品基本信息
+            c.execute('SELECT * FROM products WHERE id = ?', (product_id,))
+            product = dict(c.fetchone())
+            
+            # 获取价格统计
+            stats = dict(load_price_stats(c, product_id, since))
         
         return jsonify({
             'product': product,
@@ -491,16 +503,17 @@ def set_price_alert():
         if not product_id or not target_price:
             return jsonify({'error': '缺少必要参数'}), 400
         
-        conn = sqlite3.connect('products.db')
-        c = conn.cursor()
-        
-        c.execute('''
-            INSERT OR REPLACE INTO price_alerts (product_id, target_price)
-            VALUES (?, ?)
-        ''', (product_id, target_price))
-        
-        conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            c = conn.cursor()
+            
+            # 已有提醒时更新目标价格，保留提醒ID和创建时间
+            c.execute('''
+                INSERT INTO price_alerts (product_id, target_price)
+                VALUES (?, ?)
+                ON CONFLICT (product_id) DO UPDATE SET target_price = excluded.target_price, is_active = 1
+            ''', (product_id, target_price))
+            
+            conn.commit()
         
         return jsonify({'message': '价格提醒设置成功'})
         
@@ -513,6 +526,9 @@ def start_background_tasks():
     price_update_thread = threading.Thread(target=update_product_prices, daemon=True)
     price_update_thread.start()
     print("✅ 后台价格更新任务已启动")
+    image_worker.start()
+    print("✅ 后台图片处理任务已启动")
+    image_manifest.start_reconciler()
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -520,11 +536,15 @@ if __name__ == '__main__':
     print("=" * 60)
     print(f"📊 数据库: products.db")
     print(f"🖼️ 图片目录: {config.IMAGE_DIR}")
-    print(f"⏰ 更新间隔: {config.UPDATE_INTERVAL//60} 分钟")
-    print(f"🔍 每次更新: {config.BATCH_SIZE} 个商品")
+    print(f"⏰ 请求预算: 每 {config.UPDATE_INTERVAL//60} 分钟 {config.BATCH_SIZE} 个商品")
+    print(f"🔍 调度: 每 {config.SCHEDULE_TICK//60} 分钟检查到期商品，间隔按价格波动在 "
+          f"{config.SCHEDULE_MIN_INTERVAL//60} 分钟到 {config.SCHEDULE_MAX_INTERVAL//3600} 小时之间")
     print("=" * 60)
     
+    create_components()
     if init_db():
+        added, _ = image_manifest.load()
+        print(f"🖼️ 图片清单: {added} 个文件")
         start_background_tasks()
         print("🌐 服务启动: http://127.0.0.1:5000")
         app.run(debug=False, port=5000, host='127.0.0.1')
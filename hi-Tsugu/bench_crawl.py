@@ -0,0 +1,81 @@
+"""爬取吞吐量基准测试
+
+对本地模拟商城分别运行逐个爬取、在事件循环中解析的并发引擎和带解析进程池的流水线，
+输出每轮耗时、每秒处理商品数和流水线各阶段耗时。
+
+用法: python bench_crawl.py [商品数] [模拟延迟秒数]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from crawl_engine import AsyncCrawlEngine
+from http_cache import ValidatorCache
+from mock_shop import product_urls, start_mock_shop
+from rate_limiter import HostRateLimiter
+from real_crawler import RealProductCrawler
+
+# 基准测试只衡量抓取和解析本身，不做限速
+UNLIMITED = {'other': {'rate': 1e6, 'burst': 1e6}}
+
+
+def bench_sequential(crawler, urls):
+    """原有方式：逐个爬取"""
+    started = time.perf_counter()
+    succeeded = 0
+    for url in urls:
+        product_info = crawler.fetch_product_info(url)
+        if product_info and product_info.get('success'):
+            succeeded += 1
+    return succeeded, time.perf_counter() - started, None
+
+
+def bench_engine(crawler, urls):
+    """异步并发引擎，在事件循环中解析"""
+    return run_engine(AsyncCrawlEngine(crawler, parse_workers=0), urls)
+
+
+def bench_pipeline(crawler, urls):
+    """异步并发引擎 + 解析进程池"""
+    return run_engine(AsyncCrawlEngine(crawler), urls)
+
+
+def run_engine(engine, urls):
+    products = [(i, url) for i, url in enumerate(urls)]
+    stats = engine.run(products, lambda product, product_info: None)
+    engine.close()
+    return stats.succeeded, stats.wall_time, stats.stages
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    server, port = start_mock_shop(latency=latency)
+    urls = product_urls(port, count)
+
+    cache_dir = tempfile.mkdtemp()
+
+    print(f"🛒 模拟商城: {count} 个商品, 每个请求延迟 {latency} 秒")
+    for label, bench in (('逐个爬取', bench_sequential), ('并发引擎', bench_engine),
+                         ('解析进程池', bench_pipeline)):
+        # 每种方式使用独立的条件请求缓存，避免互相命中
+        crawler = RealProductCrawler(rate_limiter=HostRateLimiter(UNLIMITED),
+                                     http_cache=ValidatorCache(os.path.join(cache_dir, f'{bench.__name__}.db')))
+        with contextlib.redirect_stdout(io.StringIO()):
+            succeeded, wall_time, stages = bench(crawler, urls)
+        print(f"  {label}: 成功 {succeeded}/{count}, 耗时 {wall_time:.2f} 秒, "
+              f"{count / wall_time:.2f} 个/秒")
+        for stage, timer in (stages or {}).items():
+            timer = timer.to_dict()
+            print(f"    {stage:<11} 次数 {timer['count']:>5}  合计 {timer['total']:>7.3f}s  "
+                  f"平均 {timer['avg']:.4f}s  最大 {timer['max']:.4f}s")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
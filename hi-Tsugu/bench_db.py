@@ -0,0 +1,131 @@
+"""数据库连接基准测试
+
+在临时数据库中建立商品表和价格历史，多个线程同时执行混合读写：
+大部分请求读取商品列表或某个商品的价格历史，其余请求写入一条价格记录。
+比较每次操作新建连接（默认回滚日志）和使用 ConnectionPool（WAL）时的延迟分位数和锁冲突次数。
+
+用法: python bench_db.py [线程数] [每个线程的操作数]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+from db_pool import ConnectionPool
+
+PRODUCTS = 200
+HISTORY_PER_PRODUCT = 50
+WRITE_RATIO = 0.2
+
+HISTORY_SQL = '''
+    SELECT price, timestamp FROM price_history
+    WHERE product_id = ? ORDER BY timestamp DESC LIMIT 50
+'''
+
+
+def create_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    conn.executemany('INSERT INTO products (name, url) VALUES (?, ?)',
+                     [(f'商品 {i}', f'https://example.com/item/{i}') for i in range(PRODUCTS)])
+    conn.executemany('INSERT INTO price_history (product_id, price, timestamp) VALUES (?, ?, ?)',
+                     [(product_id, random.uniform(10, 1000), f'2024-01-01 00:{n // 60:02d}:{n % 60:02d}')
+                      for product_id in range(1, PRODUCTS + 1) for n in range(HISTORY_PER_PRODUCT)])
+    conn.commit()
+    conn.close()
+
+
+def direct(path):
+    """改造前：每次操作新建连接"""
+    @contextmanager
+    def connection():
+        conn = sqlite3.connect(path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    return connection
+
+
+def worker(connection, operations, seed, latencies, errors):
+    rng = random.Random(seed)
+    for _ in range(operations):
+        write = rng.random() < WRITE_RATIO
+        start = time.perf_counter()
+        try:
+            with connection() as conn:
+                if write:
+                    conn.execute('INSERT INTO price_history (product_id, price) VALUES (?, ?)',
+                                 (rng.randint(1, PRODUCTS), rng.uniform(10, 1000)))
+                    conn.commit()
+                elif rng.random() < 0.5:
+                    conn.execute('SELECT * FROM products ORDER BY created_at DESC').fetchall()
+                else:
+                    conn.execute(HISTORY_SQL, (rng.randint(1, PRODUCTS),)).fetchall()
+        except sqlite3.OperationalError:
+            errors.append(write)
+            continue
+        latencies['write' if write else 'read'].append(time.perf_counter() - start)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def run(connection, threads, operations):
+    latencies = {'read': [], 'write': []}
+    errors = []
+    workers = [threading.Thread(target=worker, args=(connection, operations, seed, latencies, errors))
+               for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    work_dir = tempfile.mkdtemp()
+
+    print(f"🗄️ {threads} 个线程, 每个线程 {operations} 次操作, 写入占 {WRITE_RATIO:.0%}")
+    for label, pooled in (('每次新建连接', False), ('连接池 + WAL', True)):
+        path = os.path.join(work_dir, f'{pooled}.db')
+        create_db(path)
+        if pooled:
+            pool = ConnectionPool(path, Config.DB_POOL_IDLE, Config.DB_BUSY_TIMEOUT,
+                                  Config.DB_SYNCHRONOUS, Config.DB_MMAP_SIZE)
+            connection = pool.connection
+        else:
+            connection = direct(path)
+        latencies, errors, elapsed = run(connection, threads, operations)
+        print(f"  {label}: {threads * operations / elapsed:.0f} 次/秒, database is locked {len(errors)} 次")
+        for kind in ('read', 'write'):
+            values = latencies[kind]
+            print(f"    {kind:<6}p50 {percentile(values, 0.5):6.2f}ms  p95 {percentile(values, 0.95):6.2f}ms  "
+                  f"p99 {percentile(values, 0.99):6.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
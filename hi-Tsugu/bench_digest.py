@@ -0,0 +1,66 @@
+"""内容摘要基准测试
+
+模拟商城回放 fixtures 中的页面，不返回 ETag，并在每个页面中加入每次都不同的随机数和时间戳。
+同一批商品连续爬取两轮，比较开启和关闭内容摘要时第二轮的解析次数、解析耗时和价格写入次数。
+
+用法: python bench_digest.py [商品数]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from config import Config
+from crawl_engine import AsyncCrawlEngine
+from fetch_coalescer import FetchCoalescer
+from fixture_store import FixtureStore
+from http_cache import ValidatorCache
+from mock_shop import product_urls, start_mock_shop
+from rate_limiter import HostRateLimiter
+from real_crawler import RealProductCrawler
+
+# 基准测试只衡量抓取和解析本身，不做限速
+UNLIMITED = {'other': {'rate': 1e6, 'burst': 1e6}}
+
+
+def crawl(crawler, urls):
+    """爬取一轮，返回 (统计, 需要写入价格历史的商品数)"""
+    writes = []
+
+    def on_result(product, product_info):
+        if product_info and product_info.get('success') and not product_info.get('not_modified'):
+            writes.append(product)
+
+    engine = AsyncCrawlEngine(crawler)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = engine.run(list(enumerate(urls)), on_result)
+    engine.close()
+    return stats, len(writes)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    server, port = start_mock_shop(etag='none', fixtures=FixtureStore(), volatile=True)
+    urls = product_urls(port, count)
+    cache_dir = tempfile.mkdtemp()
+
+    print(f"🛒 模拟商城: {count} 个商品, 不返回 ETag, 页面带随机数和时间戳")
+    for label, enabled in (('关闭内容摘要', False), ('开启内容摘要', True)):
+        Config.CONTENT_DIGEST_ENABLED = enabled
+        # 不缓存抓取结果，第二轮每个商品都重新请求
+        crawler = RealProductCrawler(rate_limiter=HostRateLimiter(UNLIMITED),
+                                     http_cache=ValidatorCache(os.path.join(cache_dir, f'{enabled}.db')),
+                                     coalescer=FetchCoalescer(ttl=0))
+        crawl(crawler, urls)
+        stats, writes = crawl(crawler, urls)
+        parse = stats.stages['parse'].to_dict()
+        print(f"  {label}: 第二轮成功 {stats.succeeded}/{count}, 内容未变化 {stats.http_cache['digest_hits']}, "
+              f"写入价格 {writes} 次, 解析耗时 {parse['total']:.3f}s, "
+              f"耗时 {stats.wall_time:.2f} 秒")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""连接池基准测试
+
+多个线程并发请求本地模拟商城，比较：
+- 每次请求新建会话（相当于原来图片下载使用的 requests.get）；
+- 共享连接池。
+输出新建连接数、复用次数和握手总耗时。
+
+用法: python bench_http_pool.py [请求数] [线程数]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_pool import HttpPool
+from mock_shop import product_urls, start_mock_shop
+
+
+def bench(get, urls, threads):
+    """返回耗时"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for response in executor.map(get, urls):
+            response.close()
+    return time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    server, port = start_mock_shop()
+    urls = product_urls(port, count)
+    print(f"🔌 {count} 个请求, {threads} 个线程")
+
+    # 每次请求一个新连接池，统计计入同一个对象
+    fresh = HttpPool()
+
+    def fresh_get(url):
+        pool = HttpPool()
+        pool.stats = fresh.stats
+        return pool.session().get(url, timeout=10)
+
+    shared = HttpPool()
+    shared_session = shared.session()
+
+    def shared_get(url):
+        return shared_session.get(url, timeout=10)
+
+    for label, pool, get in (('每次新建会话', fresh, fresh_get), ('共享连接池', shared, shared_get)):
+        wall_time = bench(get, urls, threads)
+        stats = pool.stats.to_dict()
+        print(f"  {label}: 耗时 {wall_time:.2f} 秒, 新建连接 {stats['new_connections']}, "
+              f"复用 {stats['reused_connections']}, 握手共 {stats['connect_time'] * 1000:.1f} ms "
+              f"(平均 {stats['avg_connect_time'] * 1000:.2f} ms)")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
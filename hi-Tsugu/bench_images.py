@@ -0,0 +1,57 @@
+"""图片处理基准测试
+
+从本地模拟商城下载商品图片并生成变体，输出：
+- 每张图片的下载和处理耗时（即添加商品时从请求路径上移除的时间）；
+- 原图、卡片变体、详情变体的平均字节数（列表页传输量的变化）。
+
+用法: python bench_images.py [图片数]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+from http_pool import shared_pool
+from image_store import ImageStore, variant_path
+from mock_shop import start_mock_shop
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    server, port = start_mock_shop()
+    image_dir = os.path.join(tempfile.mkdtemp(), 'product_images')
+    store = ImageStore(shared_pool.session(), image_dir=image_dir)
+
+    sizes = {'original': [], **{variant: [] for variant in Config.IMAGE_VARIANTS}}
+    download_time = variant_time = 0.0
+    for i in range(count):
+        url = f'http://127.0.0.1:{port}/images/{i}.jpg'
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            relative_path = store.download(url)
+        downloaded = time.perf_counter()
+        store.make_variants(relative_path)
+        download_time += downloaded - started
+        variant_time += time.perf_counter() - downloaded
+
+        sizes['original'].append(os.path.getsize(os.path.join(image_dir, os.path.basename(relative_path))))
+        for variant in Config.IMAGE_VARIANTS:
+            path = os.path.join(image_dir, os.path.basename(variant_path(relative_path, variant)))
+            sizes[variant].append(os.path.getsize(path))
+        # 删除生成的文件，避免后面相同内容的图片直接命中
+        store.remove(relative_path)
+
+    print(f"🖼️ {count} 张图片")
+    print(f"  下载: 平均 {download_time / count * 1000:.1f} ms, 生成变体: 平均 {variant_time / count * 1000:.1f} ms")
+    for name, values in sizes.items():
+        print(f"  {name:<9} 平均 {sum(values) / len(values) / 1024:>8.1f} KB")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
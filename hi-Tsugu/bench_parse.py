@@ -0,0 +1,67 @@
+"""解析吞吐量基准测试
+
+用 fixtures/pages 下保存的商品页面，比较 BeautifulSoup 解析和分阶段快速解析
+（结构化数据 -> lxml）的每秒页数。
+
+用法: python bench_parse.py [每个页面的重复次数]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+from real_crawler import RealProductCrawler
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+FIXTURE_URLS = {
+    'taobao': 'https://item.taobao.com/item.htm?id=1',
+    'tmall': 'https://detail.tmall.com/item.htm?id=2',
+    'jd': 'https://item.jd.com/100012345678.html',
+    'pdd': 'https://mobile.yangkeduo.com/goods.html?goods_id=3',
+    'other': 'https://shop.example.com/switch-oled'
+}
+
+
+def load_fixtures():
+    """读取保存的页面"""
+    fixtures = {}
+    for platform, url in FIXTURE_URLS.items():
+        with open(os.path.join(FIXTURE_DIR, f'{platform}.html'), 'rb') as f:
+            fixtures[platform] = (url, f.read())
+    return fixtures
+
+
+def bench(parse, body, url, rounds):
+    """返回 (每秒页数, 解析结果)"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        product_info = parse(body, url)
+    return rounds / (time.perf_counter() - started), product_info
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    crawler = RealProductCrawler()
+
+    def soup_path(body, url):
+        return crawler.parse_product_page(body.decode('utf-8', errors='replace'), url)
+
+    print(f"{'平台':<8}{'大小(KB)':>10}{'BeautifulSoup':>16}{'快速解析':>12}{'加速':>8}  命中阶段")
+    for platform, (url, body) in load_fixtures().items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            soup_rate, _ = bench(soup_path, body, url, rounds)
+            fast_rate, _ = bench(crawler.parse_product_content, body, url, rounds)
+        if crawler.structured_extractor.extract(body, url):
+            hit = '结构化数据'
+        elif crawler.fast_extractor.extract(body, url):
+            hit = 'lxml'
+        else:
+            hit = '回退'
+        print(f"{platform:<8}{len(body) / 1024:>10.1f}{soup_rate:>14.1f}/s{fast_rate:>10.1f}/s"
+              f"{fast_rate / soup_rate:>7.1f}x  {hit}")
+
+
+if __name__ == '__main__':
+    main()
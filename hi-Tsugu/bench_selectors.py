@@ -0,0 +1,49 @@
+"""选择器排序基准测试
+
+用 fixtures/pages 下保存的页面，分别按配置顺序（探索率为1）和按命中统计排序尝试选择器，
+比较 BeautifulSoup 解析和 lxml 快速解析中每个商品的选择器查询次数，并列出从未命中的选择器。
+
+用法: python bench_selectors.py [每个页面的重复次数]
+"""
+import contextlib
+import io
+import sys
+
+from bench_parse import load_fixtures
+from real_crawler import RealProductCrawler
+from selector_stats import SelectorStats
+
+
+def run(crawler, fixtures, rounds):
+    """返回每个商品的选择器查询次数"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            for url, body in fixtures.values():
+                crawler.parse_product_page(body.decode('utf-8', errors='replace'), url)
+                crawler.fast_extractor.extract(body, url)
+    products = rounds * len(fixtures) * 2
+    lookups = sum(sum(selector['tries'] for selector in field['selectors'].values())
+                  for fields in crawler.selector_stats.stats().values() for field in fields.values())
+    return lookups / products
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    fixtures = load_fixtures()
+    crawler = RealProductCrawler()
+
+    print(f"🔎 {len(fixtures)} 个页面, 每个页面 BeautifulSoup 和 lxml 各解析 {rounds} 次")
+    for label, explore_rate in (('配置顺序', 1.0), ('按命中排序', None)):
+        crawler.selector_stats = SelectorStats(explore_rate=explore_rate)
+        print(f"  {label}: 每个商品 {run(crawler, fixtures, rounds):.2f} 次选择器查询")
+
+    print("\n按命中排序后各字段的平均查询次数:")
+    for platform, fields in crawler.selector_stats.stats().items():
+        for field, stat in fields.items():
+            dead = [selector for selector, s in stat['selectors'].items() if not s['hits']]
+            print(f"  {platform:<7}{field:<6}{stat['lookups_per_extraction']:>6.2f}"
+                  + (f"  从未命中: {', '.join(dead)}" if dead else ''))
+
+
+if __name__ == '__main__':
+    main()
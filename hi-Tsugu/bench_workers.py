@@ -0,0 +1,98 @@
+"""多进程爬取基准测试
+
+把一批商品写入任务表，分别用 1、2、4 个 crawl_worker 进程处理，
+输出耗时、吞吐量，并检查每个商品恰好被写入一次价格历史（没有重复爬取）。
+每个工作进程同一主机最多 CRAWL_PER_HOST_CONCURRENCY 个并发请求，
+所以在模拟延迟较大时吞吐量主要取决于进程数，直到CPU或目标站点成为瓶颈。
+
+用法: python bench_workers.py [商品数] [模拟延迟秒数]
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from mock_shop import product_urls, start_mock_shop
+
+# 基准测试只衡量抓取本身，不做限速
+UNLIMITED = {'other': {'rate': 1e6, 'burst': 1e6}}
+WORKER_COUNTS = (1, 2, 4)
+
+
+def setup_database(urls):
+    """在当前目录创建数据库，写入商品和对应的任务"""
+    import app
+    from job_queue import JobQueue
+
+    app.create_components()
+    # 连接池中的连接还指向上一轮工作目录的数据库
+    app.db_pool.close_all()
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.init_db()
+    conn = sqlite3.connect('products.db')
+    conn.executemany('INSERT INTO products (name, url, platform) VALUES (?, ?, ?)',
+                     [(f'商品{i}', url, 'other') for i, url in enumerate(urls)])
+    conn.commit()
+    product_ids = [row[0] for row in conn.execute('SELECT id FROM products')]
+    conn.close()
+    JobQueue('products.db').enqueue(product_ids)
+
+
+def run_worker(index):
+    from crawl_worker import CrawlWorker
+    from http_cache import ValidatorCache
+    from rate_limiter import HostRateLimiter
+    from real_crawler import RealProductCrawler
+
+    crawler = RealProductCrawler(rate_limiter=HostRateLimiter(UNLIMITED),
+                                 http_cache=ValidatorCache(f'http_cache_{index}.db'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        CrawlWorker(f'bench-{index}', crawler=crawler).run(once=True)
+
+
+def bench(worker_count, urls):
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    setup_database(urls)
+
+    started = time.perf_counter()
+    processes = [multiprocessing.Process(target=run_worker, args=(i,)) for i in range(worker_count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    wall_time = time.perf_counter() - started
+
+    conn = sqlite3.connect('products.db')
+    history = dict(conn.execute('SELECT product_id, COUNT(*) FROM price_history GROUP BY product_id'))
+    done = conn.execute("SELECT COUNT(*) FROM crawl_jobs WHERE status = 'done'").fetchone()[0]
+    conn.close()
+    duplicates = sum(1 for count in history.values() if count > 1)
+    return wall_time, len(history), duplicates, done
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    server, port = start_mock_shop(latency=latency)
+    urls = product_urls(port, count)
+    print(f"🛒 模拟商城: {count} 个商品, 每个请求延迟 {latency} 秒, CPU {os.cpu_count()} 核")
+
+    base_rate = None
+    for worker_count in WORKER_COUNTS:
+        wall_time, crawled, duplicates, done = bench(worker_count, urls)
+        rate = count / wall_time
+        base_rate = base_rate or rate
+        print(f"  {worker_count} 个工作进程: 耗时 {wall_time:.2f} 秒, {rate:.2f} 个/秒 "
+              f"({rate / base_rate:.2f}x), 写入 {crawled}/{count}, 重复 {duplicates}, 完成任务 {done}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""爬取结果写库基准测试
+
+在临时目录中创建数据库并写入商品，模拟一轮爬取：爬取结果按固定速率交给 save_price_update，
+同时多个线程通过测试客户端调用 API（读取价格历史、设置价格提醒）。比较三种写法：
+- 整轮一个事务：原来的写法，爬取期间一直占着写锁，设置提醒要等到整轮结束；
+- 每个结果一个事务：不占写锁，但每个结果都要单独提交；
+- BatchWriter：写线程按批在短事务中提交。
+输出每秒提交的事务数、平均每个事务的语句数、API 延迟分位数和失败次数。
+
+用法: python bench_writes.py [商品数] [每秒爬取结果数] [API线程数]
+"""
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+HISTORY_PER_PRODUCT = 20
+ALERT_RATIO = 0.2
+
+
+def setup_database(products):
+    """在当前目录创建数据库，写入商品、价格历史和价格提醒"""
+    import app
+
+    app.create_components()
+    app.db_pool.close_all()
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.init_db()
+    conn = sqlite3.connect('products.db')
+    conn.executemany('INSERT INTO products (name, url, platform, current_price, lowest_price, highest_price) '
+                     'VALUES (?, ?, ?, 100, 100, 100)',
+                     [(f'商品{i}', f'https://example.com/item/{i}', 'other') for i in range(products)])
+    conn.executemany('INSERT INTO price_history (product_id, price, timestamp) VALUES (?, ?, ?)',
+                     [(product_id, 100, f'2024-01-01 {n:02d}:00:00')
+                      for product_id in range(1, products + 1) for n in range(HISTORY_PER_PRODUCT)])
+    conn.executemany('INSERT INTO price_alerts (product_id, target_price) VALUES (?, ?)',
+                     [(product_id, 90) for product_id in range(1, products + 1) if product_id % 5 == 0])
+    conn.commit()
+    conn.close()
+
+
+def crawl_results(products, seed):
+    rng = random.Random(seed)
+    return [((product_id, f'https://example.com/item/{product_id - 1}', 100, 100, 100),
+             {'success': True, 'price': round(rng.uniform(80, 120), 2)})
+            for product_id in range(1, products + 1)]
+
+
+def paced(results, rate):
+    """按每秒 rate 个的速度交出爬取结果"""
+    started = time.perf_counter()
+    for i, result in enumerate(results):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield result
+
+
+def long_transaction(app, results, rate):
+    """改造前：整轮爬取共用一个写事务"""
+    with app.db_pool.connection() as conn:
+        c = conn.cursor()
+        for product, product_info in paced(results, rate):
+            app.save_price_update(c, product, product_info)
+        conn.commit()
+    return 1
+
+
+def per_result(app, results, rate):
+    """每个结果单独提交"""
+    for product, product_info in paced(results, rate):
+        with app.db_pool.connection() as conn:
+            app.save_price_update(conn.cursor(), product, product_info)
+            conn.commit()
+    return len(results)
+
+
+def batched(app, results, rate):
+    """交给 BatchWriter"""
+    before = app.batch_writer.stats()['commits']
+    with app.db_pool.connection() as conn:
+        alerts = app.load_price_alerts(conn.cursor(), [product[0] for product, _ in results])
+    for product, product_info in paced(results, rate):
+        app.save_price_update(app.batch_writer, product, product_info, alerts)
+    app.batch_writer.flush()
+    return app.batch_writer.stats()['commits'] - before
+
+
+def api_client(app, products, seed, stop, latencies, failures):
+    rng = random.Random(seed)
+    client = app.app.test_client()
+    while not stop.is_set():
+        product_id = rng.randint(1, products)
+        write = rng.random() < ALERT_RATIO
+        started = time.perf_counter()
+        if write:
+            response = client.post('/api/alerts', json={'product_id': product_id, 'target_price': 95})
+        else:
+            response = client.get(f'/api/products/{product_id}/prices')
+        kind = 'write' if write else 'read'
+        latencies[kind].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            failures[kind] += 1
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def bench(mode, products, rate, api_threads):
+    import app
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    setup_database(products)
+    results = crawl_results(products, seed=0)
+
+    stop = threading.Event()
+    latencies = {'read': [], 'write': []}
+    failures = {'read': 0, 'write': 0}
+    clients = [threading.Thread(target=api_client, args=(app, products, seed, stop, latencies, failures))
+               for seed in range(api_threads)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in clients:
+            thread.start()
+        started = time.perf_counter()
+        commits = mode(app, results, rate)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in clients:
+            thread.join()
+
+    conn = sqlite3.connect('products.db')
+    written = conn.execute('SELECT COUNT(*) FROM price_history').fetchone()[0] - products * HISTORY_PER_PRODUCT
+    conn.close()
+    return elapsed, commits, written, latencies, failures
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+    api_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    print(f"💾 {products} 个商品, 每秒 {rate:.0f} 个爬取结果, {api_threads} 个API线程")
+    for label, mode in (('整轮一个事务', long_transaction), ('每个结果一个事务', per_result),
+                        ('BatchWriter', batched)):
+        elapsed, commits, written, latencies, failures = bench(mode, products, rate, api_threads)
+        print(f"  {label}: 耗时 {elapsed:.2f} 秒, 提交 {commits} 次 ({commits / elapsed:.1f} 次/秒), "
+              f"平均每次 {written / max(commits, 1):.1f} 条价格记录, 写入 {written}/{products}")
+        for kind in ('read', 'write'):
+            values = latencies[kind]
+            print(f"    API {kind:<6}{len(values):5d} 次  p50 {percentile(values, 0.5):7.2f}ms  "
+                  f"p99 {percentile(values, 0.99):8.2f}ms  失败 {failures[kind]} 次")
+
+
+if __name__ == '__main__':
+    main()
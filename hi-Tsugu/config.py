@@ -6,24 +6,164 @@ class Config:
     
     # 数据库配置
     DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///products.db'
+    # SQLite 连接池：连接使用 WAL 日志，读写互不阻塞
+    DB_POOL_IDLE = 8  # 保留的空闲连接数
+    DB_BUSY_TIMEOUT = 5  # 等待写锁的时间（秒）
+    DB_SYNCHRONOUS = 'NORMAL'  # WAL 模式下只在检查点同步磁盘
+    DB_MMAP_SIZE = 64 * 1024 * 1024  # 内存映射读取的字节数
+    # 爬取结果由单个写线程批量写入，每个事务都很短
+    DB_FLUSH_SIZE = 200  # 每个事务最多写入的语句数
+    DB_FLUSH_INTERVAL = 0.5  # 写入最多延迟的秒数
     
     # 爬虫配置
     REQUEST_TIMEOUT = 15
     MAX_RETRIES = 3
     DELAY_BETWEEN_REQUESTS = 2
+    
+    # 重试与熔断
+    FETCH_DEADLINE = 60  # 单个商品抓取（含重试）的总时限（秒）
+    RETRY_BASE_DELAY = 1  # 指数退避的基数（秒）
+    RETRY_MAX_DELAY = 20  # 单次退避等待上限（秒）
+    BREAKER_FAILURE_THRESHOLD = 5  # 同一域名连续失败多少次后熔断
+    BREAKER_RESET_TIMEOUT = 120  # 熔断后多久放行一个探测请求（秒）
+    
+    # 抓取合并：同一URL同时只发一个请求，成功结果短期缓存
+    FETCH_CACHE_TTL = 60  # 结果缓存时间（秒），0 表示只合并不缓存
+    FETCH_CACHE_SIZE = 1000  # 最多缓存的URL数
+    
+    # 连接池配置（页面和图片下载共用）
+    HTTP_POOL_HOSTS = 50  # 缓存的主机连接池数量
+    HTTP_POOL_MAXSIZE = 10  # 每个主机保留的连接数
+    HTTP_POOL_HOST_SIZES = {  # 按域名单独设置连接数，图片CDN请求较多
+        'alicdn.com': 20,
+        '360buyimg.com': 20,
+        'yangkeduo.com': 10
+    }
+    HTTP_KEEPALIVE_TIMEOUT = 30  # 空闲连接保留时间（秒）
+    DNS_CACHE_TTL = 300  # 域名解析结果缓存时间（秒）
+    
     USER_AGENTS = [
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/120.0.0.0 Safari/537.36'
     ]
     
+    # 各平台选择器（BeautifulSoup 解析和 lxml 快速解析共用，天猫使用淘宝的配置）
+    SITE_CONFIGS = {
+        'taobao': {
+            'name_selectors': ['#J_Title .tb-main-title', '.tb-detail-hd h1', '[class*="Title--title"]', 'h1[data-spm]', 'title'],
+            'price_selectors': ['.tb-rmb-num', '[class*="Price--price"]', '.tm-price', '.tb-property .tb-price'],
+            'image_selectors': ['#J_ImgBooth', '.tb-booth img', '.tb-pic img', '[class*="main-img"] img'],
+            'image_attrs': ['src', 'data-src', 'data-ks-lazyload']
+        },
+        'jd': {
+            'name_selectors': ['.sku-name', '.product-title', 'title'],
+            # .J-p-123456 为动态ID，需要从页面获取
+            'price_selectors': ['.p-price .price', '.J-p-123456', '.price .num', '[class*="price J-p-"]'],
+            'image_selectors': ['#spec-img', '.main-img img', '[class*="spec-pic"] img', '.preview-img img'],
+            'image_attrs': ['data-origin', 'src', 'data-lazyload']
+        },
+        'pdd': {
+            'name_selectors': ['title'],
+            'price_selectors': [],
+            'image_selectors': ['.goods-gallery__main img', '.slide-main img', '[class*="image"] img'],
+            'image_attrs': ['src', 'data-src']
+        },
+        'other': {
+            'name_selectors': ['title'],
+            'price_selectors': [],
+            'image_selectors': [],
+            'image_attrs': []
+        }
+    }
+    SELECTOR_EXPLORE_RATE = 0.05  # 按配置顺序（而不是按命中次数）尝试选择器的概率
+    
+    # 流式下载：每次读取的块大小，以及每个平台最多读取的页面字节数
+    STREAM_CHUNK_SIZE = 16 * 1024
+    PAGE_BYTE_BUDGETS = {
+        'taobao': 512 * 1024,
+        'tmall': 512 * 1024,
+        'jd': 768 * 1024,
+        'pdd': 512 * 1024,
+        'other': 1024 * 1024
+    }
+    
+    # 内容摘要：去掉随机数、时间戳等易变内容后计算页面摘要，与上次相同时不解析页面、不写价格历史，
+    # 按页面未变化（与304相同）处理。只用于条件请求无效的页面，这些页面会读到末尾或字节预算，
+    # 不再在信息提取完整时提前停止读取
+    CONTENT_DIGEST_ENABLED = True
+    # 计算摘要前删除的内容（正则表达式），空白总是忽略。每个表达式都以固定字符开头，
+    # re 可以先按字面量定位候选位置，不必在每个字节上尝试匹配
+    CONTENT_DIGEST_STRIP_PATTERNS = [
+        r'nonce="[^"]*"',
+        r'srf[_-]?token["\']?\s*[:=]\s*["\'][^"\']*["\']',  # csrf/xsrf 令牌
+        r'request_?[iI]d["\']?\s*[:=]\s*["\'][^"\']*["\']',
+        r'trace_?[iI]d["\']?\s*[:=]\s*["\'][^"\']*["\']',
+        r'session_?[iI]d["\']?\s*[:=]\s*["\'][^"\']*["\']',
+        r'1[5-9]\d{8}(?:\d{3})?(?!\d)',  # 秒/毫秒时间戳，包括防缓存参数 ?t=...
+        r'20\d{2}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?'  # 日期时间
+    ]
+    
     # 图片配置
     IMAGE_DIR = 'static/product_images'
     MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+    IMAGE_CHUNK_SIZE = 64 * 1024  # 图片流式写入的块大小
+    IMAGE_TIMEOUT = 10
+    # 后台生成的WebP变体：商品卡片和详情弹窗各用一种尺寸（最长边不超过该尺寸）
+    IMAGE_VARIANTS = {
+        'card': (400, 400),
+        'detail': (800, 800)
+    }
+    IMAGE_WEBP_QUALITY = 80
+    IMAGE_WORKERS = 2  # 后台图片处理线程数
+    IMAGE_QUEUE_SIZE = 1000  # 等待处理的图片数上限
+    IMAGE_MANIFEST_RECONCILE_INTERVAL = 600  # 图片清单与磁盘对账的间隔（秒）
+    
+    # 价格走势图和统计：按时间范围读取小时或天的汇总（开盘、最高、最低、收盘）
+    CHART_DEFAULT_DAYS = 30  # 价格走势默认的天数
+    CHART_MIN_POINTS = 60  # 选择最粗的汇总粒度，但时间范围内至少要有这么多个时间桶，不足时读取原始记录
     
     # 价格更新配置
     UPDATE_INTERVAL = 1800  # 30分钟
-    BATCH_SIZE = 5  # 每次更新的商品数量
+    BATCH_SIZE = 5  # 每次更新的商品数量（请求预算：每 UPDATE_INTERVAL 最多这么多个请求）
+    
+    # 自适应调度：按价格变化频率决定每个商品的检查间隔
+    SCHEDULE_TICK = 300  # 每隔多少秒取出一次到期的商品，预算按比例分摊到每一轮
+    SCHEDULE_DEFAULT_INTERVAL = 6 * 3600  # 没有价格历史时的检查间隔（秒）
+    SCHEDULE_MIN_INTERVAL = 1800  # 检查间隔下限（秒）
+    SCHEDULE_MAX_INTERVAL = 3 * 24 * 3600  # 检查间隔上限（秒）
+    SCHEDULE_CHANGE_FACTOR = 0.5  # 检查间隔 = 平均变化间隔 × 该系数
+    SCHEDULE_HISTORY_DAYS = 30  # 统计变化频率使用的历史天数
+    SCHEDULE_ALERT_PROXIMITY = 0.1  # 当前价高出提醒目标价不超过10%时视为接近目标
+    SCHEDULE_ALERT_BOOST = 0.25  # 接近目标价时检查间隔乘以该系数
+    
+    # 多进程爬取：CRAWL_MODE 为 thread 时在Web进程内爬取；为 queue 时Web进程只把到期商品写入任务表，
+    # 由一个或多个 crawl_worker.py 进程领取执行
+    CRAWL_MODE = os.environ.get('CRAWL_MODE') or 'thread'
+    JOB_LEASE_SECONDS = 120  # 任务租约时长（秒），工作进程每 1/3 租约续租一次
+    JOB_MAX_ATTEMPTS = 3  # 同一任务最多被领取的次数
+    WORKER_BATCH_SIZE = 20  # 工作进程每次领取的任务数
+    WORKER_POLL_INTERVAL = 5  # 没有任务时的等待时间（秒）
+    
+    # 并发爬取配置
+    CRAWL_CONCURRENCY = 20  # 全局同时进行的请求数
+    CRAWL_PER_HOST_CONCURRENCY = 2  # 同一主机同时进行的请求数
+    
+    # 流水线配置：抓取 -> 解析进程池 -> 写库
+    PARSE_WORKERS = os.cpu_count() or 2  # 解析进程数，0 表示在事件循环中直接解析
+    PARSE_QUEUE_SIZE = 64  # 等待解析的页面数上限，超过时抓取阶段暂停
+    WRITE_QUEUE_SIZE = 256  # 等待写库的结果数上限
+    
+    # 按平台限速：rate 为每秒令牌数，burst 为突发容量
+    # 默认约每3秒一个请求，与原来每个商品后随机等待2-4秒的节奏相当
+    RATE_LIMITS = {
+        'taobao': {'rate': 0.33, 'burst': 1},
+        'tmall': {'rate': 0.33, 'burst': 1},
+        'jd': {'rate': 0.33, 'burst': 1},
+        'pdd': {'rate': 0.33, 'burst': 1},
+        'amazon': {'rate': 0.33, 'burst': 1},
+        'other': {'rate': 0.33, 'burst': 1}
+    }
     
     # 通知配置
     ENABLE_EMAIL_NOTIFICATIONS = False
@@ -0,0 +1,325 @@
+import asyncio
+import random
+import time
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse
+
+import aiohttp
+
+from config import Config
+from http_pool import shared_pool
+from parse_pool import create_parse_pool, parse_page
+from resilience import CircuitOpenError, RetryableError
+from real_crawler import RealProductCrawler
+from streaming import StreamingPageReader
+
+
+class StageTimer:
+    """单个流水线阶段的耗时统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': round(self.total, 3),
+            'avg': round(self.total / self.count, 4) if self.count else 0.0,
+            'max': round(self.max, 4)
+        }
+
+
+# 抓取 -> 等待解析 -> 解析 -> 等待写库 -> 写库
+STAGES = ('fetch', 'parse_wait', 'parse', 'write_wait', 'write')
+
+
+class CrawlStats:
+    """单轮爬取统计"""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.bytes_read = 0
+        self.early_stops = 0
+        self.short_circuited = 0
+        self.cached = 0
+        self.http_cache = None
+        self.connections = None
+        self.stages = {stage: StageTimer() for stage in STAGES}
+
+    def record_stage(self, stage, seconds):
+        self.stages[stage].record(seconds)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def wall_time(self):
+        """本轮耗时（秒）"""
+        end = self.finished_at or time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def products_per_second(self):
+        """每秒处理的商品数"""
+        return self.total / self.wall_time if self.wall_time > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'wall_time': round(self.wall_time, 3),
+            'products_per_second': round(self.products_per_second, 2),
+            'bytes_read': self.bytes_read,
+            'early_stops': self.early_stops,
+            'short_circuited': self.short_circuited,
+            'cached': self.cached,
+            'http_cache': self.http_cache,
+            'connections': self.connections,
+            'stages': {stage: timer.to_dict() for stage, timer in self.stages.items()}
+        }
+
+
+class AsyncCrawlEngine:
+    """异步并发爬取流水线
+
+    1. 抓取：网络请求在事件循环中并发执行，受全局并发数、单主机并发数和按域名的令牌桶限速约束，
+       只做结构化数据这类轻量提取；
+    2. 解析：其余页面的字节交给解析进程池，运行 RealProductCrawler 的各平台提取方法；
+    3. 写库：所有结果交给唯一的写库协程按顺序处理，回调在线程池中执行，
+       写入阻塞（如 BatchWriter 队列已满）时只暂停写库，不阻塞事件循环中的抓取。
+    阶段之间用有界队列衔接，每个阶段的耗时记录在 CrawlStats.stages 中。
+    """
+
+    def __init__(self, crawler=None, concurrency=None, per_host_concurrency=None,
+                 parse_workers=None, parse_queue_size=None, write_queue_size=None):
+        self.crawler = crawler or RealProductCrawler()
+        self.config = Config()
+        self.concurrency = concurrency or self.config.CRAWL_CONCURRENCY
+        self.per_host_concurrency = per_host_concurrency or self.config.CRAWL_PER_HOST_CONCURRENCY
+        self.parse_workers = self.config.PARSE_WORKERS if parse_workers is None else parse_workers
+        self.parse_queue_size = parse_queue_size or self.config.PARSE_QUEUE_SIZE
+        self.write_queue_size = write_queue_size or self.config.WRITE_QUEUE_SIZE
+        self.parse_pool = None
+        self.parse_slots = None
+        self.last_stats = None
+        # 各轮使用同一个事件循环，shared_pool 中绑定该循环的连接和DNS缓存跨轮保留
+        self.loop = None
+
+    def run(self, products, on_result):
+        """同步入口：爬取一批商品
+
+        products 为 (product_id, url, ...) 元组列表，
+        每个结果以 on_result(product, product_info) 的形式回调：在线程池中逐个调用，前一个返回后才调用下一个。
+        """
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(self.crawl(products, on_result))
+
+    async def crawl(self, products, on_result):
+        """并发爬取一批商品"""
+        stats = CrawlStats(total=len(products))
+        self.crawler.http_cache.reset_stats()
+        global_slots = asyncio.Semaphore(self.concurrency)
+        host_slots = {}
+        results = asyncio.Queue(maxsize=self.write_queue_size)
+        self.parse_slots = asyncio.Semaphore(self.parse_queue_size)
+        if self.parse_workers > 0 and self.parse_pool is None:
+            # 第一轮（或进程池损坏后）创建，之后各轮复用
+            self.parse_pool = create_parse_pool(self.parse_workers)
+
+        session = shared_pool.async_session(self.concurrency, self.per_host_concurrency)
+        writer = asyncio.create_task(self._write_results(results, on_result, stats))
+        await asyncio.gather(*(
+            self._crawl_one(session, product, global_slots, host_slots, results, stats)
+            for product in products
+        ))
+        await results.put(None)
+        await writer
+
+        stats.finish()
+        stats.http_cache = self.crawler.http_cache.stats()
+        stats.connections = shared_pool.stats.to_dict()
+        self.last_stats = stats
+        print(f"📈 本轮爬取 {stats.total} 个商品，耗时 {stats.wall_time:.2f} 秒，"
+              f"{stats.products_per_second:.2f} 个/秒")
+        print(f"♻️ 条件请求缓存: 命中 {stats.http_cache['hits']} 次，内容未变化 {stats.http_cache['digest_hits']} 次，"
+              f"节省 {stats.http_cache['bytes_saved']} 字节 / 解析 {stats.http_cache['parse_time_saved']} 秒")
+        print(f"🔌 连接池（累计）: 新建 {stats.connections['new_connections']} 个，"
+              f"复用 {stats.connections['reused_connections']} 次，握手共 {stats.connections['connect_time']} 秒")
+        print("⏱️ 各阶段耗时: " + ", ".join(
+            f"{stage} {timer.total:.2f}s/{timer.count}" for stage, timer in stats.stages.items()))
+        return stats
+
+    def close(self):
+        """关闭解析进程池、事件循环及其 aiohttp 会话"""
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+        if self.loop:
+            self.loop.run_until_complete(shared_pool.close_async_session())
+            self.loop.close()
+            self.loop = None
+
+    async def _crawl_one(self, session, product, global_slots, host_slots, results, stats):
+        """爬取单个商品，结果放入写库队列"""
+        url = product[1]
+        host = urlparse(url).netloc.lower()
+        host_slot = host_slots.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+
+        async def fetch(url):
+            async with host_slot:
+                return await self._fetch(session, url, global_slots, stats)
+
+        # 与手动检查、添加商品共用合并层，同一URL正在抓取或刚抓取过时直接取结果
+        product_info = await self.crawler.coalescer.fetch_async(url, fetch)
+        # 写库队列满时在这里等待，形成背压
+        await results.put((product, product_info, time.perf_counter()))
+
+    async def _fetch(self, session, url, global_slots, stats):
+        """下载商品页面，需要完整解析时交给解析进程池"""
+        try:
+            reader, product_info, response_headers = await self.crawler.retry_policy.run_async(
+                url, lambda remaining: self._fetch_once(session, url, global_slots, stats, remaining),
+                self.crawler.breakers)
+        except CircuitOpenError as e:
+            print(f"⛔ {e}")
+            stats.short_circuited += 1
+            return {'success': False, 'circuit_open': True, 'error': str(e)}
+        except Exception as e:
+            print(f"❌ 爬取失败: {e}")
+            return None
+        if reader is None:
+            return product_info
+
+        stats.bytes_read += reader.bytes_read
+        if reader.stopped_early:
+            stats.early_stops += 1
+        parse_time = reader.parse_time
+        if product_info is None:
+            product_info, pool_parse_time = await self._parse(reader, stats)
+            parse_time += pool_parse_time
+        else:
+            stats.record_stage('parse', reader.parse_time)
+        self.crawler.http_cache.store(url, response_headers, product_info,
+                                      reader.bytes_read, parse_time, reader.digests)
+        return product_info
+
+    async def _fetch_once(self, session, url, global_slots, stats, remaining):
+        """发出一次请求，返回 (reader, 商品信息, 响应头)；304 时 reader 为 None
+
+        可重试的失败抛出 RetryableError，退避由 retry_policy 负责，只挂起当前任务。
+        """
+        deadline = time.monotonic() + remaining
+        # 只在该主机的令牌用完时等待，不占用全局槽位
+        await self.crawler.rate_limiter.acquire_async(url)
+        try:
+            async with global_slots:
+                print(f"🔍 爬取商品信息: {url}")
+                started = time.perf_counter()
+                headers = self._build_headers()
+                headers.update(self.crawler.http_cache.conditional_headers(url))
+                timeout = aiohttp.ClientTimeout(
+                    total=min(self.config.REQUEST_TIMEOUT, max(deadline - time.monotonic(), 0.1)))
+                async with session.get(url, headers=headers, timeout=timeout) as response:
+                    if response.status == 304:
+                        print(f"♻️ 页面未变化: {url}")
+                        stats.record_stage('fetch', time.perf_counter() - started)
+                        return None, self.crawler.http_cache.record_hit(url), None
+                    self.crawler.check_retryable_status(url, response.status, response.headers)
+                    reader = StreamingPageReader(self.crawler, url, parse_dom=self.parse_pool is None,
+                                                 headers=response.headers)
+                    product_info = await self._read_stream(reader, response)
+                    response_headers = response.headers
+                stats.record_stage('fetch', time.perf_counter() - started - reader.parse_time)
+                return reader, product_info, response_headers
+        except asyncio.TimeoutError:
+            print(f"⏰ 请求超时: {url}")
+            raise RetryableError('请求超时')
+        except aiohttp.ClientError as e:
+            raise RetryableError(f'请求异常: {e}')
+
+    async def _parse(self, reader, stats):
+        """把页面字节交给解析进程池，返回 (商品信息, 解析耗时)"""
+        queued = time.perf_counter()
+        try:
+            # 等待解析的页面过多时暂停抓取，避免积压的页面占满内存
+            async with self.parse_slots:
+                loop = asyncio.get_running_loop()
+                product_info, parse_time, selector_records = await loop.run_in_executor(
+                    self.parse_pool, parse_page, reader.body, reader.url)
+        except BrokenProcessPool as e:
+            # 工作进程异常退出：本轮之后的页面在事件循环中解析，下一轮重新创建进程池
+            print(f"❌ 解析进程池已损坏: {e}")
+            if self.parse_pool:
+                self.parse_pool.shutdown(wait=False)
+                self.parse_pool = None
+            return None, 0.0
+        except Exception as e:
+            print(f"❌ 解析失败: {reader.url} {e}")
+            return None, 0.0
+        self.crawler.selector_stats.merge(selector_records)
+        stats.record_stage('parse', parse_time)
+        stats.record_stage('parse_wait', time.perf_counter() - queued - parse_time)
+        return product_info, parse_time
+
+    async def _read_stream(self, reader, response):
+        """边下载边提取，提前结束时关闭连接，不再读取剩余内容
+
+        使用解析进程池时只读取字节，读完后检查内容摘要和结构化数据，都没有结果时返回 None，
+        由解析阶段处理。
+        """
+        async for chunk in response.content.iter_chunked(self.config.STREAM_CHUNK_SIZE):
+            product_info = reader.feed(chunk)
+            if product_info:
+                response.close()
+                return product_info
+            if reader.exhausted:
+                print(f"✂️ 达到字节预算 {reader.budget}，停止读取: {reader.url}")
+                response.close()
+                break
+        return reader.finish() if reader.parse_dom else reader.finish_structured()
+
+    def _build_headers(self):
+        """每个请求随机选择User-Agent"""
+        headers = dict(self.crawler.session.headers)
+        headers['User-Agent'] = random.choice(self.config.USER_AGENTS)
+        # aiohttp 默认不带 brotli 解码
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        return headers
+
+    async def _write_results(self, results, on_result, stats):
+        """唯一的写库协程"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await results.get()
+            if item is None:
+                break
+
+            product, product_info, queued = item
+            started = time.perf_counter()
+            stats.record_stage('write_wait', started - queued)
+            if product_info and product_info.get('cached'):
+                # 合并层直接给出的结果，本轮没有为它发出请求
+                stats.cached += 1
+            if product_info and product_info.get('success'):
+                stats.succeeded += 1
+            else:
+                stats.failed += 1
+
+            try:
+                await loop.run_in_executor(None, on_result, product, product_info)
+            except Exception as e:
+                print(f"  ❌ 保存商品 {product[0]} 失败: {e}")
+            stats.record_stage('write', time.perf_counter() - started)
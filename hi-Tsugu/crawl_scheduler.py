@@ -0,0 +1,231 @@
+"""自适应爬取调度
+
+每个商品有一个下次检查时间，放在最小堆中；每轮只取出已到期的商品，数量受请求预算限制。
+检查间隔由价格历史中观察到的变化频率决定：
+
+    平均变化间隔 = (观察时长 + 先验时长) / (变化次数 + 1)
+    检查间隔 = 平均变化间隔 × SCHEDULE_CHANGE_FACTOR，限制在 [最小间隔, 最大间隔]
+
+没有历史的商品使用 SCHEDULE_DEFAULT_INTERVAL；当前价格接近有效提醒的目标价时，
+间隔再乘以 SCHEDULE_ALERT_BOOST。调度器统计每次请求发现的价格变化数，用来衡量预算的利用率。
+"""
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+from config import Config
+
+
+def parse_timestamp(value):
+    """SQLite 时间戳转为 Unix 时间；不带时区的按 UTC（CURRENT_TIMESTAMP）处理"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    moment = datetime.fromisoformat(str(value))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def summarize_history(rows):
+    """按商品统计价格历史
+
+    rows 为按时间排序的 (product_id, price, timestamp)，
+    返回 {product_id: (变化次数, 最早记录时间, 最近记录时间)}。
+    """
+    summaries = {}
+    last_prices = {}
+    for product_id, price, timestamp in rows:
+        seen = parse_timestamp(timestamp)
+        changes, first_seen, _ = summaries.get(product_id, (0, seen, seen))
+        if product_id in last_prices and price != last_prices[product_id]:
+            changes += 1
+        last_prices[product_id] = price
+        summaries[product_id] = (changes, first_seen, seen)
+    return summaries
+
+
+class ScheduleEntry:
+    """单个商品的调度状态"""
+
+    __slots__ = ('product_id', 'changes', 'first_seen', 'price', 'target', 'interval', 'due', 'version')
+
+    def __init__(self, product_id, changes, first_seen):
+        self.product_id = product_id
+        self.changes = changes
+        self.first_seen = first_seen
+        self.price = None
+        self.target = None
+        self.interval = None
+        self.due = None
+        self.version = 0
+
+
+class AdaptiveScheduler:
+    """按价格波动程度安排检查时间的调度器"""
+
+    def __init__(self, min_interval=None, max_interval=None, default_interval=None,
+                 change_factor=None, history_days=None):
+        self.min_interval = min_interval or Config.SCHEDULE_MIN_INTERVAL
+        self.max_interval = max_interval or Config.SCHEDULE_MAX_INTERVAL
+        self.default_interval = default_interval or Config.SCHEDULE_DEFAULT_INTERVAL
+        self.change_factor = change_factor or Config.SCHEDULE_CHANGE_FACTOR
+        self.history_window = (history_days or Config.SCHEDULE_HISTORY_DAYS) * 24 * 3600
+        self.entries = {}
+        self.heap = []
+        self.sequence = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.changes = 0
+        # 尚未用掉的请求额度（不足一个请求的部分）
+        self.credit = 0.0
+
+    def interval_for(self, entry, now):
+        """根据变化频率和提醒目标计算检查间隔（秒）"""
+        span = max(now - entry.first_seen, 0)
+        prior = self.default_interval / self.change_factor
+        interval = (span + prior) / (entry.changes + 1) * self.change_factor
+        if self.near_target(entry):
+            interval *= Config.SCHEDULE_ALERT_BOOST
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    @staticmethod
+    def near_target(entry):
+        """当前价格是否已接近（但尚未达到）提醒目标价"""
+        if not entry.price or not entry.target:
+            return False
+        return entry.target < entry.price <= entry.target * (1 + Config.SCHEDULE_ALERT_PROXIMITY)
+
+    def _push(self, entry, due):
+        # 堆中的旧记录靠版本号作废，不做原地删除；版本号全局递增，删除后重新加入的商品不会匹配旧记录
+        entry.version = next(self.sequence)
+        entry.due = due
+        heapq.heappush(self.heap, (due, entry.product_id, entry.version))
+
+    def add(self, product_id, summary=None, price=None, target=None, now=None):
+        """加入一个商品；summary 为 summarize_history 的结果"""
+        now = time.time() if now is None else now
+        changes, first_seen, last_seen = summary or (0, now, None)
+        entry = ScheduleEntry(product_id, changes, first_seen)
+        entry.price = price
+        entry.target = target
+        entry.interval = self.interval_for(entry, now)
+        with self.lock:
+            self.entries[product_id] = entry
+            # 从最近一次记录起算，没有记录的商品立即到期
+            self._push(entry, last_seen + entry.interval if last_seen is not None else now)
+
+    def remove(self, product_id):
+        with self.lock:
+            self.entries.pop(product_id, None)
+
+    def sync(self, prices, targets, load_history, now=None):
+        """与数据库同步
+
+        prices 为 {product_id: 当前价格}，只包含需要检查的商品；targets 为 {product_id: 目标价}；
+        load_history(product_ids) 返回新商品的价格历史行。返回新加入的商品数。
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            for product_id in [product_id for product_id in self.entries if product_id not in prices]:
+                del self.entries[product_id]
+            new_ids = [product_id for product_id in prices if product_id not in self.entries]
+
+        summaries = summarize_history(load_history(new_ids)) if new_ids else {}
+        for product_id in new_ids:
+            self.add(product_id, summaries.get(product_id), prices[product_id], targets.get(product_id), now)
+
+        with self.lock:
+            for product_id, price in prices.items():
+                entry = self.entries.get(product_id)
+                if entry is None or (entry.price == price and entry.target == targets.get(product_id)):
+                    continue
+                entry.price = price
+                entry.target = targets.get(product_id)
+                # 新设置的提醒可能让商品提前到期
+                interval = self.interval_for(entry, now)
+                if now + interval < entry.due:
+                    entry.interval = interval
+                    self._push(entry, now + interval)
+        return len(new_ids)
+
+    def pop_due(self, budget, now=None):
+        """取出最多 budget 个已到期的商品ID，按到期时间先后排列
+
+        取出的商品先按原间隔重新排期，检查完成后由 record_check 修正。
+        """
+        now = time.time() if now is None else now
+        due_ids = []
+        with self.lock:
+            while self.heap and len(due_ids) < budget and self.heap[0][0] <= now:
+                _, product_id, version = heapq.heappop(self.heap)
+                entry = self.entries.get(product_id)
+                if entry is None or entry.version != version:
+                    continue
+                due_ids.append(product_id)
+                self._push(entry, now + entry.interval)
+        return due_ids
+
+    def pop_budgeted(self, allowance, now=None):
+        """按请求预算取出到期商品
+
+        allowance 为本轮新增的请求额度（可以是小数），不足一个请求的部分累计到以后各轮；
+        到期商品不足时剩余的整数额度作废，空闲之后不会集中发出请求，任意时段的请求数不超过预算。
+        """
+        self.credit += allowance
+        due_ids = self.pop_due(int(self.credit), now)
+        self.credit -= len(due_ids)
+        self.credit -= int(self.credit)
+        return due_ids
+
+    def record_check(self, product_id, changed, price=None, requested=True, now=None):
+        """记录一次检查结果并重新计算下次检查时间"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if requested:
+                self.requests += 1
+                if changed:
+                    self.changes += 1
+            entry = self.entries.get(product_id)
+            if entry is None:
+                return
+            if changed:
+                entry.changes += 1
+            if price is not None:
+                entry.price = price
+            # 只保留最近 history_window 内的变化频率
+            span = now - entry.first_seen
+            if span > self.history_window:
+                entry.changes *= self.history_window / span
+                entry.first_seen = now - self.history_window
+            entry.interval = self.interval_for(entry, now)
+            self._push(entry, now + entry.interval)
+
+    def next_due(self):
+        """最早的到期时间，没有商品时返回 None"""
+        with self.lock:
+            while self.heap:
+                _, product_id, version = self.heap[0]
+                entry = self.entries.get(product_id)
+                if entry is not None and entry.version == version:
+                    return entry.due
+                heapq.heappop(self.heap)
+        return None
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            intervals = [entry.interval for entry in self.entries.values()]
+            due = sum(1 for entry in self.entries.values() if entry.due <= now)
+            requests, changes = self.requests, self.changes
+        return {
+            'scheduled': len(intervals),
+            'due': due,
+            'requests': requests,
+            'changes': changes,
+            'changes_per_request': round(changes / requests, 3) if requests else 0.0,
+            'min_interval': round(min(intervals)) if intervals else None,
+            'avg_interval': round(sum(intervals) / len(intervals)) if intervals else None,
+            'max_interval': round(max(intervals)) if intervals else None
+        }
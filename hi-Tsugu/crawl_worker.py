@@ -0,0 +1,131 @@
+"""独立的爬取工作进程
+
+从 crawl_jobs 任务表领取商品，用异步引擎抓取，结果在确认租约后写回数据库。
+可以同时启动多个进程（也可以在共享数据库文件的多台机器上），吞吐量随进程数增加；
+每个进程按 RATE_LIMITS 单独限速，总请求量由Web进程的调度预算控制。
+
+Web进程需设置 CRAWL_MODE=queue，只负责按调度写入任务；每个任务的检查结果（是否变价、价格）
+随任务完成写入任务表，由Web进程收取后交给调度器。
+
+用法: python crawl_worker.py [--worker-id ID] [--batch N] [--once]
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+
+from config import Config
+from crawl_engine import AsyncCrawlEngine
+from job_queue import JobQueue
+from price_updates import save_price_update
+from real_crawler import RealProductCrawler
+
+
+class CrawlWorker:
+    """领取任务、抓取并回报结果"""
+
+    def __init__(self, worker_id=None, db_path='products.db', batch_size=None, crawler=None, queue=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.db_path = db_path
+        self.batch_size = batch_size or Config.WORKER_BATCH_SIZE
+        self.queue = queue or JobQueue(db_path)
+        # 每个工作进程本身就是一个并行单位，在事件循环中直接解析
+        self.engine = AsyncCrawlEngine(crawler or RealProductCrawler(), parse_workers=0)
+        self.current_jobs = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.processed = 0
+        self.lost_leases = 0
+
+    def start_heartbeat(self):
+        """后台续租当前持有的任务"""
+        def run():
+            interval = self.queue.lease_seconds / 3
+            while not self.stopped.wait(interval):
+                with self.lock:
+                    job_ids = list(self.current_jobs)
+                renewed = self.queue.heartbeat(self.worker_id, job_ids)
+                if renewed < len(job_ids):
+                    print(f"⚠️ [{self.worker_id}] {len(job_ids) - renewed} 个任务的租约已被收回")
+
+        thread = threading.Thread(target=run, name='crawl-worker-heartbeat', daemon=True)
+        thread.start()
+        return thread
+
+    def run_batch(self):
+        """领取并处理一批任务，返回处理的任务数"""
+        jobs = self.queue.claim(self.worker_id, self.batch_size)
+        if not jobs:
+            return 0
+        jobs_by_product = {job.product_id: job for job in jobs}
+        with self.lock:
+            self.current_jobs = {job.id: job for job in jobs}
+
+        with self.queue.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, url, current_price, lowest_price, highest_price
+                FROM products
+                WHERE id IN ({', '.join('?' * len(jobs_by_product))})
+            ''', list(jobs_by_product)).fetchall()
+
+        # 商品已被删除的任务直接完成
+        for product_id in set(jobs_by_product) - {row[0] for row in rows}:
+            self.queue.complete(self.worker_id, jobs_by_product[product_id].id, error='商品不存在')
+
+        self.engine.run(rows, lambda product, product_info: self.report(jobs_by_product[product[0]], product, product_info))
+        with self.lock:
+            self.current_jobs = {}
+        self.processed += len(jobs)
+        return len(jobs)
+
+    def report(self, job, product, product_info):
+        """回报单个任务的结果"""
+        if product_info and product_info.get('circuit_open'):
+            # 请求没有发出，熔断恢复后再由其他进程领取
+            self.queue.release(self.worker_id, job.id, Config.BREAKER_RESET_TIMEOUT, product_info.get('error'))
+            return
+
+        current_price = product[2]
+        price = product_info.get('price') if product_info else None
+        changed = bool(product_info and product_info.get('success') and not product_info.get('not_modified')
+                       and not product_info.get('cached') and current_price > 0 and price != current_price)
+        error = None if product_info and (product_info.get('success') or product_info.get('not_modified')) else '抓取失败'
+        if not self.queue.complete(self.worker_id, job.id, changed, price, error,
+                                   write=lambda conn: save_price_update(conn.cursor(), product, product_info)):
+            self.lost_leases += 1
+            print(f"⚠️ [{self.worker_id}] 商品 {product[0]} 的租约已被收回，结果不写入")
+
+    def run(self, once=False):
+        """循环领取任务；once 为 True 时队列为空即退出"""
+        print(f"👷 爬取工作进程 {self.worker_id} 启动，每次领取 {self.batch_size} 个任务")
+        self.start_heartbeat()
+        try:
+            while True:
+                try:
+                    processed = self.run_batch()
+                except Exception as e:
+                    print(f"❌ [{self.worker_id}] 处理任务失败: {e}")
+                    processed = 0
+                if processed:
+                    continue
+                if once:
+                    break
+                time.sleep(Config.WORKER_POLL_INTERVAL)
+        finally:
+            self.stopped.set()
+            self.engine.close()
+        print(f"👷 工作进程 {self.worker_id} 退出，共处理 {self.processed} 个任务")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='价格爬取工作进程')
+    parser.add_argument('--worker-id', help='工作进程标识，默认为 主机名-进程号')
+    parser.add_argument('--batch', type=int, help='每次领取的任务数')
+    parser.add_argument('--once', action='store_true', help='任务队列为空时退出')
+    args = parser.parse_args()
+    CrawlWorker(args.worker_id, batch_size=args.batch).run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""lxml 快速提取
+
+直接用 lxml 解析原始字节，选择器在模块加载时从 Config.SITE_CONFIGS 一次性编译为 XPath。
+找不到完整的商品信息时返回 None，由调用方回退到 BeautifulSoup 解析。
+"""
+import re
+
+from cssselect import HTMLTranslator, SelectorError
+from lxml import etree
+from lxml import html as lxml_html
+
+from config import Config
+
+# 与 RealProductCrawler.fetch_product_info 一致，按 UTF-8 解码
+HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+META_CONTENT = etree.XPath('//meta[@property=$prop]/@content')
+# 页面可见文本（不含脚本和样式）
+VISIBLE_TEXT = etree.XPath('//body//text()[not(ancestor::script) and not(ancestor::style)]')
+
+TEXT_PRICE_PATTERNS = {
+    'pdd': [re.compile(p) for p in (r'¥\s*(\d+\.?\d*)', r'￥\s*(\d+\.?\d*)', r'拼单价\s*[:：]\s*(\d+\.?\d*)')],
+    'other': [re.compile(r'¥\s*(\d+\.?\d*)')]
+}
+
+
+def compile_selectors(selectors):
+    """把CSS选择器列表编译为XPath，无法编译的选择器直接跳过"""
+    translator = HTMLTranslator()
+    compiled = []
+    for selector in selectors:
+        try:
+            compiled.append((selector, etree.XPath(translator.css_to_xpath(selector))))
+        except (SelectorError, etree.XPathSyntaxError):
+            continue
+    return compiled
+
+
+def build_selector_plans(site_configs):
+    """为每个平台编译 名称/价格/图片 选择器"""
+    return {
+        platform: {
+            field: compile_selectors(site_config.get(f'{field}_selectors', []))
+            for field in ('name', 'price', 'image')
+        }
+        for platform, site_config in site_configs.items()
+    }
+
+
+SELECTOR_PLANS = build_selector_plans(Config.SITE_CONFIGS)
+
+
+def complete_matches(xpath, doc, open_elements):
+    """执行XPath，跳过尚未解析完的元素"""
+    if not open_elements:
+        return xpath(doc)
+    return [element for element in xpath(doc) if element not in open_elements]
+
+
+class PlanRun:
+    """一次提取使用的选择器计划，记录命中的选择器"""
+
+    def __init__(self, config_key, field, plan):
+        self.config_key = config_key
+        self.field = field
+        self.plan = plan
+        self.tried = 0
+        self.selector = None
+
+    def __iter__(self):
+        for item in self.plan:
+            self.tried += 1
+            yield item
+
+    def hit(self, selector):
+        self.selector = selector
+
+
+class FastExtractor:
+    """基于预编译选择器的 lxml 提取器"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    def extract(self, body, url):
+        """从页面字节中提取商品信息，信息不完整时返回 None"""
+        try:
+            doc = lxml_html.document_fromstring(body, parser=HTML_PARSER)
+        except (etree.ParserError, ValueError):
+            return None
+        return self.extract_from_doc(doc, url)
+
+    def extract_from_doc(self, doc, url, open_elements=None):
+        """从已解析的文档树中提取商品信息
+
+        open_elements 用于流式解析：这些元素还没有解析完，其文本可能不完整，提取时跳过。
+        """
+        platform = self.crawler.detect_platform(url)
+        config_key = 'taobao' if platform == 'tmall' else platform
+        if config_key not in SELECTOR_PLANS:
+            config_key = 'other'
+        open_elements = open_elements or set()
+        # 选择器命中情况在文档完整或提取成功时才记录，流式解析的中间结果不计入
+        records = []
+
+        title = self.extract_title(doc, platform, self.plan(config_key, 'name', records), open_elements)
+        price = self.extract_price(doc, platform, self.plan(config_key, 'price', records), open_elements)
+        if not title or not price:
+            if not open_elements:
+                self.record(records)
+            return None
+
+        product_info = {
+            'name': title,
+            'price': price,
+            'image_url': self.extract_image(doc, url, config_key, self.plan(config_key, 'image', records),
+                                            open_elements),
+            'platform': platform,
+            'success': True
+        }
+        self.record(records)
+        return product_info
+
+    def plan(self, config_key, field, records):
+        """按命中统计排序的选择器计划，加入 records 以便提取结束后记录"""
+        plan = self.crawler.selector_stats.order(config_key, field, SELECTOR_PLANS[config_key][field],
+                                                 key=lambda item: item[0])
+        run = PlanRun(config_key, field, plan)
+        records.append(run)
+        return run
+
+    def record(self, records):
+        for run in records:
+            self.crawler.selector_stats.record(run.config_key, run.field,
+                                               [selector for selector, _ in run.plan[:run.tried]], run.selector)
+
+    def extract_title(self, doc, platform, plan, open_elements):
+        """提取并清理标题"""
+        for selector, xpath in plan:
+            for element in complete_matches(xpath, doc, open_elements):
+                title = element.text_content().strip()
+                if title:
+                    plan.hit(selector)
+                    return self.crawler.clean_title(title, platform)
+        return None
+
+    def extract_price(self, doc, platform, plan, open_elements):
+        """提取价格"""
+        meta_property = {'taobao': 'og:product:price', 'tmall': 'og:product:price',
+                         'other': 'product:price'}.get(platform)
+        if meta_property:
+            for content in META_CONTENT(doc, prop=meta_property):
+                try:
+                    return float(content)
+                except ValueError:
+                    pass
+
+        for selector, xpath in plan:
+            for element in complete_matches(xpath, doc, open_elements):
+                price = self.crawler.parse_price(element.text_content().strip())
+                if price > 0:
+                    plan.hit(selector)
+                    return price
+
+        patterns = TEXT_PRICE_PATTERNS.get(platform)
+        if patterns:
+            texts = VISIBLE_TEXT(doc)
+            if open_elements:
+                texts = [t for t in texts if not t.is_tail and t.getparent() not in open_elements]
+            text = ''.join(texts)
+            for pattern in patterns:
+                match = pattern.search(text)
+                if match:
+                    return float(match.group(1))
+        return 0.0
+
+    def extract_image(self, doc, url, config_key, plan, open_elements):
+        """提取图片，选择器都未命中时使用 og:image"""
+        attrs = Config.SITE_CONFIGS.get(config_key, Config.SITE_CONFIGS['other'])['image_attrs']
+        for selector, xpath in plan:
+            for element in complete_matches(xpath, doc, open_elements):
+                img_src = self.crawler.get_image_src(element, attrs)
+                if img_src:
+                    full_url = self.crawler.process_image_url(img_src, url)
+                    if self.crawler.validate_image_url(full_url):
+                        plan.hit(selector)
+                        return full_url
+
+        if config_key in ('taobao', 'other'):
+            for content in META_CONTENT(doc, prop='og:image'):
+                return self.crawler.process_image_url(content, url)
+        return ''
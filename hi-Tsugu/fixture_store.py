@@ -0,0 +1,136 @@
+"""HTTP 响应录制存储
+
+把真实网站的响应（状态码、关键响应头、正文）保存到 fixtures 目录，供模拟商城回放，
+基准测试因此可以离线、可重复地运行：
+- responses/<key>.json 保存URL、平台、状态码和响应头，<key>.body 保存原始正文；
+- key 由规范化后的URL计算，同一商品的不同追踪参数只录制一份；
+- 商品页面记录其中主图的URL，回放时改写为本地地址，图片也从录制中返回；
+- pages/<平台>.html 是手工保存的页面，没有录制时作为该平台的回放页面。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from fetch_coalescer import normalize_url
+
+Fixture = namedtuple('Fixture', 'key url platform status headers body images')
+
+# 回放时需要保留的响应头
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Retry-After')
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture_key(url):
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()[:16]
+
+
+class FixtureStore:
+    """按URL保存和读取录制的响应"""
+
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_ROOT
+        self.response_dir = os.path.join(self.root, 'responses')
+        self.page_dir = os.path.join(self.root, 'pages')
+        self.lock = threading.Lock()
+        self._pages = None
+        os.makedirs(self.response_dir, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.response_dir, key + suffix)
+
+    def save(self, url, status, headers, body, platform='other', images=None):
+        """保存一个响应，返回 key"""
+        key = fixture_key(url)
+        meta = {
+            'url': url,
+            'platform': platform,
+            'status': status,
+            'headers': {name: headers[name] for name in RECORDED_HEADERS if headers.get(name)},
+            'images': images or {},
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        # 先写正文再写元数据，元数据存在即表示录制完整
+        with open(self._path(key, '.body'), 'wb') as f:
+            f.write(body)
+        with open(self._path(key, '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        with self.lock:
+            self._pages = None
+        return key
+
+    def load_key(self, key):
+        """按 key 读取录制，不存在时返回 None"""
+        try:
+            with open(self._path(key, '.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self._path(key, '.body'), 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return Fixture(key, meta['url'], meta.get('platform', 'other'), meta['status'],
+                       meta.get('headers', {}), body, meta.get('images', {}))
+
+    def load(self, url):
+        return self.load_key(fixture_key(url))
+
+    def __contains__(self, url):
+        return os.path.exists(self._path(fixture_key(url), '.json'))
+
+    def pages(self, platform):
+        """该平台可回放的商品页面：录制的成功页面，没有时使用 pages/<平台>.html"""
+        with self.lock:
+            if self._pages is None:
+                self._pages = self._scan_pages()
+            return self._pages.get(platform, [])
+
+    def _scan_pages(self):
+        pages = {}
+        for filename in sorted(os.listdir(self.response_dir)):
+            if not filename.endswith('.json'):
+                continue
+            fixture = self.load_key(filename[:-len('.json')])
+            if (fixture and fixture.status == 200
+                    and fixture.headers.get('Content-Type', '').startswith('text/html')):
+                pages.setdefault(fixture.platform, []).append(fixture)
+
+        if os.path.isdir(self.page_dir):
+            for filename in sorted(os.listdir(self.page_dir)):
+                platform, ext = os.path.splitext(filename)
+                if ext != '.html' or platform in pages:
+                    continue
+                with open(os.path.join(self.page_dir, filename), 'rb') as f:
+                    body = f.read()
+                pages[platform] = [Fixture(f'page-{platform}', None, platform, 200,
+                                           {'Content-Type': 'text/html; charset=utf-8'}, body, {})]
+        return pages
+
+    def record(self, url, crawler):
+        """用爬虫的会话抓取并保存商品页面和主图，返回页面的 Fixture"""
+        from config import Config
+
+        platform = crawler.detect_platform(url)
+        response = crawler.session.get(url, timeout=Config.REQUEST_TIMEOUT)
+        body = response.content
+
+        images = {}
+        if response.status_code == 200:
+            product_info = crawler.parse_product_content(body, url)
+            image_url = product_info.get('image_url') if product_info else None
+            if image_url:
+                image = crawler.session.get(image_url, timeout=Config.IMAGE_TIMEOUT)
+                if image.status_code == 200 and len(image.content) <= Config.MAX_IMAGE_SIZE:
+                    images[image_url] = self.save(image_url, image.status_code, image.headers,
+                                                  image.content, platform)
+
+        key = self.save(url, response.status_code, response.headers, body, platform, images)
+        return self.load_key(key)
+
+    def stats(self):
+        with self.lock:
+            if self._pages is None:
+                self._pages = self._scan_pages()
+            return {platform: len(fixtures) for platform, fixtures in self._pages.items()}
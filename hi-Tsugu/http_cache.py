@@ -0,0 +1,199 @@
+import hashlib
+import json
+import re
+import threading
+
+from config import Config
+from db_pool import ConnectionPool
+
+STRIP_PATTERNS = [re.compile(pattern.encode()) for pattern in Config.CONTENT_DIGEST_STRIP_PATTERNS]
+
+
+def normalized_digest(body):
+    """去掉随机数、时间戳等易变内容和全部空白后计算页面摘要"""
+    for pattern in STRIP_PATTERNS:
+        body = pattern.sub(b'', body)
+    return hashlib.sha256(b''.join(body.split())).hexdigest()
+
+
+class ValidatorCache:
+    """条件请求缓存
+
+    按URL保存响应的 ETag / Last-Modified 以及上次解析出的商品信息，
+    下次请求时带上 If-None-Match / If-Modified-Since。
+    服务器返回304时直接复用上次的解析结果，不再下载和解析页面。
+    不支持条件请求的页面按内容摘要判断：下载后的内容与上次相同时同样复用上次的解析结果，
+    先比较原始字节的摘要，不同时再比较去掉易变内容后的摘要。
+    缓存单独存放在一个SQLite文件中，避免与商品库的写事务互相等待；db_path 为 None 时只保存在内存中。
+    """
+
+    def __init__(self, db_path='http_cache.db'):
+        self.db_path = db_path
+        self.pool = None
+        if db_path:
+            self.pool = ConnectionPool(db_path, Config.DB_POOL_IDLE, Config.DB_BUSY_TIMEOUT,
+                                       Config.DB_SYNCHRONOUS, Config.DB_MMAP_SIZE)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.reset_stats()
+        if self.pool:
+            self._init_table()
+
+    def _init_table(self):
+        """创建缓存表并加载已有记录"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    result TEXT NOT NULL,
+                    body_size INTEGER DEFAULT 0,
+                    parse_time REAL DEFAULT 0,
+                    raw_digest TEXT,
+                    digest TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # 旧版本的缓存表没有摘要列
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(http_validators)')}
+            for column in ('raw_digest', 'digest'):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE http_validators ADD COLUMN {column} TEXT')
+            conn.commit()
+            for url, etag, last_modified, result, body_size, parse_time, raw_digest, digest in conn.execute(
+                    '''SELECT url, etag, last_modified, result, body_size, parse_time, raw_digest, digest
+                       FROM http_validators'''):
+                self.entries[url] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'result': json.loads(result),
+                    'body_size': body_size,
+                    'parse_time': parse_time,
+                    'raw_digest': raw_digest,
+                    'digest': digest
+                }
+
+    def reset_stats(self):
+        """重置命中统计（每轮爬取开始时调用）"""
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.digest_hits = 0
+            self.bytes_saved = 0
+            self.parse_time_saved = 0.0
+
+    def stats(self):
+        """命中统计"""
+        with self.lock:
+            total = self.hits + self.digest_hits + self.misses
+            return {
+                'hits': self.hits,
+                'digest_hits': self.digest_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'parse_time_saved': round(self.parse_time_saved, 3)
+            }
+
+    def conditional_headers(self, url):
+        """生成条件请求头"""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_hit(self, url):
+        """服务器返回304，返回上次的解析结果"""
+        entry = self.entries.get(url)
+        if not entry:
+            return None
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += entry['body_size']
+            self.parse_time_saved += entry['parse_time']
+        result = dict(entry['result'])
+        result['not_modified'] = True
+        return result
+
+    def needs_digest(self, url, headers):
+        """是否需要按内容摘要判断页面变化
+
+        服务器不返回 ETag / Last-Modified，或者带着上次的校验信息请求仍返回了完整页面
+        （校验信息每次都变，或者页面确实变了）时才计算摘要，条件请求有效的页面不必多读和多算。
+        """
+        if not Config.CONTENT_DIGEST_ENABLED:
+            return False
+        return not (headers.get('ETag') or headers.get('Last-Modified')) or url in self.entries
+
+    def has_digest(self, url):
+        entry = self.entries.get(url)
+        return bool(entry and entry['digest'])
+
+    def match_digest(self, url, body):
+        """按内容摘要判断页面是否变化，返回 (上次的解析结果或 None, 本次的摘要)
+
+        摘要为 (原始字节摘要, 去掉易变内容后的摘要)，页面变化时交给 store() 保存。
+        """
+        raw_digest = hashlib.sha256(body).hexdigest()
+        entry = self.entries.get(url)
+        if entry and entry['raw_digest'] == raw_digest:
+            return self._digest_hit(entry), (raw_digest, entry['digest'])
+
+        # 原始字节不同时才需要做较慢的规范化
+        digest = normalized_digest(body)
+        if entry and entry['digest'] == digest:
+            # 记下新的原始摘要，内容不再变化时下次可以直接比较
+            entry['raw_digest'] = raw_digest
+            self._execute('UPDATE http_validators SET raw_digest = ? WHERE url = ?', (raw_digest, url))
+            return self._digest_hit(entry), (raw_digest, digest)
+        return None, (raw_digest, digest)
+
+    def _digest_hit(self, entry):
+        """内容与上次相同，页面已下载但不再解析"""
+        with self.lock:
+            self.digest_hits += 1
+            self.parse_time_saved += entry['parse_time']
+        result = dict(entry['result'])
+        result['not_modified'] = True
+        return result
+
+    def store(self, url, headers, result, body_size, parse_time, digests=None):
+        """保存完整响应的校验信息、内容摘要和解析结果"""
+        if result and result.get('not_modified'):
+            return
+        with self.lock:
+            self.misses += 1
+
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        raw_digest, digest = digests or (None, None)
+        if not result or not (etag or last_modified or digest):
+            return
+
+        self.entries[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'result': result,
+            'body_size': body_size,
+            'parse_time': parse_time,
+            'raw_digest': raw_digest,
+            'digest': digest
+        }
+        self._execute('''
+            INSERT OR REPLACE INTO http_validators
+            (url, etag, last_modified, result, body_size, parse_time, raw_digest, digest, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (url, etag, last_modified, json.dumps(result, ensure_ascii=False), body_size, parse_time,
+              raw_digest, digest))
+
+    def _execute(self, sql, params):
+        if self.pool is None:
+            return
+        with self.pool.connection() as conn:
+            conn.execute(sql, params)
+            conn.commit()
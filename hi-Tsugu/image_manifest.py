@@ -0,0 +1,96 @@
+"""本地图片清单
+
+启动时扫描一次图片目录，之后由图片下载和删除路径实时维护，
+GET /api/products 判断图片是否存在时只查内存，不再对每个商品做文件系统调用。
+后台线程按 IMAGE_MANIFEST_RECONCILE_INTERVAL 重新扫描目录，修正手动增删文件造成的偏差。
+"""
+import os
+import threading
+import time
+
+from config import Config
+
+
+class ImageManifest:
+    """图片目录中已有文件名的内存集合"""
+
+    def __init__(self, image_dir=None):
+        self.image_dir = image_dir or Config.IMAGE_DIR
+        self.files = set()
+        self.lock = threading.Lock()
+        # 扫描期间发生的增删，扫描结束后覆盖扫描结果，避免丢失并发的更新
+        self.changes = None
+        self.last_reconciled = None
+
+    def _scan(self):
+        """列出图片目录中的文件（忽略下载中的临时文件）"""
+        try:
+            with os.scandir(self.image_dir) as entries:
+                return {entry.name for entry in entries
+                        if entry.is_file() and not entry.name.endswith('.part')}
+        except FileNotFoundError:
+            return set()
+
+    def load(self):
+        """扫描目录，返回 (新发现的文件数, 已不存在的文件数)"""
+        with self.lock:
+            self.changes = {}
+        files = self._scan()
+        with self.lock:
+            for name, present in self.changes.items():
+                if present:
+                    files.add(name)
+                else:
+                    files.discard(name)
+            self.changes = None
+            added = len(files - self.files)
+            removed = len(self.files - files)
+            self.files = files
+            self.last_reconciled = time.time()
+        return added, removed
+
+    def add(self, relative_path):
+        """记录新写入的图片"""
+        name = os.path.basename(relative_path)
+        with self.lock:
+            self.files.add(name)
+            if self.changes is not None:
+                self.changes[name] = True
+
+    def discard(self, relative_path):
+        """记录已删除的图片"""
+        name = os.path.basename(relative_path)
+        with self.lock:
+            self.files.discard(name)
+            if self.changes is not None:
+                self.changes[name] = False
+
+    def __contains__(self, relative_path):
+        return os.path.basename(relative_path) in self.files
+
+    def __len__(self):
+        return len(self.files)
+
+    def start_reconciler(self, interval=None):
+        """启动定期与磁盘对账的后台线程"""
+        interval = interval or Config.IMAGE_MANIFEST_RECONCILE_INTERVAL
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    added, removed = self.load()
+                    if added or removed:
+                        print(f"🖼️ 图片清单已修正: 新增 {added} 个, 移除 {removed} 个")
+                except Exception as e:
+                    print(f"❌ 图片清单对账失败: {e}")
+
+        thread = threading.Thread(target=run, name='image-manifest', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            'files': len(self.files),
+            'last_reconciled': self.last_reconciled
+        }
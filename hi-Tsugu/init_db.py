@@ -2,37 +2,15 @@
 import sqlite3
 import os
 
+from migrations import migrate
+
 def init_database():
     """初始化数据库"""
     try:
         conn = sqlite3.connect('products.db')
-        c = conn.cursor()
-        
-        # 创建商品表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                url TEXT UNIQUE NOT NULL,
-                image_url TEXT,
-                platform TEXT,
-                current_price REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 创建价格历史表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS price_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                price REAL NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        conn.commit()
+        # 表结构由 migrations.py 统一维护，与应用启动时执行的迁移相同
+        for version, description in migrate(conn):
+            print(f"🗄️ 数据库结构升级到第 {version} 版: {description}")
         conn.close()
         print("✅ 数据库初始化成功")
         return True
@@ -0,0 +1,278 @@
+"""数据库结构版本迁移
+
+数据库的结构版本记录在 PRAGMA user_version 中，MIGRATIONS 的第 N 项把数据库从第 N-1 版升级到第 N 版。
+启动时 migrate() 依次执行尚未应用的迁移：
+- 每一版在单独的 BEGIN IMMEDIATE 事务中执行，失败时整体回滚，版本号不变；
+- 拿到写锁后重新读取版本号，多个进程同时启动时同一版只执行一次；
+- 第 1 版与原来 init_db 创建的表结构相同（表已存在时不做改动），已有的 products.db 从这里开始原地升级。
+结构有变化时在 MIGRATIONS 末尾追加新的迁移，不要修改已经发布的迁移。
+"""
+import sqlite3
+
+
+def create_tables(conn):
+    """创建商品、价格历史和价格提醒表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT UNIQUE NOT NULL,
+            image_url TEXT,
+            local_image_path TEXT,
+            platform TEXT,
+            current_price REAL DEFAULT 0,
+            lowest_price REAL DEFAULT 0,
+            highest_price REAL DEFAULT 0,
+            price_change REAL DEFAULT 0,
+            is_available BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_checked TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            target_price REAL NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+
+
+def cascade_deletes(conn):
+    """删除商品时级联删除它的价格历史和价格提醒"""
+    rebuild_table(conn, 'price_history', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+        )
+    ''')
+    rebuild_table(conn, 'price_alerts', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER,
+            target_price REAL NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def add_indexes(conn):
+    """价格历史按 (商品, 时间) 建立覆盖索引，每个商品只保留一条价格提醒"""
+    # 按商品查最新价格、时间窗口和统计都只读索引，不回表
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_price_history_product_time
+        ON price_history (product_id, timestamp, price)
+    ''')
+    # 设置提醒以前没有唯一约束，重复设置会留下多条，保留最新的一条
+    conn.execute('''
+        DELETE FROM price_alerts
+        WHERE id NOT IN (SELECT MAX(id) FROM price_alerts GROUP BY product_id)
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_price_alerts_product ON price_alerts (product_id)')
+
+
+def latest_price_snapshot(conn):
+    """每个商品的最新价格快照，由价格历史的插入触发器维护"""
+    # 商品列表按主键关联快照，不再对每个商品查询两次价格历史
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latest_prices (
+            product_id INTEGER PRIMARY KEY,
+            price REAL NOT NULL,
+            timestamp TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+        )
+    ''')
+    # 所有写入价格历史的地方（包括其他进程）都会经过触发器；时间更早的补录记录不覆盖快照。
+    # 价格历史只会随商品一起删除，快照也由外键级联删除，因此不需要删除触发器
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_price_history_latest
+        AFTER INSERT ON price_history
+        WHEN NEW.product_id IS NOT NULL
+        BEGIN
+            INSERT INTO latest_prices (product_id, price, timestamp)
+            VALUES (NEW.product_id, NEW.price, NEW.timestamp)
+            ON CONFLICT (product_id) DO UPDATE SET price = excluded.price, timestamp = excluded.timestamp
+            WHERE latest_prices.timestamp IS NULL OR excluded.timestamp >= latest_prices.timestamp;
+        END
+    ''')
+    # 用已有的价格历史补全快照：带 MAX() 的聚合中，SQLite 取最大值所在行的其他列
+    conn.execute('''
+        INSERT OR REPLACE INTO latest_prices (product_id, price, timestamp)
+        SELECT product_id, price, MAX(timestamp)
+        FROM price_history
+        WHERE product_id IN (SELECT id FROM products)
+        GROUP BY product_id
+    ''')
+    # 商品列表按创建时间倒序，直接按索引顺序读取
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_created ON products (created_at)')
+
+
+def price_rollups(conn):
+    """价格历史按小时和按天汇总（开盘、最高、最低、收盘、合计、记录数），由价格历史的插入触发器维护"""
+    # 走势图和统计按时间范围读取汇总，读取的行数不再随检查频率和历史长度增长
+    for table, bucket in (('price_history_hourly', "strftime('%Y-%m-%d %H:00:00', {})"),
+                          ('price_history_daily', "strftime('%Y-%m-%d 00:00:00', {})")):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                product_id INTEGER NOT NULL,
+                bucket TIMESTAMP NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                open_time TIMESTAMP NOT NULL,
+                close_time TIMESTAMP NOT NULL,
+                price_sum REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (product_id, bucket),
+                FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        ''')
+        # 与最新价格快照相同，所有写入价格历史的地方都经过触发器，删除由外键级联。
+        # 补录的记录时间更早时只更新开盘价，时间相同时开盘价保留先写入的，收盘价取后写入的
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}
+            AFTER INSERT ON price_history
+            WHEN NEW.product_id IS NOT NULL AND {bucket.format('NEW.timestamp')} IS NOT NULL
+            BEGIN
+                INSERT INTO {table} (product_id, bucket, open, high, low, close,
+                                     open_time, close_time, price_sum, count)
+                VALUES (NEW.product_id, {bucket.format('NEW.timestamp')}, NEW.price, NEW.price, NEW.price, NEW.price,
+                        NEW.timestamp, NEW.timestamp, NEW.price, 1)
+                ON CONFLICT (product_id, bucket) DO UPDATE SET
+                    open = CASE WHEN excluded.open_time < open_time THEN excluded.open ELSE open END,
+                    high = MAX(high, excluded.high),
+                    low = MIN(low, excluded.low),
+                    close = CASE WHEN excluded.close_time >= close_time THEN excluded.close ELSE close END,
+                    open_time = MIN(open_time, excluded.open_time),
+                    close_time = MAX(close_time, excluded.close_time),
+                    price_sum = price_sum + excluded.price_sum,
+                    count = count + 1;
+            END
+        ''')
+        # 用已有的价格历史补全汇总，开盘价和收盘价按 (商品, 时间) 索引取
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {table} (product_id, bucket, open, high, low, close,
+                                            open_time, close_time, price_sum, count)
+            SELECT product_id, bucket,
+                   (SELECT price FROM price_history
+                    WHERE product_id = g.product_id AND timestamp = g.open_time
+                    ORDER BY id LIMIT 1),
+                   high, low,
+                   (SELECT price FROM price_history
+                    WHERE product_id = g.product_id AND timestamp = g.close_time
+                    ORDER BY id DESC LIMIT 1),
+                   open_time, close_time, price_sum, count
+            FROM (
+                SELECT product_id, {bucket.format('timestamp')} as bucket,
+                       MAX(price) as high, MIN(price) as low,
+                       MIN(timestamp) as open_time, MAX(timestamp) as close_time,
+                       SUM(price) as price_sum, COUNT(*) as count
+                FROM price_history
+                WHERE product_id IN (SELECT id FROM products) AND {bucket.format('timestamp')} IS NOT NULL
+                GROUP BY product_id, bucket
+            ) g
+        ''')
+
+
+def crawl_job_queue(conn):
+    """爬取任务队列表（CRAWL_MODE=queue 时由 job_queue.py 使用）"""
+    # 以前由 JobQueue 在启动时建表，表已存在时不做改动
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            available_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            changed INTEGER,
+            price REAL,
+            error TEXT,
+            created_at REAL NOT NULL,
+            finished_at REAL
+        )
+    ''')
+    # 同一商品同时只有一个未完成的任务
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_crawl_jobs_active
+        ON crawl_jobs (product_id) WHERE status != 'done'
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_crawl_jobs_pending ON crawl_jobs (status, available_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_crawl_jobs_lease ON crawl_jobs (status, lease_expires)')
+
+
+MIGRATIONS = [create_tables, cascade_deletes, add_indexes, latest_price_snapshot, price_rollups, crawl_job_queue]
+
+
+def rebuild_table(conn, table, schema):
+    """按新的建表语句重建表（SQLite 不能修改已有表的约束）
+
+    schema 中的 {table} 替换为临时表名；复制新旧表都有的列，
+    已删除商品遗留的记录（以及没有商品的记录）不再保留。
+    """
+    temp_table = f'{table}_new'
+    old_columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    conn.execute(schema.format(table=temp_table))
+    new_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({temp_table})')}
+    columns = ', '.join(column for column in old_columns if column in new_columns)
+    conn.execute(f'''
+        INSERT INTO {temp_table} ({columns})
+        SELECT {columns} FROM {table}
+        WHERE product_id IN (SELECT id FROM products)
+    ''')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {temp_table} RENAME TO {table}')
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, migrations=None):
+    """把数据库升级到最新版本，返回本次执行的 [(版本, 说明)]"""
+    migrations = MIGRATIONS if migrations is None else migrations
+    if schema_version(conn) >= len(migrations):
+        return []
+
+    applied = []
+    # 重建表时要关闭外键检查，foreign_keys 只能在事务之外修改
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys=OFF')
+    try:
+        for version, migration in enumerate(migrations, 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                migration(conn)
+                if conn.execute('PRAGMA foreign_key_check').fetchone():
+                    raise sqlite3.IntegrityError(f'第 {version} 版迁移后存在违反外键约束的记录')
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            applied.append((version, migration.__doc__))
+    finally:
+        conn.execute(f'PRAGMA foreign_keys={foreign_keys}')
+    return applied
@@ -0,0 +1,381 @@
+"""本地模拟商城
+
+为爬虫基准测试提供各平台的商品页面，不依赖真实电商网站。
+商品页面路径形如 /item.jd.com/<id>.html，平台由路径中的域名决定，
+因此 RealProductCrawler.detect_platform 可以照常识别。
+路径中没有域名时按 Host 请求头决定平台，配合 DnsCache.pin 可以直接使用 http://item.jd.com:<端口>/<id>.html
+这样的地址（按域名识别网站的 RealPriceCrawler 需要这种方式）。
+商品图片路径为 /images/<id>.jpg（每 5 个商品共用一张），/images/huge.jpg 是不带长度的超大图片。
+
+指定录制存储（fixtures）时回放录制的页面：/item.jd.com/<id>.html 返回京东的第 id % N 个录制页面，
+页面中的主图改写为 /fixtures/<key>，由录制的图片返回。
+可以注入延迟、服务器错误和带 Retry-After 的 429 限流，ETag 可选强校验、弱校验或不返回。
+--volatile 在每个页面末尾加入每次都不同的随机数和时间戳，模拟不支持条件请求的动态页面。
+
+用法:
+    python mock_shop.py serve [--port 8765] [--latency 0.2] [--error-rate 0.05] [--throttle-rate 0.05]
+                              [--retry-after 2] [--etag strong|weak|none] [--volatile] [--fixtures [目录]]
+    python mock_shop.py record URL [URL ...] [--file urls.txt] [--fixtures 目录]
+"""
+import argparse
+import functools
+import hashlib
+import io
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+PLATFORM_PATHS = {
+    'taobao': 'item.taobao.com',
+    'tmall': 'detail.tmall.com',
+    'jd': 'item.jd.com',
+    'pdd': 'mobile.yangkeduo.com',
+    'other': 'shop.example.com',
+    'amazon': 'www.amazon.com'
+}
+# RealProductCrawler.detect_platform 识别的平台，product_urls 默认在这些平台间分布
+DEFAULT_PLATFORMS = ('taobao', 'tmall', 'jd', 'pdd', 'other')
+
+FILLER = ''.join(f'<div class="rec-item"><a href="/r/{i}">推荐商品 {i}</a><span>¥{i}.00</span></div>'
+                 for i in range(200))
+
+
+def render_product_page(platform, product_id):
+    """生成指定平台的商品页面"""
+    name = f"模拟商品 {product_id}"
+    price = f"{100 + product_id % 900}.00"
+    image = f"/images/{product_id}.jpg"
+
+    if platform in ('taobao', 'tmall'):
+        body = f'''
+            <div id="J_Title"><h3 class="tb-main-title">{name}</h3></div>
+            <div class="tb-property"><em class="tb-rmb-num">{price}</em></div>
+            <img id="J_ImgBooth" src="{image}">
+        '''
+    elif platform == 'jd':
+        body = f'''
+            <div class="sku-name">{name}</div>
+            <div class="p-price"><span class="price">{price}</span></div>
+            <img id="spec-img" data-origin="{image}">
+        '''
+    elif platform == 'amazon':
+        body = f'''
+            <span id="productTitle">{name}</span>
+            <span class="a-price"><span class="a-offscreen">¥{price}</span></span>
+            <img id="landingImage" src="{image}">
+        '''
+    elif platform == 'pdd':
+        body = f'''
+            <div class="goods-gallery__main"><img src="{image}"></div>
+            <div class="goods-price">¥{price}</div>
+        '''
+    else:
+        body = f'''
+            <h1>{name}</h1>
+        '''
+
+    return f'''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>{name}</title>
+    <meta property="product:price" content="{price}">
+    <meta property="og:image" content="{image}">
+</head>
+<body>
+    {body}
+    <div class="recommend">{FILLER}</div>
+</body>
+</html>'''
+
+
+def render_product_image(product_id):
+    """生成模拟商品图片，每 5 个商品共用一张"""
+    return render_image(product_id % 5)
+
+
+@functools.lru_cache(maxsize=None)
+def render_image(variant):
+    """安装了 Pillow 时生成 1200x1200 的真实JPEG，否则返回伪造的图片字节"""
+    if Image is None:
+        seed = hashlib.sha256(f'image-{variant}'.encode()).digest()
+        return b'\xff\xd8\xff\xe0' + seed * 1024
+
+    image = Image.new('RGB', (1200, 1200), (40 * variant, 120, 200))
+    draw = ImageDraw.Draw(image)
+    for i in range(0, 1200, 40):
+        draw.line((0, i, 1200, 1200 - i), fill=(255, 255 - i // 5, i // 5), width=3)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class MockShopHandler(BaseHTTPRequestHandler):
+    """模拟商城请求处理"""
+
+    # 支持 keep-alive，便于观察连接复用
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文分两次写出，复用连接时需关闭 Nagle 算法，否则会等待延迟确认
+    disable_nagle_algorithm = True
+    latency = 0.0
+    latency_jitter = 0.0
+    error_rate = 0.0
+    throttle_rate = 0.0
+    retry_after = 1
+    etag_mode = 'strong'
+    volatile = False
+    fixtures = None
+
+    def do_GET(self):
+        delay = self.latency + (self.server.rng.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self.inject_fault():
+            return
+
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[0] == 'images' and len(parts) == 2:
+            self.send_image(parts[1])
+            return
+        if parts[0] == 'fixtures' and len(parts) == 2 and self.fixtures is not None:
+            fixture = self.fixtures.load_key(parts[1])
+            if fixture is None:
+                self.send_status(404)
+                return
+            self.send_body(fixture.body, fixture.headers.get('Content-Type', 'application/octet-stream'),
+                           fixture.status, fixture.headers)
+            return
+        platform = next((p for p, domain in PLATFORM_PATHS.items() if parts[0] == domain), None)
+        if platform is None:
+            host = self.headers.get('Host', '').split(':')[0]
+            platform = next((p for p, domain in PLATFORM_PATHS.items() if host == domain), None)
+            parts.insert(0, host)
+        if platform is None or len(parts) < 2:
+            self.send_status(404)
+            return
+
+        product_id = int(''.join(ch for ch in parts[1] if ch.isdigit()) or 0)
+        pages = self.fixtures.pages(platform) if self.fixtures is not None else []
+        if pages:
+            fixture = pages[product_id % len(pages)]
+            self.send_body(rewrite_images(fixture), fixture.headers['Content-Type'])
+            return
+        self.send_body(render_product_page(platform, product_id).encode('utf-8'), 'text/html; charset=utf-8')
+
+    def inject_fault(self):
+        """按配置的比例返回 429 或 503，返回是否已响应"""
+        roll = self.server.rng.random()
+        if roll < self.throttle_rate:
+            self.send_status(429, {'Retry-After': str(self.retry_after)})
+            return True
+        if roll < self.throttle_rate + self.error_rate:
+            self.send_status(503)
+            return True
+        return False
+
+    def send_status(self, status, headers=None):
+        """返回没有正文的响应"""
+        self.server.record(status)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_body(self, body, content_type, status=200, headers=None):
+        """返回正文，按 etag_mode 生成 ETag 并处理 If-None-Match"""
+        headers = dict(headers or {})
+        headers.pop('Content-Type', None)
+        if self.volatile and content_type.startswith('text/html'):
+            body += self.volatile_tokens()
+        etag = headers.pop('ETag', None) or '"%s"' % hashlib.md5(body).hexdigest()
+        if self.etag_mode == 'weak' and not etag.startswith('W/'):
+            etag = 'W/' + etag
+        if self.etag_mode != 'none':
+            headers['ETag'] = etag
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self.send_status(304, {'ETag': etag})
+                return
+
+        self.server.record(status)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def volatile_tokens(self):
+        """每次请求都不同的随机数、CSRF令牌和时间戳"""
+        now = time.time()
+        return (f'<script nonce="{uuid.uuid4().hex}">var csrf_token = "{uuid.uuid4().hex}", '
+                f'requestId = "{uuid.uuid4()}", serverTime = {int(now * 1000)};</script>'
+                f'<!-- rendered {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))} -->').encode()
+
+    def send_image(self, filename):
+        """返回模拟图片；huge.jpg 不声明长度，持续输出直到客户端断开"""
+        if filename == 'huge.jpg':
+            self.server.record(200)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            chunk = b'\0' * 64 * 1024
+            for _ in range(1024):
+                self.wfile.write(chunk)
+            return
+
+        body = render_product_image(int(''.join(ch for ch in filename if ch.isdigit()) or 0))
+        self.send_body(body, 'image/jpeg')
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # 爬虫提前结束读取时会直接断开连接
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def rewrite_images(fixture):
+    """把录制页面中的图片地址改写为本地的 /fixtures/<key>"""
+    body = fixture.body
+    for image_url, key in fixture.images.items():
+        parts = urlsplit(image_url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        # 页面中可能是完整地址、省略协议的地址或站内路径
+        for candidate in (image_url, f'//{parts.netloc}{path}', path):
+            for quote in '"\'':
+                body = body.replace(f'{quote}{candidate}{quote}'.encode(), f'{quote}/fixtures/{key}{quote}'.encode())
+    return body
+
+
+class MockShopServer(ThreadingHTTPServer):
+    """记录各状态码的响应次数，供基准测试核对"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, seed=None):
+        super().__init__(address, handler)
+        self.rng = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.stats = Counter()
+
+    def record(self, status):
+        with self.stats_lock:
+            self.stats[status] += 1
+
+
+def start_mock_shop(port=0, latency=0.0, latency_jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                    retry_after=1, etag='strong', fixtures=None, seed=None, volatile=False):
+    """在后台线程启动模拟商城，返回 (server, port)
+
+    fixtures 为 FixtureStore 时回放录制的页面；error_rate / throttle_rate 为返回 503 / 429 的请求比例；
+    volatile 为 True 时页面带每次都不同的随机数和时间戳。
+    """
+    handler = type('Handler', (MockShopHandler,), {
+        'latency': latency,
+        'latency_jitter': latency_jitter,
+        'error_rate': error_rate,
+        'throttle_rate': throttle_rate,
+        'retry_after': retry_after,
+        'etag_mode': etag,
+        'volatile': volatile,
+        'fixtures': fixtures
+    })
+    # 监听所有地址，便于用 127.0.0.x 模拟多个主机
+    server = MockShopServer(('', port), handler, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def product_urls(port, count, hosts=4, platforms=DEFAULT_PLATFORMS):
+    """生成分布在多个主机和平台上的商品URL"""
+    platforms = list(platforms)
+    urls = []
+    for i in range(count):
+        host = f"127.0.0.{i % hosts + 1}"
+        platform = platforms[i % len(platforms)]
+        urls.append(f"http://{host}:{port}/{PLATFORM_PATHS[platform]}/{i + 1}.html")
+    random.shuffle(urls)
+    return urls
+
+
+def record(urls, store):
+    """抓取真实页面保存到录制存储"""
+    from real_crawler import RealProductCrawler
+
+    crawler = RealProductCrawler()
+    for url in urls:
+        try:
+            fixture = store.record(url, crawler)
+            print(f"📼 已录制 [{fixture.platform}] {fixture.status} {len(fixture.body)} 字节, "
+                  f"图片 {len(fixture.images)} 张: {url}")
+        except Exception as e:
+            print(f"❌ 录制失败 {url}: {e}")
+        time.sleep(crawler.get_random_delay())
+
+
+def main():
+    from fixture_store import FixtureStore
+
+    parser = argparse.ArgumentParser(description='本地模拟商城')
+    commands = parser.add_subparsers(dest='command')
+
+    serve = commands.add_parser('serve', help='启动模拟商城')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒）')
+    serve.add_argument('--jitter', type=float, default=0.0, help='额外的随机延迟上限（秒）')
+    serve.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的请求比例')
+    serve.add_argument('--throttle-rate', type=float, default=0.0, help='返回 429 的请求比例')
+    serve.add_argument('--retry-after', type=int, default=1, help='429 响应的 Retry-After（秒）')
+    serve.add_argument('--etag', choices=('strong', 'weak', 'none'), default='strong')
+    serve.add_argument('--volatile', action='store_true', help='页面带每次都不同的随机数和时间戳')
+    serve.add_argument('--fixtures', nargs='?', const='', help='回放录制的页面，可指定录制目录')
+    serve.add_argument('--seed', type=int, help='故障注入的随机种子')
+
+    recorder = commands.add_parser('record', help='录制真实页面')
+    recorder.add_argument('urls', nargs='*')
+    recorder.add_argument('--file', help='每行一个URL的文件')
+    recorder.add_argument('--fixtures', default='', help='录制目录')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        urls = list(args.urls)
+        if args.file:
+            with open(args.file, encoding='utf-8') as f:
+                urls += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        record(urls, FixtureStore(args.fixtures or None))
+        return
+
+    if args.command is None:
+        args = serve.parse_args([])
+    fixtures = FixtureStore(args.fixtures or None) if args.fixtures is not None else None
+    server, port = start_mock_shop(args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                                   args.retry_after, args.etag, fixtures, args.seed, args.volatile)
+    print(f"🛒 模拟商城已启动: http://127.0.0.1:{port}/item.jd.com/1.html")
+    if fixtures is not None:
+        print(f"📼 回放录制页面: {fixtures.stats()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"📊 响应统计: {dict(server.stats)}")
+
+
+if __name__ == '__main__':
+    main()
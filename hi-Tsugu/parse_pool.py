@@ -0,0 +1,44 @@
+"""解析进程池
+
+HTML 解析是 CPU 密集型工作，放在事件循环里会和网络 I/O 抢同一个 GIL。
+抓取阶段只负责下载字节，解析交给进程池中的 RealProductCrawler 完成。
+Web 进程中已有连接池、写线程和调度线程，fork 出的子进程会继承其中被持有的锁和 SQLite 连接，
+所以工作进程用 spawn 方式启动，进程池由爬取引擎创建一次后在各轮之间复用。
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from http_cache import ValidatorCache
+from real_crawler import RealProductCrawler
+from selector_stats import SelectorStats
+
+# 每个工作进程各自持有一个爬虫实例，只用于解析
+_crawler = None
+
+
+def _init_worker():
+    global _crawler
+    # 解析进程不发请求，条件请求缓存只放在内存中，不读写 http_cache.db
+    _crawler = RealProductCrawler(http_cache=ValidatorCache(None))
+    # 选择器命中记录随解析结果交回主进程汇总
+    _crawler.selector_stats = SelectorStats(export=True)
+
+
+def parse_page(body, url):
+    """在工作进程中解析页面，返回 (商品信息, 解析耗时, 新增的选择器命中记录)
+
+    结构化数据阶段已在抓取阶段对同样的字节执行过，这里从 lxml 快速路径开始，
+    找不到时回退到各平台的 BeautifulSoup 提取方法（fetch_taobao_product 等）。
+    """
+    started = time.perf_counter()
+    product_info = _crawler.fast_extractor.extract(body, url)
+    if not product_info:
+        product_info = _crawler.parse_product_page(body.decode('utf-8', errors='replace'), url)
+    return product_info, time.perf_counter() - started, _crawler.selector_stats.drain()
+
+
+def create_parse_pool(workers):
+    """创建解析进程池"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               mp_context=multiprocessing.get_context('spawn'))
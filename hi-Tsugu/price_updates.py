@@ -0,0 +1,126 @@
+"""爬取结果写库
+
+定时爬取（app.py）和独立的爬取工作进程（crawl_worker.py）共用，不依赖 Flask 应用：
+写库对象、价格提醒和调度器都由调用方传入。
+"""
+from datetime import datetime
+
+
+def save_price_update(c, product, product_info, alerts=None, scheduler=None):
+    """保存单个商品的爬取结果
+
+    c 可以是游标或 BatchWriter（只执行写语句）；传入 BatchWriter 时必须同时传入
+    alerts（load_price_alerts 的结果），否则用游标 c 读取该商品的价格提醒。
+    scheduler 为调度器时记录本次检查；工作进程不传，检查结果经任务表交给Web进程的调度器。
+    """
+    product_id, url, current_price, lowest_price, highest_price = product
+    
+    if product_info and product_info.get('circuit_open'):
+        # 平台熔断中，请求没有发出，保持商品状态不变
+        print(f"  ⛔ 商品 {product_id} 所在平台熔断中，本轮跳过")
+        return False
+    
+    if product_info and product_info.get('cached'):
+        # 结果来自合并层（刚抓取过或与其他请求共享），本商品没有发出请求：
+        # 不写价格历史，不记为一次检查，只同步价格
+        new_price = product_info.get('price')
+        if product_info.get('success') and not product_info.get('not_modified') and new_price != current_price:
+            c.execute('''
+                UPDATE products
+                SET current_price = ?,
+                    lowest_price = CASE WHEN ? > 0 AND (lowest_price = 0 OR ? < lowest_price) THEN ? ELSE lowest_price END,
+                    highest_price = MAX(highest_price, ?)
+                WHERE id = ?
+            ''', (new_price, new_price, new_price, new_price, new_price, product_id))
+            print(f"  🔁 商品 {product_id} 使用刚抓取的结果: {current_price} → {new_price}")
+        else:
+            print(f"  🔁 商品 {product_id} 刚抓取过，本轮跳过")
+        return True
+    
+    if product_info and product_info.get('not_modified'):
+        # 页面未变化（304），只记录本次检查
+        if scheduler:
+            scheduler.record_check(product_id, changed=False)
+        c.execute('UPDATE products SET last_checked = ? WHERE id = ?',
+                  (datetime.now().isoformat(), product_id))
+        print(f"  ♻️ 商品 {product_id} 价格未变化: {current_price}")
+        return True
+    
+    if product_info and product_info.get('success'):
+        new_price = product_info['price']
+        if scheduler:
+            scheduler.record_check(product_id, changed=current_price > 0 and new_price != current_price,
+                                   price=new_price)
+        
+        # 计算价格变化
+        price_change = 0
+        if current_price > 0:
+            price_change = round(((new_price - current_price) / current_price) * 100, 2)
+        
+        # 更新价格历史
+        c.execute('''
+            INSERT INTO price_history (product_id, price)
+            VALUES (?, ?)
+        ''', (product_id, new_price))
+        
+        # 更新商品信息
+        update_data = {
+            'current_price': new_price,
+            'price_change': price_change,
+            'last_checked': datetime.now().isoformat()
+        }
+        
+        # 更新最低价和最高价
+        if new_price > 0:
+            if lowest_price == 0 or new_price < lowest_price:
+                update_data['lowest_price'] = new_price
+            if new_price > highest_price:
+                update_data['highest_price'] = new_price
+        
+        set_clause = ', '.join([f"{k} = ?" for k in update_data.keys()])
+        values = list(update_data.values()) + [product_id]
+        
+        c.execute(f'''
+            UPDATE products 
+            SET {set_clause}
+            WHERE id = ?
+        ''', values)
+        
+        # 检查价格提醒
+        if alerts is None:
+            alerts = load_price_alerts(c, [product_id])
+        check_price_alerts(product_id, new_price, alerts)
+        
+        print(f"  ✅ 商品 {product_id} 价格更新: {current_price} → {new_price} ({price_change}%)")
+        return True
+    
+    print(f"  ❌ 商品 {product_id} 更新失败")
+    if scheduler:
+        scheduler.record_check(product_id, changed=False)
+    # 标记为不可用
+    c.execute('UPDATE products SET is_available = 0 WHERE id = ?', (product_id,))
+    return False
+
+
+def load_price_alerts(c, product_ids):
+    """读取商品的有效价格提醒：{商品ID: [(提醒ID, 目标价格)]}"""
+    alerts = {}
+    for start in range(0, len(product_ids), 500):
+        chunk = product_ids[start:start + 500]
+        c.execute(f'''
+            SELECT product_id, id, target_price
+            FROM price_alerts
+            WHERE product_id IN ({', '.join('?' * len(chunk))}) AND is_active = 1
+        ''', chunk)
+        for product_id, alert_id, target_price in c.fetchall():
+            alerts.setdefault(product_id, []).append((alert_id, target_price))
+    return alerts
+
+
+def check_price_alerts(product_id, current_price, alerts):
+    """检查价格提醒，alerts 为 load_price_alerts 的结果"""
+    for alert_id, target_price in alerts.get(product_id, ()):
+        if current_price <= target_price:
+            print(f"🎯 价格提醒触发! 商品 {product_id} 当前价格 {current_price} <= 目标价格 {target_price}")
+            # 这里可以添加邮件/短信通知
+            # send_notification(alert_id, product_id, current_price, target_price)
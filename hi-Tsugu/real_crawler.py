@@ -6,11 +6,28 @@ import random
 import json
 from urllib.parse import urljoin, urlparse
 from config import Config
+from rate_limiter import shared_limiter
+from http_cache import ValidatorCache
+from http_pool import shared_pool
+from fetch_coalescer import FetchCoalescer
+from resilience import CircuitOpenError, RetryPolicy, RetryableError, retry_after_seconds, shared_breakers
+from extraction import FastExtractor
+from selector_stats import SelectorStats
+from structured_data import StructuredDataExtractor
+from streaming import StreamingPageReader
 
 class RealProductCrawler:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, rate_limiter=None, http_cache=None, breakers=None, coalescer=None):
+        self.session = shared_pool.session()
         self.config = Config()
+        self.rate_limiter = rate_limiter or shared_limiter
+        self.breakers = breakers or shared_breakers
+        self.retry_policy = RetryPolicy()
+        self.http_cache = http_cache or ValidatorCache()
+        self.coalescer = coalescer or FetchCoalescer()
+        self.selector_stats = SelectorStats()
+        self.structured_extractor = StructuredDataExtractor(self)
+        self.fast_extractor = FastExtractor(self)
         self.update_headers()
     
     def update_headers(self):
@@ -28,43 +45,111 @@ class RealProductCrawler:
         """获取随机延迟"""
         return random.uniform(self.config.DELAY_BETWEEN_REQUESTS, self.config.DELAY_BETWEEN_REQUESTS + 2)
     
-    def fetch_product_info(self, url, retry_count=0):
-        """获取商品信息"""
+    def fetch_product_info(self, url):
+        """获取商品信息
+
+        同一URL的并发调用只抓取一次，FETCH_CACHE_TTL 秒内的成功结果直接返回。
+        """
+        return self.coalescer.fetch(url, self._fetch_product_info)
+    
+    def _fetch_product_info(self, url):
+        """抓取商品信息
+
+        按 retry_policy 迭代重试，整个过程不超过 FETCH_DEADLINE 秒；
+        目标域名处于熔断状态时不发请求，直接返回 circuit_open 结果。
+        """
         try:
-            if retry_count > 0:
-                time.sleep(self.get_random_delay() * retry_count)
-                self.update_headers()  # 重试时更换User-Agent
-            
-            print(f"🔍 爬取商品信息: {url}")
-            response = self.session.get(url, timeout=self.config.REQUEST_TIMEOUT)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            platform = self.detect_platform(url)
-            print(f"📱 检测到平台: {platform}")
-            
-            if platform == 'taobao':
-                return self.fetch_taobao_product(soup, url)
-            elif platform == 'tmall':
-                return self.fetch_tmall_product(soup, url)
-            elif platform == 'jd':
-                return self.fetch_jd_product(soup, url)
-            elif platform == 'pdd':
-                return self.fetch_pdd_product(soup, url)
-            else:
-                return self.fetch_general_product(soup, url)
-                
-        except requests.exceptions.Timeout:
-            print(f"⏰ 请求超时: {url}")
-            if retry_count < self.config.MAX_RETRIES:
-                return self.fetch_product_info(url, retry_count + 1)
-            return None
+            return self.retry_policy.run(url, lambda remaining: self._fetch_once(url, remaining), self.breakers)
+        except CircuitOpenError as e:
+            print(f"⛔ {e}")
+            return {'success': False, 'circuit_open': True, 'error': str(e)}
         except Exception as e:
             print(f"❌ 爬取失败: {e}")
-            if retry_count < self.config.MAX_RETRIES:
-                return self.fetch_product_info(url, retry_count + 1)
             return None
     
+    def _fetch_once(self, url, remaining):
+        """发出一次请求，可重试的失败抛出 RetryableError"""
+        deadline = time.monotonic() + remaining
+        self.rate_limiter.acquire(url)
+        print(f"🔍 爬取商品信息: {url}")
+        try:
+            timeout = min(self.config.REQUEST_TIMEOUT, max(deadline - time.monotonic(), 0.1))
+            response = self.session.get(url, timeout=timeout, stream=True,
+                                        headers=self.http_cache.conditional_headers(url))
+            with response:
+                if response.status_code == 304:
+                    print(f"♻️ 页面未变化: {url}")
+                    return self.http_cache.record_hit(url)
+                self.check_retryable_status(url, response.status_code, response.headers)
+                
+                reader = StreamingPageReader(self, url, headers=response.headers)
+                product_info = self.read_product_stream(
+                    reader, response.iter_content(self.config.STREAM_CHUNK_SIZE))
+        except requests.exceptions.Timeout:
+            print(f"⏰ 请求超时: {url}")
+            self.update_headers()  # 重试时更换User-Agent
+            raise RetryableError('请求超时')
+        except requests.exceptions.RequestException as e:
+            self.update_headers()
+            raise RetryableError(f'请求异常: {e}')
+        self.http_cache.store(url, response.headers, product_info,
+                              reader.bytes_read, reader.parse_time, reader.digests)
+        return product_info
+    
+    def check_retryable_status(self, url, status, headers):
+        """429 和 5xx 视为可重试的失败；429 同时暂停该域名的请求"""
+        if status == 429:
+            retry_after = retry_after_seconds(headers.get('Retry-After'))
+            print(f"🚦 请求过于频繁，{retry_after:.0f} 秒后重试: {url}")
+            self.rate_limiter.penalize(url, retry_after)
+            self.update_headers()
+            raise RetryableError('HTTP 429', host_failure=False, retry_after=retry_after)
+        if status >= 500:
+            self.update_headers()
+            raise RetryableError(f'HTTP {status}')
+    
+    def read_product_stream(self, reader, chunks):
+        """边下载边解析，字段提取完整或达到字节预算时停止读取"""
+        for chunk in chunks:
+            product_info = reader.feed(chunk)
+            if product_info:
+                return product_info
+            if reader.exhausted:
+                print(f"✂️ 达到字节预算 {reader.budget}，停止读取: {reader.url}")
+                break
+        return reader.finish()
+    
+    def parse_product_content(self, body, url):
+        """解析页面字节
+
+        依次尝试：结构化数据（JSON-LD / meta） -> lxml 快速路径 -> BeautifulSoup
+        """
+        product_info = self.structured_extractor.extract(body, url)
+        if product_info:
+            return product_info
+        product_info = self.fast_extractor.extract(body, url)
+        if product_info:
+            return product_info
+        return self.parse_product_page(body.decode('utf-8', errors='replace'), url)
+    
+    def parse_product_page(self, html, url):
+        """解析商品页面HTML"""
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        platform = self.detect_platform(url)
+        print(f"📱 检测到平台: {platform}")
+        
+        if platform == 'taobao':
+            return self.fetch_taobao_product(soup, url)
+        elif platform == 'tmall':
+            return self.fetch_tmall_product(soup, url)
+        elif platform == 'jd':
+            return self.fetch_jd_product(soup, url)
+        elif platform == 'pdd':
+            return self.fetch_pdd_product(soup, url)
+        else:
+            return self.fetch_general_product(soup, url)
+    
     def detect_platform(self, url):
         """检测电商平台"""
         if 'taobao.com' in url:
@@ -101,22 +186,17 @@ class RealProductCrawler:
     
     def extract_taobao_title(self, soup):
         """提取淘宝标题"""
-        selectors = [
-            '#J_Title .tb-main-title',
-            '.tb-detail-hd h1',
-            '[class*="Title--title"]',
-            'h1[data-spm]',
-            'title'
-        ]
-        
+        selectors = self.selector_stats.order('taobao', 'name', self.config.SITE_CONFIGS['taobao']['name_selectors'])
         for selector in selectors:
             element = soup.select_one(selector)
             if element and element.get_text().strip():
+                self.selector_stats.record('taobao', 'name', selectors, selector)
                 title = element.get_text().strip()
                 title = re.sub(r'-\s*淘宝网', '', title)
                 title = re.sub(r'\s+', ' ', title)
                 return title[:100] if len(title) > 100 else title
         
+        self.selector_stats.record('taobao', 'name', selectors)
         return None
     
     def extract_taobao_price(self, soup):
@@ -130,20 +210,16 @@ class RealProductCrawler:
                 pass
         
         # 方法2: 从页面元素获取
-        price_selectors = [
-            '.tb-rmb-num',
-            '[class*="Price--price"]',
-            '.tm-price',
-            '.tb-property .tb-price'
-        ]
-        
-        for selector in price_selectors:
+        selectors = self.selector_stats.order('taobao', 'price', self.config.SITE_CONFIGS['taobao']['price_selectors'])
+        for selector in selectors:
             element = soup.select_one(selector)
             if element:
                 price_text = element.get_text().strip()
                 price = self.parse_price(price_text)
                 if price > 0:
+                    self.selector_stats.record('taobao', 'price', selectors, selector)
                     return price
+        self.selector_stats.record('taobao', 'price', selectors)
         
         # 方法3: 从页面文本搜索
         text = soup.get_text()
@@ -165,23 +241,18 @@ class RealProductCrawler:
     
     def extract_taobao_image(self, soup, base_url):
         """提取淘宝图片"""
-        img_selectors = [
-            '#J_ImgBooth',
-            '.tb-booth img',
-            '.tb-pic img',
-            '[class*="main-img"] img'
-        ]
-        
-        for selector in img_selectors:
+        site_config = self.config.SITE_CONFIGS['taobao']
+        selectors = self.selector_stats.order('taobao', 'image', site_config['image_selectors'])
+        for selector in selectors:
             elements = soup.select(selector)
             for element in elements:
-                img_src = (element.get('src') or 
-                          element.get('data-src') or 
-                          element.get('data-ks-lazyload'))
+                img_src = self.get_image_src(element, site_config['image_attrs'])
                 if img_src:
                     full_url = self.process_image_url(img_src, base_url)
                     if self.validate_image_url(full_url):
+                        self.selector_stats.record('taobao', 'image', selectors, selector)
                         return full_url
+        self.selector_stats.record('taobao', 'image', selectors)
         
         # 从meta标签获取
         meta_image = soup.find('meta', {'property': 'og:image'})
@@ -195,9 +266,13 @@ class RealProductCrawler:
     def fetch_jd_product(self, soup, url):
         """获取京东商品信息"""
         try:
-            title_element = (soup.select_one('.sku-name') or 
-                           soup.select_one('.product-title') or 
-                           soup.find('title'))
+            title_element = None
+            selectors = self.selector_stats.order('jd', 'name', self.config.SITE_CONFIGS['jd']['name_selectors'])
+            for selector in selectors:
+                title_element = soup.select_one(selector)
+                if title_element:
+                    break
+            self.selector_stats.record('jd', 'name', selectors, selector if title_element else None)
             title = title_element.get_text().strip() if title_element else None
             if title:
                 title = re.sub(r'-\s*京东', '', title)
@@ -223,20 +298,16 @@ class RealProductCrawler:
     def extract_jd_price(self, soup):
         """提取京东价格"""
         # 从页面元素获取
-        price_selectors = [
-            '.p-price .price',
-            '.J-p-123456',  # 动态ID，需要从页面获取
-            '.price .num',
-            '[class*="price J-p-"]'
-        ]
-        
-        for selector in price_selectors:
+        selectors = self.selector_stats.order('jd', 'price', self.config.SITE_CONFIGS['jd']['price_selectors'])
+        for selector in selectors:
             element = soup.select_one(selector)
             if element:
                 price_text = element.get_text().strip()
                 price = self.parse_price(price_text)
                 if price > 0:
+                    self.selector_stats.record('jd', 'price', selectors, selector)
                     return price
+        self.selector_stats.record('jd', 'price', selectors)
         
         # 从JavaScript数据获取
         script_tags = soup.find_all('script')
@@ -260,24 +331,19 @@ class RealProductCrawler:
     
     def extract_jd_image(self, soup, base_url):
         """提取京东图片"""
-        img_selectors = [
-            '#spec-img',
-            '.main-img img',
-            '[class*="spec-pic"] img',
-            '.preview-img img'
-        ]
-        
-        for selector in img_selectors:
+        site_config = self.config.SITE_CONFIGS['jd']
+        selectors = self.selector_stats.order('jd', 'image', site_config['image_selectors'])
+        for selector in selectors:
             element = soup.select_one(selector)
             if element:
-                img_src = (element.get('data-origin') or 
-                          element.get('src') or 
-                          element.get('data-lazyload'))
+                img_src = self.get_image_src(element, site_config['image_attrs'])
                 if img_src:
                     full_url = self.process_image_url(img_src, base_url)
                     if self.validate_image_url(full_url):
+                        self.selector_stats.record('jd', 'image', selectors, selector)
                         return full_url
         
+        self.selector_stats.record('jd', 'image', selectors)
         return ''
     
     def fetch_tmall_product(self, soup, url):
@@ -346,21 +412,19 @@ class RealProductCrawler:
     
     def extract_pdd_image(self, soup, base_url):
         """提取拼多多图片"""
-        img_selectors = [
-            '.goods-gallery__main img',
-            '.slide-main img',
-            '[class*="image"] img'
-        ]
-        
-        for selector in img_selectors:
+        site_config = self.config.SITE_CONFIGS['pdd']
+        selectors = self.selector_stats.order('pdd', 'image', site_config['image_selectors'])
+        for selector in selectors:
             element = soup.select_one(selector)
             if element:
-                img_src = element.get('src') or element.get('data-src')
+                img_src = self.get_image_src(element, site_config['image_attrs'])
                 if img_src:
                     full_url = self.process_image_url(img_src, base_url)
                     if self.validate_image_url(full_url):
+                        self.selector_stats.record('pdd', 'image', selectors, selector)
                         return full_url
         
+        self.selector_stats.record('pdd', 'image', selectors)
         return ''
     
     def fetch_general_product(self, soup, url):
@@ -395,6 +459,24 @@ class RealProductCrawler:
             print(f"通用爬取失败: {e}")
             return None
     
+    def get_image_src(self, element, attrs):
+        """按属性顺序取图片地址（兼容懒加载属性）"""
+        for attr in attrs:
+            img_src = element.get(attr)
+            if img_src:
+                return img_src
+        return None
+    
+    def clean_title(self, title, platform):
+        """按平台清理标题"""
+        title = title.strip()
+        if platform in ('taobao', 'tmall'):
+            title = re.sub(r'-\s*淘宝网', '', title)
+            title = re.sub(r'\s+', ' ', title)
+        elif platform == 'jd':
+            title = re.sub(r'-\s*京东', '', title)
+        return title[:100]
+    
     def process_image_url(self, img_src, base_url):
         """处理图片URL"""
         if not img_src:
@@ -143,7 +143,7 @@ function createProductCard(product) {
     const changeText = priceChange > 0 ? `+${priceChange}%` : priceChange < 0 ? `${priceChange}%` : '0%';
     
     const imageHTML = product.display_image ? 
-        `<img src="${product.display_image}" alt="${product.name}" onerror="handleImageError(this)">` :
+        `<img src="${product.display_image}" alt="${product.name}" loading="lazy" onerror="handleImageError(this)">` :
         `<div class="image-placeholder">
             <div class="placeholder-icon">📷</div>
             <div>暂无图片</div>
@@ -330,7 +330,7 @@ function renderProductModal(product, prices, stats) {
             <div class="detail-header">
                 <div class="detail-image">
                     ${product.display_image ? 
-                        `<img src="${product.display_image}" alt="${product.name}" style="width: 200px; height: 200px; object-fit: cover; border-radius: 12px;">` :
+                        `<img src="${product.detail_image || product.display_image}" alt="${product.name}" style="width: 200px; height: 200px; object-fit: cover; border-radius: 12px;">` :
                         '<div style="width: 200px; height: 200px; background: #f8f9fa; display: flex; align-items: center; justify-content: center; border-radius: 12px; color: #95a5a6;">暂无图片</div>'
                     }
                 </div>
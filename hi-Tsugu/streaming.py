@@ -0,0 +1,174 @@
+"""流式读取商品页面
+
+边下载边把数据交给增量解析器，名称、价格、图片都已提取到，
+或者读取量达到该平台的字节预算时就停止读取。
+需要内容摘要时总是读到末尾（或预算）以计算摘要，内容与上次相同时不再解析。
+"""
+import re
+import time
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from config import Config
+from structured_data import SCAN_LIMIT
+
+# 结构化数据的位置标记：ld+json 块的开始和结束，以及 <head> 的结束
+STRUCTURED_MARKER = re.compile(rb'ld\+json|</script\s*>|</head\s*>', re.I)
+MARKER_OVERLAP = 16  # 标记可能被分在两块数据之间
+
+
+class StreamingPageReader:
+    """流式页面读取器
+
+    每收到一块数据：
+    1. 只在新收到的字节中查找结构化数据的标记，有新的完整 ld+json 块或 <head> 结束时
+       尝试一次结构化数据提取；<head> 已结束且没有未闭合的 ld+json 块后不再尝试；
+    2. 把数据喂给 lxml 的增量解析器，在已解析完的元素上运行预编译选择器。
+    任一步拿到完整信息（含图片）即可提前结束。
+    parse_dom=False 时只做第 1 步，DOM 解析留给解析进程池。
+    需要内容摘要时（见 ValidatorCache.needs_digest）摘要需要覆盖整个页面，提取到信息后仍继续读取；
+    已有该页面的摘要时内容多半未变化，两步都推迟到 finish() 比较摘要之后。
+    """
+
+    def __init__(self, crawler, url, parse_dom=True, headers=None):
+        self.crawler = crawler
+        self.url = url
+        self.parse_dom = parse_dom
+        self.platform = crawler.detect_platform(url)
+        budgets = Config.PAGE_BYTE_BUDGETS
+        self.budget = budgets.get(self.platform, budgets['other'])
+        self.buffer = bytearray()
+        # 只需要根节点，之后直接在文档树上执行XPath
+        self.parser = etree.HTMLPullParser(events=('start',), tag='html', encoding='utf-8')
+        # 使用 lxml.html 的元素类型，提取时需要 text_content()
+        self.parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+        self.root = None
+        self.stopped_early = False
+        self.parse_time = 0.0
+        self.digest_mode = crawler.http_cache.needs_digest(url, headers or {})
+        self.defer_parse = self.digest_mode and crawler.http_cache.has_digest(url)
+        self.digests = None
+        self.early_result = None
+        self.marker_offset = 0
+        self.head_closed = False
+        self.ld_open = False
+        self.structured_done = False
+
+    @property
+    def bytes_read(self):
+        return len(self.buffer)
+
+    @property
+    def body(self):
+        """已收到的全部字节"""
+        return bytes(self.buffer)
+
+    @property
+    def exhausted(self):
+        """是否已达到字节预算"""
+        return len(self.buffer) >= self.budget
+
+    def feed(self, chunk):
+        """喂入一块数据，字段已提取完整时返回商品信息，否则返回 None"""
+        started = time.perf_counter()
+        try:
+            self.buffer += chunk
+            if self.defer_parse or self.early_result:
+                return None
+            product_info = self._try_extract(chunk)
+            if product_info and self.digest_mode:
+                self.early_result = product_info
+                return None
+            if product_info:
+                self.stopped_early = True
+            return product_info
+        finally:
+            self.parse_time += time.perf_counter() - started
+
+    def finish(self):
+        """读到末尾或达到预算后，内容未变化时返回上次的结果，否则使用已提取到的信息或做完整解析"""
+        started = time.perf_counter()
+        try:
+            return (self._match_digest() or self.early_result
+                    or self.crawler.parse_product_content(self.body, self.url))
+        finally:
+            self.parse_time += time.perf_counter() - started
+
+    def finish_structured(self):
+        """使用解析进程池时，读完后只检查内容摘要和结构化数据，都没有结果时返回 None"""
+        started = time.perf_counter()
+        try:
+            product_info = self._match_digest() or self.early_result
+            if product_info:
+                return product_info
+            structured = self.crawler.structured_extractor
+            if self.defer_parse:
+                return structured.extract(self.body, self.url)
+            # 每收到一块数据都已尝试过结构化数据
+            structured.record(self.platform, False)
+            return None
+        finally:
+            self.parse_time += time.perf_counter() - started
+
+    def _match_digest(self):
+        """内容与上次相同时返回上次的解析结果（not_modified），否则返回 None"""
+        if not self.digest_mode:
+            return None
+        product_info, self.digests = self.crawler.http_cache.match_digest(self.url, self.body)
+        if product_info:
+            print(f"♻️ 页面内容未变化: {self.url}")
+        return product_info
+
+    def _scan_markers(self):
+        """在新收到的字节（含少量重叠）中查找结构化数据标记，返回是否值得再提取一次"""
+        ready = False
+        for match in STRUCTURED_MARKER.finditer(self.buffer, max(0, self.marker_offset - MARKER_OVERLAP)):
+            if match.end() <= self.marker_offset:
+                # 重叠部分中上次已经处理过的标记
+                continue
+            marker = match.group().lower()
+            if marker == b'ld+json':
+                self.ld_open = True
+            elif marker.startswith(b'</script'):
+                ready = ready or self.ld_open
+                self.ld_open = False
+            else:
+                ready = ready or not self.head_closed
+                self.head_closed = True
+        self.marker_offset = len(self.buffer)
+        return ready
+
+    def _try_extract(self, chunk):
+        structured = self.crawler.structured_extractor
+        if not self.structured_done:
+            if self._scan_markers():
+                product_info = structured.extract(self.body, self.url, record=False)
+                if product_info:
+                    structured.record(self.platform, True)
+                    return product_info
+            self.structured_done = (self.head_closed and not self.ld_open) or self.bytes_read >= SCAN_LIMIT
+        if not self.parse_dom:
+            return None
+
+        self.parser.feed(chunk)
+        for _, element in self.parser.read_events():
+            self.root = element
+        if self.root is None:
+            return None
+
+        product_info = self.crawler.fast_extractor.extract_from_doc(
+            self.root, self.url, open_elements=self._open_elements())
+        if product_info and product_info['image_url']:
+            structured.record(self.platform, False)
+            return product_info
+        return None
+
+    def _open_elements(self):
+        """尚未闭合的元素：从根节点沿最后一个子节点向下的路径，其余元素都已解析完"""
+        open_elements = set()
+        element = self.root
+        while element is not None:
+            open_elements.add(element)
+            element = element[-1] if len(element) else None
+        return open_elements
@@ -0,0 +1,156 @@
+"""结构化数据优先提取
+
+只扫描页面开头 SCAN_LIMIT 字节内 <head> 中的 meta 标签（OpenGraph / 微数据）
+和第一个含有 Product 的 <script type="application/ld+json"> 块，
+名称、价格、图片三项都找到时直接返回，不构建DOM；否则返回 None，交给完整解析。
+"""
+import html
+import json
+import re
+import threading
+
+SCAN_LIMIT = 256 * 1024  # 结构化数据一般在 <head> 或正文开头，之后的内容不再扫描
+
+HEAD_END = re.compile(rb'</head\s*>', re.I)
+META_TAG = re.compile(rb'<meta\s[^>]*>', re.I)
+META_ATTR = re.compile(rb'''([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''')
+TITLE_TAG = re.compile(rb'<title[^>]*>(.*?)</title\s*>', re.I | re.S)
+LD_JSON = re.compile(rb'''<script[^>]*type\s*=\s*["']application/ld\+json["'][^>]*>(.*?)</script\s*>''', re.I | re.S)
+
+NAME_KEYS = ('og:title', 'name')
+PRICE_KEYS = ('og:product:price', 'product:price:amount', 'product:price', 'og:price:amount', 'price')
+IMAGE_KEYS = ('og:image', 'image')
+
+
+def parse_meta_tags(head):
+    """把 meta 标签解析为 {property/itemprop/name: content}，先出现的优先"""
+    values = {}
+    for tag in META_TAG.findall(head):
+        attrs = {}
+        for key, double_quoted, single_quoted, bare in META_ATTR.findall(tag):
+            attrs[key.lower().decode('ascii', errors='ignore')] = double_quoted or single_quoted or bare
+        key = attrs.get('property') or attrs.get('itemprop') or attrs.get('name')
+        content = attrs.get('content')
+        if key and content:
+            key = key.decode('utf-8', errors='replace').lower()
+            values.setdefault(key, html.unescape(content.decode('utf-8', errors='replace')).strip())
+    return values
+
+
+def iter_ld_products(data):
+    """遍历 JSON-LD 中 @type 为 Product 的节点"""
+    if isinstance(data, list):
+        for item in data:
+            yield from iter_ld_products(item)
+    elif isinstance(data, dict):
+        node_type = data.get('@type')
+        types = node_type if isinstance(node_type, list) else [node_type]
+        if 'Product' in types:
+            yield data
+        if '@graph' in data:
+            yield from iter_ld_products(data['@graph'])
+
+
+def ld_image(image):
+    """JSON-LD 的 image 可能是字符串、列表或 ImageObject"""
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get('url') or image.get('contentUrl')
+    return image if isinstance(image, str) else None
+
+
+def ld_price(offers):
+    """从 offers（Offer / AggregateOffer / 列表）中取价格"""
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if isinstance(offers, dict):
+        return offers.get('price') or offers.get('lowPrice')
+    return None
+
+
+class StructuredDataExtractor:
+    """结构化数据提取器，按平台统计命中率"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.hits = {}
+
+    def stats(self):
+        """各平台的命中率"""
+        with self.lock:
+            return {
+                platform: {
+                    'attempts': attempts,
+                    'hits': self.hits.get(platform, 0),
+                    'hit_rate': round(self.hits.get(platform, 0) / attempts, 3)
+                }
+                for platform, attempts in self.attempts.items()
+            }
+
+    def extract(self, body, url, record=True):
+        """从结构化数据中提取商品信息，不完整时返回 None
+
+        流式读取时每收到一块数据都会尝试一次，此时 record=False，由调用方在结束时调用 record()。
+        """
+        platform = self.crawler.detect_platform(url)
+        product_info = self._extract(body, url, platform)
+        if record:
+            self.record(platform, bool(product_info))
+        return product_info
+
+    def record(self, platform, hit):
+        """记录一次提取结果"""
+        with self.lock:
+            self.attempts[platform] = self.attempts.get(platform, 0) + 1
+            if hit:
+                self.hits[platform] = self.hits.get(platform, 0) + 1
+
+    def _extract(self, body, url, platform):
+        name = price = image = None
+        body = body[:SCAN_LIMIT]
+
+        # JSON-LD 中的 Product / Offer，只使用第一个含有 Product 的块
+        for match in LD_JSON.finditer(body):
+            try:
+                data = json.loads(match.group(1).decode('utf-8', errors='replace'))
+            except ValueError:
+                continue
+            products = list(iter_ld_products(data))
+            for product in products:
+                name = name or product.get('name')
+                price = price or ld_price(product.get('offers'))
+                image = image or ld_image(product.get('image'))
+            if products:
+                break
+
+        # <head> 中的 OpenGraph / 微数据 meta 标签
+        if not (name and price and image):
+            head_end = HEAD_END.search(body)
+            head = body[:head_end.start()] if head_end else b''
+            meta = parse_meta_tags(head)
+            name = name or next((meta[k] for k in NAME_KEYS if k in meta), None)
+            price = price or next((meta[k] for k in PRICE_KEYS if k in meta), None)
+            image = image or next((meta[k] for k in IMAGE_KEYS if k in meta), None)
+            if not name:
+                title = TITLE_TAG.search(head)
+                if title:
+                    name = html.unescape(title.group(1).decode('utf-8', errors='replace'))
+
+        if not (name and price and image):
+            return None
+
+        price = self.crawler.parse_price(str(price))
+        name = self.crawler.clean_title(name, platform)
+        if price <= 0 or not name:
+            return None
+
+        return {
+            'name': name,
+            'price': price,
+            'image_url': self.crawler.process_image_url(image, url),
+            'platform': platform,
+            'success': True
+        }